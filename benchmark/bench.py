@@ -0,0 +1,476 @@
+"""Benchmark pyffi: import time, inspect, read, and write throughput
+for the test files of all major formats and for synthetic nif files,
+and the time taken by the main nif spells.
+
+Usage::
+
+  python benchmark/bench.py run [options] [CASE ...]
+  python benchmark/bench.py compare OLD.json NEW.json
+  python benchmark/bench.py list
+
+A case is a string of the form ``KIND:FORMAT:FILE`` where KIND is one
+of ``inspect``, ``read``, ``write``, or ``memory`` (memory held by the
+data after reading, in total and per block); ``import:FORMAT``; or
+``spell:SPELLNAME:FILE``; or ``recurse:FORMAT:FILE:VERBOSE``, which
+recurses a spell that does nothing over the whole file with a toaster
+at the given verbosity, logging to the null device, to measure the
+overhead of the toaster messages; or ``stripify:SIZE``, which
+stripifies a flat grid of SIZE x SIZE quads with the pure python
+stripifier, and also reports the peak memory allocated while doing so,
+and the number and total length of the strips.
+FILE is either the name of an existing file, or ``@GENERATOR`` for a
+synthetic nif file (see synthetic.py).
+
+Every case runs in a separate process, so the reported peak resident
+set size is that of the case alone. Results are printed, and written
+as json with the --output option. The compare command prints the
+ratio of the mean times of the cases of two such json files.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+from __future__ import print_function
+
+import json
+import optparse
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+from summary import mean, sd, confint
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIXTURES = [
+    ("nif", "tests/nif/test.nif"),
+    ("nif", "tests/nif/test_grid_128x128.nif"),
+    ("nif", "tests/nif/test_skincenterradius.nif"),
+    ("cgf", "tests/cgf/test.cgf"),
+    ("cgf", "tests/cgf/monkey.cgf"),
+    ("kfm", "tests/kfm/test.kfm"),
+    ("dds", "tests/dds/test.dds"),
+    ("tga", "tests/tga/test.tga"),
+    ("egm", "tests/egm/mmouthxivilai.egm"),
+    ("tri", "tests/tri/mmouthxivilai.tri"),
+    ("nif", "@many_blocks"),
+    ("nif", "@big_mesh"),
+    ("nif", "@deep_tree"),
+    ]
+"""Files for the inspect, read, and write cases."""
+
+SPELLS = [
+    "opt_cleanreflists",
+    "opt_mergeduplicates",
+    "opt_geometry",
+    "opt_delunusedbones",
+    "opt_collisiongeometry",
+    "fix_texturepath",
+    "fix_clampmaterialalpha",
+    "fix_detachhavoktristripsdata",
+    "fix_addtangentspace",
+    "optimize",
+    ]
+"""Spells for the spell cases."""
+
+SPELL_FIXTURES = [
+    "tests/nif/test.nif",
+    "tests/nif/test_grid_128x128.nif",
+    "@big_mesh",
+    ]
+"""Files for the spell cases."""
+
+RECURSE_FIXTURES = [
+    ("nif", "tests/nif/test.nif"),
+    ("nif", "@many_blocks"),
+    ("nif", "@deep_tree"),
+    ("cgf", "tests/cgf/monkey.cgf"),
+    ]
+"""Files for the recurse cases, which are run at verbosity 0 and 2."""
+
+STRIPIFY_SIZES = [32, 100]
+"""Grid sizes for the stripify cases."""
+
+def default_cases():
+    """List of all cases that are run by default."""
+    cases = ["import:%s" % fmt
+             for fmt in sorted(set(fmt for fmt, filename in FIXTURES))]
+    for kind in ("inspect", "read", "write", "memory"):
+        cases.extend("%s:%s:%s" % (kind, fmt, filename)
+                     for fmt, filename in FIXTURES)
+    cases.extend("spell:%s:%s" % (spellname, filename)
+                 for spellname in SPELLS for filename in SPELL_FIXTURES)
+    cases.extend("recurse:%s:%s:%i" % (fmt, filename, verbose)
+                 for fmt, filename in RECURSE_FIXTURES for verbose in (0, 2))
+    cases.extend("stripify:%i" % size for size in STRIPIFY_SIZES)
+    return cases
+
+def peak_rss():
+    """Peak resident set size of this process, in MB, or ``None`` if
+    not available.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on mac, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return maxrss / 1048576.0
+    return maxrss / 1024.0
+
+def count_blocks(data):
+    """Number of blocks (nif) or chunks (cgf), or ``None`` for other
+    formats.
+    """
+    for name in ("blocks", "chunks"):
+        blocks = getattr(data, name, None)
+        if blocks is not None:
+            return len(blocks)
+    return None
+
+def get_file(filename, scale):
+    """Return the name of the file to benchmark, generating it first
+    if it is synthetic.
+    """
+    if not filename.startswith("@"):
+        return os.path.join(ROOT, filename)
+    import synthetic
+    fd, tmpname = tempfile.mkstemp(suffix=".nif")
+    with os.fdopen(fd, "wb") as stream:
+        synthetic.generate(filename[1:], stream, scale)
+    return tmpname
+
+def read_data(format_, stream):
+    """Read data of given format from stream."""
+    data = format_.Data()
+    data.read(stream)
+    return data
+
+def get_toaster(spellname):
+    """Get a nif toaster for the given spell, from the nif toaster
+    script.
+    """
+    sys.path.append(os.path.join(ROOT, "scripts", "nif"))
+    import niftoaster
+    toaster = niftoaster.NifToaster(
+        spellnames=[spellname], options=dict(verbose=0))
+    return toaster
+
+def get_recurse_toaster(format_, verbose):
+    """Get a toaster for the given format and verbosity, whose messages
+    go to the null device.
+    """
+    import logging
+    import pyffi.spells
+
+    class RecurseSpell(pyffi.spells.Spell):
+        SPELLNAME = "bench_recurse"
+        READONLY = True
+
+    class RecurseToaster(pyffi.spells.Toaster):
+        FILEFORMAT = format_
+        SPELLS = [RecurseSpell]
+
+    logger = logging.getLogger("pyffi.bench.recurse")
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+    return RecurseToaster(
+        spellnames=["bench_recurse"], options=dict(verbose=verbose),
+        logger=logger)
+
+def stripify(triangles):
+    """Stripify triangles with the pure python stripifier (the
+    stripify function of pyffi.utils.tristrip uses pytristrip instead,
+    if it is installed).
+    """
+    from pyffi.utils.trianglemesh import Mesh
+    from pyffi.utils.trianglestripifier import TriangleStripifier
+    return TriangleStripifier(Mesh(triangles)).find_all_strips()
+
+def run_case(case, repeat, scale):
+    """Run a single case in this process, and return its result as a
+    ``dict``.
+    """
+    import pyffi.formats
+    args = case.split(":")
+    kind = args[0]
+    result = dict(times=[], bytes=None, blocks=None,
+                  pyffi_version=pyffi.__version__)
+    if kind == "import":
+        # time the import in this fresh process only
+        start = time.time()
+        pyffi.formats.FORMATS[args[1]].load()
+        result["times"].append(time.time() - start)
+        result["peak_rss_mb"] = peak_rss()
+        return result
+    if kind == "stripify":
+        import synthetic
+        verts, triangles = synthetic.grid(int(args[1]) * scale)
+        for i in range(repeat):
+            # note: tracing slows down stripifying
+            tracemalloc.start()
+            start = time.time()
+            strips = stripify(triangles)
+            result["times"].append(time.time() - start)
+            result["peak_memory_mb"] = (
+                tracemalloc.get_traced_memory()[1] / 1048576.0)
+            tracemalloc.stop()
+        result["strips"] = len(strips)
+        result["strip_length"] = sum(len(strip) for strip in strips)
+        result["peak_rss_mb"] = peak_rss()
+        return result
+    if kind == "spell":
+        format_ = pyffi.formats.FORMATS["nif"].load()
+        toaster = get_toaster(args[1])
+        if not toaster.spellclass.toastentry(toaster):
+            raise ValueError("spell %s does not apply" % args[1])
+    elif kind == "recurse":
+        format_ = pyffi.formats.FORMATS[args[1]].load()
+        toaster = get_recurse_toaster(
+            format_, int(args[3]) if len(args) > 3 else 0)
+    else:
+        format_ = pyffi.formats.FORMATS[args[1]].load()
+    filename = get_file(args[2], scale)
+    try:
+        result["bytes"] = os.path.getsize(filename)
+        with open(filename, "rb") as stream:
+            result["blocks"] = count_blocks(read_data(format_, stream))
+        for i in range(repeat):
+            with open(filename, "rb") as stream:
+                if kind == "inspect":
+                    data = format_.Data()
+                    start = time.time()
+                    data.inspect(stream)
+                elif kind == "read":
+                    data = format_.Data()
+                    start = time.time()
+                    data.read(stream)
+                elif kind == "write":
+                    data = read_data(format_, stream)
+                    # some formats need the file name to write
+                    with tempfile.NamedTemporaryFile(
+                        suffix=os.path.splitext(filename)[1]) as outstream:
+                        start = time.time()
+                        data.write(outstream)
+                elif kind == "memory":
+                    # note: tracing slows down reading
+                    tracemalloc.start()
+                    data = format_.Data()
+                    start = time.time()
+                    data.read(stream)
+                    memory = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.stop()
+                    result["memory_mb"] = memory / 1048576.0
+                    if result["blocks"]:
+                        result["memory_per_block"] = (
+                            memory / float(result["blocks"]))
+                elif kind in ("spell", "recurse"):
+                    data = read_data(format_, stream)
+                    spell = toaster.spellclass(
+                        toaster=toaster, data=data, stream=stream)
+                    start = time.time()
+                    spell.recurse()
+                else:
+                    raise ValueError("unknown benchmark kind %s" % kind)
+                result["times"].append(time.time() - start)
+    finally:
+        if args[2].startswith("@"):
+            os.remove(filename)
+    result["peak_rss_mb"] = peak_rss()
+    return result
+
+def spawn_case(case, repeat, scale):
+    """Run a single case in a new process, and return its result."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "case", case,
+         str(repeat), str(scale)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    if process.returncode != 0:
+        lines = errors.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else "failed")
+    # output of the spells may precede the result
+    return json.loads(output.decode("utf-8").splitlines()[-1])
+
+def summarize(result):
+    """Add mean and standard deviation of the times, and throughput,
+    to the result.
+    """
+    times = result["times"]
+    result["mean"] = mean(times)
+    result["sd"] = sd(times) if len(times) > 1 else 0.0
+    if result["mean"] > 0:
+        if result.get("bytes"):
+            result["mb_per_s"] = result["bytes"] / 1048576.0 / result["mean"]
+        if result.get("blocks"):
+            result["blocks_per_s"] = result["blocks"] / result["mean"]
+    return result
+
+def format_result(case, result):
+    """One line summary of a result."""
+    line = "{0:60} {1:9.4f} +- {2:7.4f} s".format(
+        case, result["mean"], result["sd"])
+    if "mb_per_s" in result:
+        line += " {0:8.2f} MB/s".format(result["mb_per_s"])
+    if "blocks_per_s" in result:
+        line += " {0:10.0f} blocks/s".format(result["blocks_per_s"])
+    if "memory_mb" in result:
+        line += " {0:8.2f} MB held".format(result["memory_mb"])
+    if "memory_per_block" in result:
+        line += " {0:8.0f} bytes/block".format(result["memory_per_block"])
+    if "peak_memory_mb" in result:
+        line += " {0:8.2f} MB allocated".format(result["peak_memory_mb"])
+    if "strips" in result:
+        line += " {0:6} strips {1:8} vertices".format(
+            result["strips"], result["strip_length"])
+    if result.get("peak_rss_mb") is not None:
+        line += " {0:8.1f} MB peak".format(result["peak_rss_mb"])
+    return line
+
+def run(cases, repeat, scale, output=None):
+    """Run all cases, print results, and optionally save them to a
+    json file.
+    """
+    results = {}
+    for case in cases:
+        try:
+            if case.startswith("import:"):
+                # every import needs a fresh process
+                runs = [spawn_case(case, 1, scale) for i in range(repeat)]
+                result = runs[0]
+                result["times"] = [run_["times"][0] for run_ in runs]
+                result["peak_rss_mb"] = max(run_["peak_rss_mb"] or 0
+                                            for run_ in runs) or None
+            else:
+                result = spawn_case(case, repeat, scale)
+        except RuntimeError as exc:
+            print("{0:60} failed: {1}".format(case, exc))
+            continue
+        results[case] = summarize(result)
+        print(format_result(case, results[case]))
+        sys.stdout.flush()
+    if output:
+        with open(output, "w") as stream:
+            json.dump(dict(
+                pyffi_version=(
+                    list(results.values())[0]["pyffi_version"]
+                    if results else None),
+                python_version=platform.python_version(),
+                platform=platform.platform(),
+                date=time.strftime("%Y-%m-%d %H:%M:%S"),
+                repeat=repeat, scale=scale,
+                results=results), stream, indent=2, sort_keys=True)
+    return results
+
+def compare(old_name, new_name):
+    """Print the ratio between the mean times of two benchmark runs,
+    or between the memory held for memory cases. A ratio below 1 means
+    that the new run is faster, or uses less memory. Time ratios are
+    marked with a star if the 95% confidence intervals of the two runs
+    do not overlap.
+    """
+    with open(old_name) as stream:
+        old = json.load(stream)["results"]
+    with open(new_name) as stream:
+        new = json.load(stream)["results"]
+    for case in sorted(set(old) & set(new)):
+        significant = ""
+        if case.startswith("memory:"):
+            key = "memory_mb"
+        else:
+            key = "mean"
+            old_times = old[case]["times"]
+            new_times = new[case]["times"]
+            if len(old_times) > 1 and len(new_times) > 1:
+                old_low, old_high = confint(old_times)
+                new_low, new_high = confint(new_times)
+                if new_high < old_low or old_high < new_low:
+                    significant = "*"
+        ratio = new[case][key] / old[case][key]
+        print("{0:60} {1:9.4f} {2:9.4f} {3:7.3f}{4}".format(
+            case, old[case][key], new[case][key], ratio, significant))
+    for case in sorted(set(old) ^ set(new)):
+        print("{0:60} only in {1}".format(
+            case, old_name if case in old else new_name))
+
+def main():
+    parser = optparse.OptionParser(usage=__doc__.split("::")[1].split("\n\n")[0])
+    parser.add_option(
+        "-n", "--repeat", dest="repeat", type="int", default=5,
+        help="number of times each case is run [default: %default]")
+    parser.add_option(
+        "-s", "--scale", dest="scale", type="int", default=1,
+        help="size multiplier for synthetic files [default: %default]")
+    parser.add_option(
+        "-o", "--output", dest="output", default=None,
+        help="write results to this json file")
+    options, args = parser.parse_args()
+    if not args:
+        parser.error("no command given")
+    command, args = args[0], args[1:]
+    if command == "run":
+        run(args or default_cases(), options.repeat, options.scale,
+            options.output)
+    elif command == "compare":
+        if len(args) != 2:
+            parser.error("compare needs two json files")
+        compare(*args)
+    elif command == "list":
+        for case in default_cases():
+            print(case)
+    elif command == "case":
+        # internal: run a single case in this process
+        case, repeat, scale = args
+        result = run_case(case, int(repeat), int(scale))
+        print(json.dumps(result))
+    else:
+        parser.error("unknown command %s" % command)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Measure the import time of pyffi format modules, with the schema
+cache disabled, with an empty (cold) cache, and with a filled (warm)
+cache. Every import runs in a fresh Python process.
+
+Usage::
+
+  python benchmark/import_time.py [NUM_RUNS] [MODULE ...]
+
+By default, imports pyffi.formats.nif and pyffi.formats.cgf 10 times.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+from __future__ import print_function
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from summary import mean, sd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_time(module, cache_path):
+    """Time importing module in a new process, with given schema cache
+    folder (empty string disables the cache).
+    """
+    env = dict(os.environ)
+    env["PYFFICACHEPATH"] = cache_path
+    env["PYTHONPATH"] = ROOT
+    start = time.time()
+    subprocess.check_call([sys.executable, "-c", "import " + module],
+                          env=env)
+    return time.time() - start
+
+def benchmark(module, num_runs):
+    results = {"no cache": [], "cold cache": [], "warm cache": []}
+    warm_path = tempfile.mkdtemp()
+    try:
+        # fill the warm cache
+        import_time(module, warm_path)
+        for i in range(num_runs):
+            results["no cache"].append(import_time(module, ""))
+            cold_path = tempfile.mkdtemp()
+            try:
+                results["cold cache"].append(import_time(module, cold_path))
+            finally:
+                shutil.rmtree(cold_path)
+            results["warm cache"].append(import_time(module, warm_path))
+    finally:
+        shutil.rmtree(warm_path)
+    return results
+
+if __name__ == "__main__":
+    num_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    modules = sys.argv[2:] or ["pyffi.formats.nif", "pyffi.formats.cgf"]
+    for module in modules:
+        print(module)
+        print("-" * len(module))
+        print()
+        for name, vec in sorted(benchmark(module, num_runs).items()):
+            print("{0:10}: {1:10.3f} +- {2:10.3f} s".format(
+                name, mean(vec), 1.96 * sd(vec) / (len(vec) ** 0.5)))
+        print()
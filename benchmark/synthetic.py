@@ -0,0 +1,175 @@
+"""Generators for large synthetic nif files, to benchmark pyffi on
+inputs that are much bigger than the files in the tests folder.
+
+Usage::
+
+  python benchmark/synthetic.py GENERATOR FILENAME [SCALE]
+
+where GENERATOR is one of many_blocks, big_mesh, or deep_tree.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+from __future__ import print_function
+
+import sys
+
+from pyffi.formats.nif import NifFormat
+
+def grid(size):
+    """Vertices and triangles of a flat square grid with size x size
+    quads.
+
+    >>> verts, tris = grid(1)
+    >>> verts
+    [(0.0, 0.0, 0.0), (0.0, 1.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0)]
+    >>> tris
+    [(0, 2, 1), (1, 2, 3)]
+    """
+    verts = [(float(i), float(j), 0.0)
+             for i in range(size + 1) for j in range(size + 1)]
+    tris = []
+    for i in range(size):
+        for j in range(size):
+            v0 = i * (size + 1) + j
+            v1 = v0 + 1
+            v2 = v0 + size + 1
+            v3 = v2 + 1
+            tris.append((v0, v2, v1))
+            tris.append((v1, v2, v3))
+    return verts, tris
+
+def make_shape(name, size):
+    """Create a NiTriShape whose geometry is a grid with size x size
+    quads, with normals and uv coordinates.
+    """
+    verts, tris = grid(size)
+    shape = NifFormat.NiTriShape()
+    shape.name = name
+    shape.rotation.set_identity()
+    shape.scale = 1.0
+    data = NifFormat.NiTriShapeData()
+    shape.data = data
+    data.num_vertices = len(verts)
+    data.has_vertices = True
+    data.vertices.update_size()
+    for v, (x, y, z) in zip(data.vertices, verts):
+        v.x, v.y, v.z = x, y, z
+    data.has_normals = True
+    data.normals.update_size()
+    for n in data.normals:
+        n.z = 1.0
+    data.num_uv_sets = 1
+    data.has_uv = True
+    data.uv_sets.update_size()
+    for uv, (x, y, z) in zip(data.uv_sets[0], verts):
+        uv.u, uv.v = x / size, y / size
+    data.set_triangles(tris)
+    data.update_center_radius()
+    return shape
+
+def make_node(name):
+    """Create a NiNode with identity transform."""
+    node = NifFormat.NiNode()
+    node.name = name
+    node.rotation.set_identity()
+    node.scale = 1.0
+    return node
+
+def many_blocks(scale=1):
+    """Scene with a flat list of many small shapes."""
+    root = make_node("Scene Root")
+    for i in range(1000 * scale):
+        root.add_child(make_shape("Shape%i" % i, 1))
+    return root
+
+BIG_MESH_SIZE = 180
+"""Grid size of the shapes of L{big_mesh}: 2 x 180 x 180 = 64800
+triangles, just within the ushort limit on the number of triangles of
+a NiTriShapeData block."""
+
+def big_mesh(scale=1):
+    """Scene with shapes with a large number of vertices: one shape
+    for every unit of scale, since a single shape cannot have more
+    than 65535 triangles.
+    """
+    root = make_node("Scene Root")
+    for i in range(scale):
+        root.add_child(make_shape("BigMesh%i" % i, BIG_MESH_SIZE))
+    return root
+
+def deep_tree(scale=1):
+    """Scene with a long chain of nodes, each with a small shape."""
+    root = make_node("Scene Root")
+    parent = root
+    for i in range(100 * scale):
+        node = make_node("Node%i" % i)
+        node.translation.z = 1.0
+        node.add_child(make_shape("Shape%i" % i, 1))
+        parent.add_child(node)
+        parent = node
+    return root
+
+GENERATORS = {
+    "many_blocks": many_blocks,
+    "big_mesh": big_mesh,
+    "deep_tree": deep_tree,
+    }
+"""Generators for synthetic nif scenes, by name."""
+
+def generate(name, stream, scale=1):
+    """Write a synthetic nif file to stream.
+
+    :param name: Name of the generator, see :data:`GENERATORS`.
+    :type name: ``str``
+    :param stream: The stream to write to.
+    :type stream: ``file``
+    :param scale: Multiplies the size of the generated scene.
+    :type scale: ``int``
+    """
+    data = NifFormat.Data(version=0x14010003, user_version=10)
+    data.roots = [GENERATORS[name](scale)]
+    data.write(stream)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] not in GENERATORS:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[2], "wb") as stream:
+        generate(sys.argv[1], stream,
+                 int(sys.argv[3]) if len(sys.argv) == 4 else 1)
@@ -11,6 +11,14 @@ set the :envvar:`CGFXMLPATH` environment variable to the directory where
 :envvar:`KFMXMLPATH`, :envvar:`DDSXMLPATH`, and :envvar:`TGAXMLPATH`
 work similarly.
 
+The classes generated from the xml descriptions are cached on disk, so
+the xml files need not be parsed again on every import. The cache is
+stored in the :envvar:`PYFFICACHEPATH` directory if this environment
+variable is set, and in a :file:`pyffi` folder under the user cache
+directory otherwise. Set :envvar:`PYFFICACHEPATH` to an empty string to
+disable the cache. Cached files are invalidated automatically whenever
+the xml file or the pyffi version changes.
+
 Supported formats
 -----------------
 
@@ -29,6 +37,22 @@ Supported formats
    pyffi.formats.tga
    pyffi.formats.tri
 
+Detecting formats
+-----------------
+
+Importing a format module generates all of its classes, which takes
+time. To find out which format a file has without importing any
+format module, use the registry in this module:
+
+>>> import pyffi.formats
+>>> [info.name for info in pyffi.formats.find_formats("tests/cgf/test.cgf")]
+['cgf']
+>>> with open("tests/dds/test.dds", "rb") as stream:
+...     [info.name for info in pyffi.formats.find_formats(stream=stream)]
+['dds', 'dae', 'rockstar.dir', 'tga']
+>>> pyffi.formats.FORMATS["cgf"].load().__name__
+'CgfFormat'
+
 Adding new formats
 ------------------
 
@@ -102,3 +126,186 @@ the source code of :mod:`pyffi.formats.cgf` or
 :mod:`pyffi.formats.nif` to see how pyffi works for more complex file
 formats.
 """
+
+import importlib
+import re
+
+class FormatInfo(object):
+    """Describes a file format without importing its module: the
+    file name pattern, the magic bytes that start every file of the
+    format, and where to find the format class.
+    """
+
+    def __init__(self, name, module_name, class_name, re_filename,
+                 magics=()):
+        """Initialize the format description.
+
+        :param name: Short name of the format, such as ``"nif"``.
+        :type name: ``str``
+        :param module_name: Full name of the module which implements
+            the format.
+        :type module_name: ``str``
+        :param class_name: Name of the format class in that module.
+        :type class_name: ``str``
+        :param re_filename: File name pattern, identical to the
+            ``RE_FILENAME`` attribute of the format class.
+        :type re_filename: ``str``
+        :param magics: Byte strings one of which starts every file of
+            this format; empty if the format has no magic bytes.
+        :type magics: ``tuple`` of ``bytes``
+        """
+        self.name = name
+        self.module_name = module_name
+        self.class_name = class_name
+        self.re_filename = re.compile(re_filename, re.IGNORECASE)
+        self.magics = tuple(magics)
+        self._format = None
+
+    def __repr__(self):
+        return "<FormatInfo %s>" % self.name
+
+    def match_filename(self, filename):
+        """Check whether the file name matches this format.
+
+        >>> FORMATS["cgf"].match_filename("objects/box.CGA")
+        True
+        >>> FORMATS["cgf"].match_filename("objects/box.nif")
+        False
+        """
+        return bool(self.re_filename.match(filename))
+
+    def match_magic(self, header):
+        """Check whether the first bytes of a file match this format.
+        Returns ``None`` if the format has no magic bytes, so the file
+        contents cannot tell.
+
+        :param header: The first bytes of the file; :data:`MAGIC_SIZE`
+            bytes are always enough.
+        :type header: ``bytes``
+
+        >>> FORMATS["dds"].match_magic(b"DDS \\x7c\\x00\\x00\\x00")
+        True
+        >>> FORMATS["dds"].match_magic(b"FREGM002")
+        False
+        >>> FORMATS["tga"].match_magic(b"FREGM002") is None
+        True
+        """
+        if not self.magics:
+            return None
+        return header.startswith(self.magics)
+
+    def load(self):
+        """Import the format module, and return the format class. The
+        xml description of the format is parsed, or loaded from the
+        cache, on first call only.
+
+        >>> for name in sorted(FORMATS):
+        ...     if name != "dae": # xsd based formats do not work on py3k
+        ...         format = FORMATS[name].load()
+        ...         assert(format.RE_FILENAME.pattern
+        ...                == FORMATS[name].re_filename.pattern)
+        """
+        if self._format is None:
+            module = importlib.import_module(self.module_name)
+            self._format = getattr(module, self.class_name)
+        return self._format
+
+# maximal length of the magic bytes of any format
+MAGIC_SIZE = 64
+
+FORMATS = dict((info.name, info) for info in [
+    FormatInfo(
+        "bsa", "pyffi.formats.bsa", "BsaFormat",
+        r'^.*\.bsa$',
+        [b'BSA\x00', b'\x00\x01\x00\x00']),
+    FormatInfo(
+        "cgf", "pyffi.formats.cgf", "CgfFormat",
+        r'^.*\.(cgf|cga|chr|caf)$',
+        [b'CryTek', b'NCAion']),
+    FormatInfo(
+        "dae", "pyffi.formats.dae", "DaeFormat",
+        r'^.*\.dae$'),
+    FormatInfo(
+        "dds", "pyffi.formats.dds", "DdsFormat",
+        r'^.*\.dds$',
+        [b'DDS ']),
+    FormatInfo(
+        "egm", "pyffi.formats.egm", "EgmFormat",
+        r'^.*\.egm$',
+        [b'FREGM']),
+    FormatInfo(
+        "egt", "pyffi.formats.egt", "EgtFormat",
+        r'^.*\.egt$',
+        [b'FREGT']),
+    FormatInfo(
+        "esp", "pyffi.formats.esp", "EspFormat",
+        r'^.*\.(esp|ess|esm)$',
+        [b'TES4']),
+    FormatInfo(
+        "kfm", "pyffi.formats.kfm", "KfmFormat",
+        r'^.*\.kfm$',
+        [b';Gamebryo KFM File Version ']),
+    FormatInfo(
+        "nif", "pyffi.formats.nif", "NifFormat",
+        r'^.*\.(nif|kf|kfa|nifcache|jmi|texcache|pcpatch|nft|item|nif_wii)$',
+        [b'NetImmerse File Format, Version ',
+         b'Gamebryo File Format, Version ',
+         b'NS',
+         b'NDSNIF....@....@...., Version ',
+         b'Joymaster HS1 Object Format - (JMI), Version ']),
+    FormatInfo(
+        "psk", "pyffi.formats.psk", "PskFormat",
+        r'^.*\.psk$',
+        [b'ACTRHEAD', b'ANIMHEAD']),
+    FormatInfo(
+        "rockstar.dir", "pyffi.formats.rockstar.dir_", "DirFormat",
+        r'^.*\.dir$'),
+    FormatInfo(
+        "tga", "pyffi.formats.tga", "TgaFormat",
+        r'^.*\.tga$'),
+    FormatInfo(
+        "tri", "pyffi.formats.tri", "TriFormat",
+        r'^.*\.tri$',
+        [b'FRTRI']),
+    ])
+"""Registry of all supported formats, by name."""
+
+def find_formats(filename=None, stream=None):
+    """Find the formats that a file can have, without importing any
+    format module. If a file name is given, only formats whose file
+    name pattern matches are returned. If a stream is given, formats
+    whose magic bytes do not match the start of the stream are
+    dropped; formats without magic bytes are kept. The stream position
+    is restored afterwards.
+
+    :param filename: The name of the file.
+    :type filename: ``str``
+    :param stream: The file, opened in binary mode.
+    :type stream: ``file``
+    :return: List of matching formats, sorted by name, those with
+        matching magic bytes first.
+    :rtype: ``list`` of :class:`FormatInfo`
+
+    >>> find_formats("meshes/armor.NIF")
+    [<FormatInfo nif>]
+    >>> find_formats("readme.txt")
+    []
+    >>> import io
+    >>> find_formats("image.dds", io.BytesIO(b"FREGM002"))
+    []
+    >>> find_formats(stream=io.BytesIO(b"FRTRI003"))
+    [<FormatInfo tri>, <FormatInfo dae>, <FormatInfo rockstar.dir>, <FormatInfo tga>]
+    """
+    infos = [FORMATS[name] for name in sorted(FORMATS)]
+    if filename is not None:
+        infos = [info for info in infos if info.match_filename(filename)]
+    if stream is not None and infos:
+        pos = stream.tell()
+        try:
+            header = stream.read(MAGIC_SIZE)
+        finally:
+            stream.seek(pos)
+        matches = [(info.match_magic(header), info) for info in infos]
+        infos = ([info for match, info in matches if match]
+                 + [info for match, info in matches if match is None])
+    return infos
@@ -132,6 +132,7 @@ class BsaFormat(pyffi.object_models.xml.FileFormat):
             return self.__str__()
 
     class BZString(pyffi.object_models.common.SizedString):
+        __slots__ = ()
 
         def get_size(self, data=None):
             return 2 + len(self._value)
@@ -46,6 +46,23 @@ Read a CGF file
 * num_sub_ranges : 0
 <BLANKLINE>
 
+Read a single chunk
+^^^^^^^^^^^^^^^^^^^
+
+>>> stream = open('tests/cgf/test.cgf', 'rb')
+>>> data = CgfFormat.Data()
+>>> # read chunk table only
+>>> data.inspect(stream)
+>>> # decode the second chunk, without reading the first one
+>>> chunk = data.read_chunk(stream, 1)
+>>> chunk.__class__.__name__
+'TimingChunk'
+>>> chunk.ticks_per_frame
+160
+>>> data.chunks # still no chunks
+[]
+>>> stream.close()
+
 Parse all CGF files in a directory tree
 ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
@@ -201,6 +218,7 @@ Create a CGF file from scratch
 # ***** END LICENSE BLOCK *****
 # --------------------------------------------------------------------------
 
+import bisect
 import itertools
 import logging
 import struct
@@ -265,22 +283,27 @@ class CgfFormat(pyffi.object_models.xml.FileFormat, metaclass=_MetaCgfFormat):
 
     class String16(pyffi.object_models.common.FixedString):
         """String of fixed length 16."""
+        __slots__ = ()
         _len = 16
 
     class String32(pyffi.object_models.common.FixedString):
         """String of fixed length 32."""
+        __slots__ = ()
         _len = 32
 
     class String64(pyffi.object_models.common.FixedString):
         """String of fixed length 64."""
+        __slots__ = ()
         _len = 64
 
     class String128(pyffi.object_models.common.FixedString):
         """String of fixed length 128."""
+        __slots__ = ()
         _len = 128
 
     class String256(pyffi.object_models.common.FixedString):
         """String of fixed length 256."""
+        __slots__ = ()
         _len = 256
 
     class FileSignature(BasicBase):
@@ -346,6 +369,7 @@ class CgfFormat(pyffi.object_models.xml.FileFormat, metaclass=_MetaCgfFormat):
 
     class Ref(BasicBase):
         """Reference to a chunk, up the hierarchy."""
+        __slots__ = ('_template', '_value')
         _is_template = True
         _has_links = True
         _has_refs = True
@@ -478,6 +502,7 @@ but got instance of %s""" % (self._template, block.__class__))
 
     class Ptr(Ref):
         """Reference to a chunk, down the hierarchy."""
+        __slots__ = ()
         _is_template = True
         _has_links = True
         _has_refs = False
@@ -693,6 +718,143 @@ but got instance of %s""" % (self._template, block.__class__))
             finally:
                 stream.seek(pos)
 
+        def _get_chunk_sizes(self, stream):
+            """Calculate the number of bytes available to each chunk in
+            the chunk table, that is, the distance from its offset to the
+            next chunk offset, or to the chunk table, or to the end of
+            the stream. Moves the stream position to the end of the stream.
+
+            :param stream: The stream from which the chunk table was read.
+            :type stream: ``file``
+            :return: List of sizes, one for each chunk header.
+            :rtype: ``list`` of ``int``
+            """
+            # sort all offsets once, so every chunk can find its successor
+            # with a binary search
+            offsets = sorted(set(
+                [chunkhdr.offset
+                 for chunkhdr in self.chunk_table.chunk_headers]
+                + [self.header.offset]))
+            stream.seek(0, 2)
+            end_pos = stream.tell()
+            chunk_sizes = []
+            for chunkhdr in self.chunk_table.chunk_headers:
+                i = bisect.bisect_right(offsets, chunkhdr.offset)
+                if i < len(offsets):
+                    chunk_sizes.append(offsets[i] - chunkhdr.offset)
+                else:
+                    chunk_sizes.append(end_pos - chunkhdr.offset)
+            return chunk_sizes
+
+        def _read_chunk(self, stream, chunkhdr, is_caf):
+            """Read the chunk described by the given chunk header.
+
+            :param stream: The stream from which to read.
+            :type stream: ``file``
+            :param chunkhdr: The header of the chunk to read.
+            :type chunkhdr: L{CgfFormat.ChunkHeader}
+            :param is_caf: Whether the stream is a caf file.
+            :type is_caf: ``bool``
+            :return: The chunk, and the copy of its header (or ``None``
+                if the chunk has no header copy).
+            """
+            logger = logging.getLogger("pyffi.cgf.data")
+
+            # get chunk type
+            try:
+                chunk = CgfFormat.CHUNK_MAP[chunkhdr.type]()
+            except KeyError:
+                raise ValueError('unknown chunk type 0x%08X' % chunkhdr.type)
+            chunk_type = chunk.__class__.__name__[:-5]
+            # check the chunk version
+            if not self.game in chunk.get_games():
+                logger.error(
+                    'game %s does not support %sChunk; '
+                    'trying anyway'
+                    % (self.game, chunk_type))
+            if not chunkhdr.version in chunk.get_versions(self.game):
+                logger.error(
+                    'chunk version 0x%08X not supported for '
+                    'game %s and %sChunk; '
+                    'trying anyway'
+                    % (chunkhdr.version, self.game, chunk_type))
+
+            # now read the chunk
+            stream.seek(chunkhdr.offset)
+            logger.debug("Reading %s chunk version 0x%08X at 0x%08X"
+                         % (chunk_type, chunkhdr.version, stream.tell()))
+
+            # in far cry, most chunks start with a copy of chunkhdr
+            # in crysis, more chunks start with chunkhdr
+            # caf files are special: they don't have headers on controllers
+            if not(self.user_version == CgfFormat.UVER_FARCRY
+                   and chunkhdr.type in [
+                       CgfFormat.ChunkType.SourceInfo,
+                       CgfFormat.ChunkType.BoneNameList,
+                       CgfFormat.ChunkType.BoneLightBinding,
+                       CgfFormat.ChunkType.BoneInitialPos,
+                       CgfFormat.ChunkType.MeshMorphTarget]) \
+                and not(self.user_version == CgfFormat.UVER_CRYSIS
+                        and chunkhdr.type in [
+                            CgfFormat.ChunkType.BoneNameList,
+                            CgfFormat.ChunkType.BoneInitialPos]) \
+                and not(is_caf
+                        and chunkhdr.type in [
+                            CgfFormat.ChunkType.Controller]) \
+                and not((self.game == "Aion") and chunkhdr.type in [
+                    CgfFormat.ChunkType.MeshPhysicsData,
+                    CgfFormat.ChunkType.MtlName]):
+                chunkhdr_copy = CgfFormat.ChunkHeader()
+                chunkhdr_copy.read(stream, self)
+                # check that the copy is valid
+                # note: chunkhdr_copy.offset != chunkhdr.offset check removed
+                # as many crysis cgf files have this wrong
+                if chunkhdr_copy.type != chunkhdr.type \
+                   or chunkhdr_copy.version != chunkhdr.version \
+                   or chunkhdr_copy.id != chunkhdr.id:
+                    raise ValueError(
+                        'chunk starts with invalid header:\n\
+expected\n%sbut got\n%s'%(chunkhdr, chunkhdr_copy))
+            else:
+                chunkhdr_copy = None
+
+            # quick hackish trick with version... not beautiful but it works
+            self.version = chunkhdr.version
+            try:
+                chunk.read(stream, self)
+            finally:
+                self.version = self.header.version
+            return chunk, chunkhdr_copy
+
+        def read_chunk(self, stream, chunknum):
+            """Read a single chunk from the stream, without reading any
+            of the other chunks. Call L{inspect} first to read the chunk
+            table. This is useful for tools that only need a few chunks
+            from large files, for instance selected by type via
+            L{CgfFormat.ChunkTable.get_chunk_types}. Does not reset
+            stream position.
+
+            Note that references to other chunks are not resolved, and
+            are left as ``None``.
+
+            :param stream: The stream from which to read.
+            :type stream: ``file``
+            :param chunknum: Index of the chunk in the chunk table.
+            :type chunknum: ``int``
+            :return: The chunk.
+            :rtype: L{CgfFormat.Chunk}
+            """
+            # is it a caf file? see read
+            is_caf = (str(stream.name)[-4:].lower() == ".caf")
+            self._link_stack = []
+            try:
+                chunk, chunkhdr_copy = self._read_chunk(
+                    stream, self.chunk_table.chunk_headers[chunknum], is_caf)
+            finally:
+                # links are not resolved, so discard their indices
+                self._link_stack = []
+            return chunk
+
         def read(self, stream):
             """Read a cgf file. Does not reset stream position.
 
@@ -709,24 +871,9 @@ but got instance of %s""" % (self._template, block.__class__))
             # implementations, notably PyQt4, so convert it explicitely)
             is_caf = (str(stream.name)[-4:].lower() == ".caf")
 
-            chunk_types = [
-                chunk_type for chunk_type in dir(CgfFormat.ChunkType) \
-                if chunk_type[:2] != '__']
-
             # get the chunk sizes (for double checking that we have all data)
             if validate:
-                chunk_offsets = [chunkhdr.offset
-                                 for chunkhdr in self.chunk_table.chunk_headers]
-                chunk_offsets.append(self.header.offset)
-                chunk_sizes = []
-                for chunkhdr in self.chunk_table.chunk_headers:
-                    next_chunk_offsets = [offset for offset in chunk_offsets
-                                          if offset > chunkhdr.offset]
-                    if next_chunk_offsets:
-                        chunk_sizes.append(min(next_chunk_offsets) - chunkhdr.offset)
-                    else:
-                        stream.seek(0, 2)
-                        chunk_sizes.append(stream.tell() - chunkhdr.offset)
+                chunk_sizes = self._get_chunk_sizes(stream)
 
             # read the chunks
             self._link_stack = [] # list of chunk identifiers, as added to the stack
@@ -738,76 +885,8 @@ but got instance of %s""" % (self._template, block.__class__))
                 if chunkhdr.id in self._block_dct:
                     raise ValueError('chunk id %i not unique'%chunkhdr.id)
 
-                # get chunk type
-                for chunk_type in chunk_types:
-                    if getattr(CgfFormat.ChunkType, chunk_type) == chunkhdr.type:
-                        break
-                else:
-                    raise ValueError('unknown chunk type 0x%08X'%chunkhdr.type)
-                try:
-                    chunk = getattr(CgfFormat, '%sChunk' % chunk_type)()
-                except AttributeError:
-                    raise ValueError(
-                        'undecoded chunk type 0x%08X (%sChunk)'
-                        %(chunkhdr.type, chunk_type))
-                # check the chunk version
-                if not self.game in chunk.get_games():
-                    logger.error(
-                        'game %s does not support %sChunk; '
-                        'trying anyway'
-                        % (self.game, chunk_type))
-                if not chunkhdr.version in chunk.get_versions(self.game):
-                    logger.error(
-                        'chunk version 0x%08X not supported for '
-                        'game %s and %sChunk; '
-                        'trying anyway'
-                        % (chunkhdr.version, self.game, chunk_type))
-
-                # now read the chunk
-                stream.seek(chunkhdr.offset)
-                logger.debug("Reading %s chunk version 0x%08X at 0x%08X"
-                             % (chunk_type, chunkhdr.version, stream.tell()))
-
-                # in far cry, most chunks start with a copy of chunkhdr
-                # in crysis, more chunks start with chunkhdr
-                # caf files are special: they don't have headers on controllers
-                if not(self.user_version == CgfFormat.UVER_FARCRY
-                       and chunkhdr.type in [
-                           CgfFormat.ChunkType.SourceInfo,
-                           CgfFormat.ChunkType.BoneNameList,
-                           CgfFormat.ChunkType.BoneLightBinding,
-                           CgfFormat.ChunkType.BoneInitialPos,
-                           CgfFormat.ChunkType.MeshMorphTarget]) \
-                    and not(self.user_version == CgfFormat.UVER_CRYSIS
-                            and chunkhdr.type in [
-                                CgfFormat.ChunkType.BoneNameList,
-                                CgfFormat.ChunkType.BoneInitialPos]) \
-                    and not(is_caf
-                            and chunkhdr.type in [
-                                CgfFormat.ChunkType.Controller]) \
-                    and not((self.game == "Aion") and chunkhdr.type in [
-                        CgfFormat.ChunkType.MeshPhysicsData,
-                        CgfFormat.ChunkType.MtlName]):
-                    chunkhdr_copy = CgfFormat.ChunkHeader()
-                    chunkhdr_copy.read(stream, self)
-                    # check that the copy is valid
-                    # note: chunkhdr_copy.offset != chunkhdr.offset check removed
-                    # as many crysis cgf files have this wrong
-                    if chunkhdr_copy.type != chunkhdr.type \
-                       or chunkhdr_copy.version != chunkhdr.version \
-                       or chunkhdr_copy.id != chunkhdr.id:
-                        raise ValueError(
-                            'chunk starts with invalid header:\n\
-expected\n%sbut got\n%s'%(chunkhdr, chunkhdr_copy))
-                else:
-                    chunkhdr_copy = None
-
-                # quick hackish trick with version... not beautiful but it works
-                self.version = chunkhdr.version
-                try:
-                    chunk.read(stream, self)
-                finally:
-                    self.version = self.header.version
+                chunk, chunkhdr_copy = self._read_chunk(
+                    stream, chunkhdr, is_caf)
                 self.chunks.append(chunk)
                 self.versions.append(chunkhdr.version)
                 self._block_dct[chunkhdr.id] = chunk
@@ -1007,10 +1086,8 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            for mat in self.initial_pos_matrices:
-                mat.pos.x *= scale
-                mat.pos.y *= scale
-                mat.pos.z *= scale
+            self.scale_basic_values(
+                [mat.pos for mat in self.initial_pos_matrices], scale)
 
         def get_global_node_parent(self):
             """Get the block parent (used for instance in the QSkope global
@@ -1022,10 +1099,7 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            for vert in self.vertices:
-                vert.x *= scale
-                vert.y *= scale
-                vert.z *= scale
+            self.scale_basic_values(self.vertices, scale)
 
     class Matrix33:
         def as_list(self):
@@ -1773,17 +1847,9 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            for vert in self.vertices:
-                vert.p.x *= scale
-                vert.p.y *= scale
-                vert.p.z *= scale
-
-            self.min_bound.x *= scale
-            self.min_bound.y *= scale
-            self.min_bound.z *= scale
-            self.max_bound.x *= scale
-            self.max_bound.y *= scale
-            self.max_bound.z *= scale
+            self.scale_basic_values(
+                [vert.p for vert in self.vertices], scale)
+            self.scale_basic_values([self.min_bound, self.max_bound], scale)
 
         def get_vertices(self):
             """Generator for all vertices."""
@@ -2663,10 +2729,9 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            for morphvert in self.morph_vertices:
-                morphvert.vertex_target.x *= scale
-                morphvert.vertex_target.y *= scale
-                morphvert.vertex_target.z *= scale
+            self.scale_basic_values(
+                [morphvert.vertex_target
+                 for morphvert in self.morph_vertices], scale)
 
         def get_global_node_parent(self):
             """Get the block parent (used for instance in the QSkope global view)."""
@@ -2681,11 +2746,9 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            for meshsubset in self.mesh_subsets:
-                meshsubset.radius *= scale
-                meshsubset.center.x *= scale
-                meshsubset.center.y *= scale
-                meshsubset.center.z *= scale
+            self.scale_basic_values(self.mesh_subsets, scale, names=("radius",))
+            self.scale_basic_values(
+                [meshsubset.center for meshsubset in self.mesh_subsets], scale)
 
     class MtlChunk:
         def get_name_shader_script(self):
@@ -2740,12 +2803,9 @@ chunk size mismatch when reading %s at 0x%08X
             """Apply scale factor on data."""
             if abs(scale - 1.0) < CgfFormat.EPSILON:
                 return
-            self.transform.m_41 *= scale
-            self.transform.m_42 *= scale
-            self.transform.m_43 *= scale
-            self.pos.x *= scale
-            self.pos.y *= scale
-            self.pos.z *= scale
+            self.scale_basic_values(
+                [self.transform], scale, names=("m_41", "m_42", "m_43"))
+            self.scale_basic_values([self.pos], scale)
 
         def update_pos_rot_scl(self):
             """Update position, rotation, and scale, from the transform."""
@@ -112,6 +112,7 @@ class EspFormat(pyffi.object_models.xml.FileFormat):
     uint64 = pyffi.object_models.common.UInt64
     ZString = pyffi.object_models.common.ZString
     class RecordType(pyffi.object_models.common.FixedString):
+        __slots__ = ()
         _len = 4
 
     # implementation of esp-specific basic types
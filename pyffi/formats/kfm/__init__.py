@@ -245,6 +245,8 @@ class KfmFormat(pyffi.object_models.xml.FileFormat):
 
     # other types with internal implementation
     class FilePath(SizedString):
+        __slots__ = ()
+
         def get_hash(self, data=None):
             """Return a hash value for this value.
             For file paths, the hash value is case insensitive.
@@ -42,6 +42,42 @@ NiTriShapeData
 test
 >>> stream.close()
 
+Stream the blocks of a NIF file
+^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+>>> stream = open('tests/nif/test.nif', 'rb')
+>>> for index, block_type, offset, size, block in NifFormat.iter_blocks(
+...         stream, types=[NifFormat.NiNode]):
+...     print(index, block_type, block.name.decode("ascii") if block else None)
+0 NiNode test
+1 NiTriShape None
+2 NiTriShapeData None
+>>> stream.close()
+
+Write unchanged blocks as they were read
+^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+>>> from io import BytesIO
+>>> stream = open('tests/nif/test_check_tangentspace2.nif', 'rb')
+>>> original = stream.read()
+>>> stream.close()
+>>> data = NifFormat.Data()
+>>> data.read(BytesIO(original))
+>>> [block._dirty for block in data.blocks]
+[False, False, False, False, False, False]
+>>> data.blocks[4].alpha = 0.5
+>>> output = BytesIO()
+>>> data.write(output)
+>>> # only the material is written field by field
+>>> [source is not None for source in data._get_block_sources()]
+[True, True, True, True, False, True]
+>>> output.getvalue()[-282:] == original[-282:]
+True
+>>> data = NifFormat.Data()
+>>> data.read(BytesIO(output.getvalue()))
+>>> data.blocks[4].alpha
+0.5
+
 Parse all NIF files in a directory tree
 ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
 
@@ -352,6 +388,7 @@ import pyffi.formats.dds
 import pyffi.object_models.common
 import pyffi.object_models
 from pyffi.object_models.xml import FileFormat
+import pyffi.utils.columns
 import pyffi.utils.inertia
 from pyffi.utils.mathutils import * # XXX todo get rid of from XXX import *
 import pyffi.utils.mopp
@@ -405,6 +442,8 @@ class NifFormat(FileFormat):
 
     class StringOffset(pyffi.object_models.common.Int):
         """This is just an integer with -1 as default value."""
+        __slots__ = ()
+
         def __init__(self, **kwargs):
             pyffi.object_models.common.Int.__init__(self, **kwargs)
             self.set_value(-1)
@@ -421,6 +460,8 @@ class NifFormat(FileFormat):
         >>> i.get_value()
         True
         """
+        __slots__ = ('_value',)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value(False)
@@ -469,23 +510,67 @@ class NifFormat(FileFormat):
                                          int(self._value)))
 
     class Flags(pyffi.object_models.common.UShort):
+        __slots__ = ()
+
         def __str__(self):
             return hex(self.get_value())
 
     class Ref(BasicBase):
         """Reference to another block."""
+        __slots__ = ('_template', '_value', '_tree_data')
         _is_template = True
         _has_links = True
         _has_refs = True
+
+        _num_changes = 0
+        """Number of times that a reference which is not in the block
+        tree index of any L{NifFormat.Data} has been set. Such changes
+        may concern any index."""
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self._template = kwargs.get("template")
-            self.set_value(None)
+            self._value = None
+            # weak reference to the data whose block tree index
+            # contains this reference, see Data._update_tree_index
+            self._tree_data = None
 
         def get_value(self):
             return self._value
 
+        @staticmethod
+        def _count_change(tree_data):
+            """Count a change of the block tree of the given data.
+
+            :param tree_data: Weak reference to the data, or ``None``
+                if not known.
+            """
+            data = tree_data() if tree_data is not None else None
+            if data is not None:
+                data._tree_changes += 1
+            else:
+                NifFormat.Ref._num_changes += 1
+
+        @staticmethod
+        def _on_resize(array):
+            """Called by L{pyffi.object_models.xml.array.Array} when an
+            array of references is resized.
+            """
+            owner = array._parent() if array._parent is not None else None
+            tree_data = getattr(owner, "_tree_data", None)
+            NifFormat.Ref._count_change(tree_data)
+            if tree_data is not None:
+                for ref in array._elementList():
+                    ref._tree_data = tree_data
+
         def set_value(self, value):
+            self._count_change(self._tree_data)
+            self._set_value(value)
+
+        def _set_value(self, value):
+            """Set the value without counting a change of the block
+            tree, when reading.
+            """
             if value is None:
                 self._value = None
             else:
@@ -506,7 +591,7 @@ class NifFormat(FileFormat):
                 return None
 
         def read(self, stream, data):
-            self.set_value(None) # fix_links will set this field
+            self._set_value(None) # fix_links will set this field
             block_index, = struct.unpack(data._byte_order + 'i',
                                          stream.read(4))
             data._link_stack.append(block_index)
@@ -535,15 +620,15 @@ class NifFormat(FileFormat):
             # case when there's no link
             if data.version >= 0x0303000D:
                 if block_index == -1: # link by block number
-                    self.set_value(None)
+                    self._set_value(None)
                     return
             else:
                 if block_index == 0: # link by pointer
-                    self.set_value(None)
+                    self._set_value(None)
                     return
             # other case: look up the link and check the link type
             block = data._block_dct[block_index]
-            self.set_value(block)
+            self._set_value(block)
             if self._template != None:
                 if not isinstance(block, self._template):
                     #raise TypeError('expected an instance of %s but got instance of %s'%(self._template, block.__class__))
@@ -559,6 +644,9 @@ class NifFormat(FileFormat):
                 return []
 
         def get_refs(self, data=None):
+            if data is not None:
+                # changes of this reference now concern data
+                self._tree_data = weakref.ref(data)
             val = self.get_value()
             if val is not None:
                 return [val]
@@ -602,6 +690,7 @@ class NifFormat(FileFormat):
 
     class Ptr(Ref):
         """A weak reference to another block, used to point up the hierarchy tree. The reference is not returned by the L{get_refs} function to avoid infinite recursion."""
+        __slots__ = ()
         _is_template = True
         _has_links = True
         _has_refs = False
@@ -612,6 +701,10 @@ class NifFormat(FileFormat):
             return self._value() if self._value is not None else None
 
         def set_value(self, value):
+            # pointers are not part of the block tree
+            self._set_value(value)
+
+        def _set_value(self, value):
             if value is None:
                 self._value = None
             else:
@@ -663,6 +756,8 @@ class NifFormat(FileFormat):
         >>> str(m)
         'Hi There'
         """
+        __slots__ = ('_value',)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value('')
@@ -690,6 +785,8 @@ class NifFormat(FileFormat):
             stream.write("\x0a".encode("ascii"))
 
     class HeaderString(BasicBase):
+        __slots__ = ()
+
         def __str__(self):
             return 'NetImmerse/Gamebryo File Format, Version x.x.x.x'
 
@@ -770,6 +867,8 @@ class NifFormat(FileFormat):
                 return "%s File Format, Version %s" % (s, v)
 
     class FileVersion(pyffi.object_models.common.UInt):
+        __slots__ = ()
+
         def set_value(self):
             raise NotImplementedError("file version is specified via data")
 
@@ -829,6 +928,8 @@ class NifFormat(FileFormat):
 
     class ShortString(BasicBase):
         """Another type for strings."""
+        __slots__ = ('_value',)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self._value = ''.encode("ascii")
@@ -864,6 +965,7 @@ class NifFormat(FileFormat):
             stream.write('\x00'.encode("ascii"))
 
     class string(SizedString):
+        __slots__ = ()
         _has_strings = True
 
         def get_size(self, data=None):
@@ -920,6 +1022,8 @@ class NifFormat(FileFormat):
 
     class FilePath(string):
         """A file path."""
+        __slots__ = ()
+
         def get_hash(self, data=None):
             """Returns a case insensitive hash value."""
             return self.get_value().lower()
@@ -927,6 +1031,8 @@ class NifFormat(FileFormat):
     class ByteArray(BasicBase):
         """Array (list) of bytes. Implemented as basic type to speed up reading
         and also to prevent data to be dumped by __str__."""
+        __slots__ = ('_value',)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value("".encode()) # b'' for > py25
@@ -959,6 +1065,10 @@ class NifFormat(FileFormat):
     class ByteMatrix(BasicBase):
         """Matrix of bytes. Implemented as basic type to speed up reading
         and to prevent data being dumped by __str__."""
+        __slots__ = ('_value',)
+
+        _has_mutable_value = True
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value([])
@@ -1048,6 +1158,29 @@ class NifFormat(FileFormat):
         while len(ver_list) < 4: ver_list.append(0)
         return (ver_list[0] << 24) + (ver_list[1] << 16) + (ver_list[2] << 8) + ver_list[3]
 
+    @classmethod
+    def iter_blocks(cls, stream, types=None):
+        """Read the blocks of a nif file one at a time, for tools which
+        only need to look at every block once. See
+        :meth:`NifFormat.Data.iter_blocks`.
+
+        >>> stream = open('tests/nif/test_check_tangentspace2.nif', 'rb')
+        >>> from collections import Counter
+        >>> sorted(Counter(
+        ...     block_type for index, block_type, offset, size, block
+        ...     in NifFormat.iter_blocks(stream, types=[])).items())
+        [('BSShaderPPLightingProperty', 1), ('BSShaderTextureSet', 1), ('NiMaterialProperty', 1), ('NiNode', 1), ('NiTriStrips', 1), ('NiTriStripsData', 1)]
+        >>> stream.close()
+
+        :param stream: The stream from which to read.
+        :type stream: ``file``
+        :param types: The block types to decode, or ``None`` for all.
+        :type types: ``list``
+        :return: Generator for ``(index, block_type, offset, size,
+            block)``.
+        """
+        return cls.Data().iter_blocks(stream, types=types)
+
     # exceptions
     class NifError(Exception):
         """Standard nif exception class."""
@@ -1081,6 +1214,17 @@ class NifFormat(FileFormat):
         _string_list = None
         _block_index_dct = None
 
+        # version, byte order, and strings of the file that was read,
+        # see _get_block_sources
+        _source_state = None
+
+        # index of the block tree, see get_blocks_by_type
+        _tree_blocks = None
+        _tree_parents = None
+        _tree_blocks_by_type = None
+        _tree_state = None
+        _tree_changes = 0
+
         class VersionUInt(pyffi.object_models.common.UInt):
             def set_value(self, value):
                 if value is None:
@@ -1226,6 +1370,133 @@ class NifFormat(FileFormat):
             self.user_version = userver
             self.user_version_2 = userver2
 
+        # block tree index
+
+        def _update_tree_index(self):
+            """Rebuild the index of the block tree, if the roots, or
+            any reference, changed since it was last built.
+
+            Blocks and references in the tree remember this data, so
+            changes are counted here, and do not affect the index of
+            other data. Changes of references which are not in any
+            index yet, such as of new blocks, are counted for all data.
+
+            >>> from pyffi.formats.nif import NifFormat
+            >>> data = NifFormat.Data()
+            >>> shape = NifFormat.NiTriShape()
+            >>> data.roots = [shape]
+            >>> other = NifFormat.Data()
+            >>> other.roots = [NifFormat.NiNode()]
+            >>> data._update_tree_index()
+            >>> other._update_tree_index()
+            >>> state = other._tree_state
+            >>> shape.add_property(NifFormat.NiMaterialProperty())
+            >>> shape.data = NifFormat.NiTriShapeData()
+            >>> other._update_tree_index()
+            >>> other._tree_state is state
+            True
+            >>> data.get_blocks_by_type(NifFormat.NiTriShapeData) == [shape.data]
+            True
+            """
+            state = (NifFormat.Ref._num_changes, self._tree_changes,
+                     [id(root) for root in self.roots])
+            if state == self._tree_state:
+                return
+            tree_data = weakref.ref(self)
+            blocks = []
+            visited = set()
+            parents = {}
+            stack = list(reversed(self.roots))
+            while stack:
+                block = stack.pop()
+                if block in visited:
+                    continue
+                visited.add(block)
+                blocks.append(block)
+                block._tree_data = tree_data
+                refs = block.get_refs(data=self)
+                stack.extend(reversed(refs))
+                for child in refs:
+                    block_parents = parents.setdefault(child, [])
+                    if block not in block_parents:
+                        block_parents.append(block)
+            self._tree_blocks = blocks
+            self._tree_parents = parents
+            self._tree_blocks_by_type = {}
+            self._tree_state = state
+
+        def get_blocks_by_type(self, block_type):
+            """Return all blocks in the tree of the given type, including
+            instances of subclasses, in the order that they are found when
+            walking the tree from the roots. The index that is used
+            for this is built on first call, and rebuilt when references
+            have changed, so repeated calls do not walk the tree.
+
+            >>> from pyffi.formats.nif import NifFormat
+            >>> data = NifFormat.Data()
+            >>> root = NifFormat.NiNode()
+            >>> shape = NifFormat.NiTriShape()
+            >>> strips = NifFormat.NiTriStrips()
+            >>> root.add_child(shape)
+            >>> root.add_child(strips)
+            >>> data.roots = [root]
+            >>> [block.__class__.__name__
+            ...  for block in data.get_blocks_by_type(NifFormat.NiTriBasedGeom)]
+            ['NiTriShape', 'NiTriStrips']
+            >>> root.remove_child(strips)
+            >>> [block.__class__.__name__
+            ...  for block in data.get_blocks_by_type(NifFormat.NiTriBasedGeom)]
+            ['NiTriShape']
+            >>> prop = NifFormat.NiMaterialProperty()
+            >>> shape.add_property(prop)
+            >>> data.get_blocks_by_type(NifFormat.NiMaterialProperty) == [prop]
+            True
+            >>> data.get_block_parents(prop) == [shape]
+            True
+            >>> shape.remove_property(prop)
+            >>> data.get_blocks_by_type(NifFormat.NiMaterialProperty)
+            []
+            >>> data.get_block_parents(prop)
+            []
+
+            :param block_type: The block type.
+            :type block_type: ``type``
+            :return: The blocks.
+            :rtype: ``list`` of L{NifFormat.NiObject}
+            """
+            self._update_tree_index()
+            try:
+                return list(self._tree_blocks_by_type[block_type])
+            except KeyError:
+                blocks = [block for block in self._tree_blocks
+                          if isinstance(block, block_type)]
+                self._tree_blocks_by_type[block_type] = blocks
+                return list(blocks)
+
+        def get_block_parents(self, block):
+            """Return all blocks in the tree which refer to the given
+            block. Uses the same index as L{get_blocks_by_type}.
+
+            >>> from pyffi.formats.nif import NifFormat
+            >>> data = NifFormat.Data()
+            >>> root = NifFormat.NiNode()
+            >>> shape = NifFormat.NiTriShape()
+            >>> root.add_child(shape)
+            >>> data.roots = [root]
+            >>> data.get_block_parents(shape) == [root]
+            True
+            >>> data.get_block_parents(root)
+            []
+
+            :param block: The block.
+            :type block: L{NifFormat.NiObject}
+            :return: The parent blocks, or an empty list if the block is
+                a root, or is not in the tree.
+            :rtype: ``list`` of L{NifFormat.NiObject}
+            """
+            self._update_tree_index()
+            return list(self._tree_parents.get(block, []))
+
         # GlobalNode
 
         def get_global_child_nodes(self, edge_filter=EdgeFilter()):
@@ -1297,6 +1568,129 @@ class NifFormat(FileFormat):
             self._string_list = [s for s in self.header.strings]
             self._block_dct = {} # maps block index to actual block
             self.blocks = [] # records all blocks as read from file in order
+            # the bytes of all blocks, from in memory streams, so blocks
+            # which do not change can be written as they were read
+            getvalue = getattr(stream, "getvalue", None)
+            buffer_ = memoryview(getvalue()) if getvalue else None
+            sources = []
+            num_links = 0
+            for block_num, block_index, block_type, offset, size, block, is_root in self._read_blocks(stream):
+                if block_index in self._block_dct:
+                    raise NifFormat.NifError(
+                        'duplicate block index (0x%08X at 0x%08X)'
+                        %(block_index, offset))
+                # store block index
+                self._block_dct[block_index] = block
+                self.blocks.append(block)
+                # add block to roots if flagged as such
+                if is_root:
+                    self.roots.append(block)
+                # store bytes and link indices of the block
+                if buffer_ is not None:
+                    sources.append((buffer_[offset:offset + size],
+                                    self._link_stack[num_links:]))
+                    num_links = len(self._link_stack)
+
+            # read footer
+            ftr = NifFormat.Footer()
+            ftr.read(stream, self)
+
+            # check if we are at the end of the file
+            if stream.read(1):
+                logger.error(
+                    'End of file not reached: corrupt nif file?')
+
+            # fix links in blocks and footer (header has no links)
+            for block in self.blocks:
+                block.fix_links(self)
+            ftr.fix_links(self)
+            # the link stack should be empty now
+            if self._link_stack:
+                raise NifFormat.NifError('not all links have been popped from the stack (bug?)')
+            # blocks are unchanged until they are accessed from now on
+            if buffer_ is not None:
+                for block, source in zip(self.blocks, sources):
+                    block._source = source
+                    block._dirty = False
+                self._source_state = (
+                    self.version, self.user_version, self.user_version_2,
+                    self._byte_order, list(self.header.strings))
+            else:
+                self._source_state = None
+            # add root objects in footer to roots list
+            if self.version >= 0x0303000D:
+                for root in ftr.roots:
+                    self.roots.append(root)
+
+        def iter_blocks(self, stream, types=None):
+            """Read a nif file one block at a time, without building
+            the block tree: links are not resolved, and no reference to
+            a block is kept once the next block is read, so memory use
+            does not grow with the size of the file. Blocks whose type
+            is not requested are skipped without decoding them if the
+            file stores block sizes (20.2.0.7 and up), and decoded and
+            dropped otherwise. Does not reset stream position.
+
+            >>> stream = open('tests/nif/test_check_tangentspace2.nif', 'rb')
+            >>> data = NifFormat.Data()
+            >>> for index, block_type, offset, size, block in data.iter_blocks(
+            ...         stream, types=["NiMaterialProperty"]):
+            ...     print(index, block_type, offset, size,
+            ...           block.name.decode("ascii") if block else None)
+            0 NiNode 265 88 None
+            1 NiTriStrips 353 101 None
+            2 BSShaderPPLightingProperty 454 54 None
+            3 BSShaderTextureSet 508 36 None
+            4 NiMaterialProperty 544 48 Material
+            5 NiTriStripsData 592 274 None
+            >>> data.blocks
+            []
+            >>> stream.close()
+
+            :param stream: The stream from which to read.
+            :type stream: ``file``
+            :param types: The block types to decode, as names or
+                classes; blocks of derived types are decoded as well.
+                If ``None``, all blocks are decoded.
+            :type types: ``list``
+            :return: Generator for ``(index, block_type, offset, size,
+                block)``, where *index* is the number of the block in
+                the file, *block_type* the name of its type, *offset*
+                and *size* locate the block data in the stream, and
+                *block* is the decoded block, or ``None`` if its type
+                was not requested.
+            """
+            if types is not None:
+                types = tuple(
+                    getattr(NifFormat, block_type)
+                    if isinstance(block_type, str) else block_type
+                    for block_type in types)
+            self.inspect_version_only(stream)
+            self.header.read(stream, data=self)
+            self.roots = []
+            self.blocks = []
+            self._link_stack = []
+            self._string_list = [s for s in self.header.strings]
+            for block_num, block_index, block_type, offset, size, block, is_root in self._read_blocks(stream, types):
+                # links are never fixed
+                del self._link_stack[:]
+                yield block_num, block_type, offset, size, block
+                # drop the block before reading the next one
+                block = None
+
+        def _read_blocks(self, stream, types=None):
+            """Read the blocks which follow the header. Helper
+            function for :meth:`read` and :meth:`iter_blocks`.
+
+            :param stream: The stream from which to read.
+            :type stream: ``file``
+            :param types: Classes of the blocks to decode, or ``None``
+                to decode all blocks.
+            :type types: ``tuple``
+            :return: Generator for ``(block_num, block_index,
+                block_type, offset, size, block, is_root)``.
+            """
+            logger = logging.getLogger("pyffi.nif.data")
             block_num = 0 # the current block numner
 
             while True:
@@ -1355,77 +1749,64 @@ class NifFormat(FileFormat):
                     else:
                         block_index, = struct.unpack(
                             self._byte_order + 'I', stream.read(4))
-                        if block_index in self._block_dct:
-                            raise NifFormat.NifError(
-                                'duplicate block index (0x%08X at 0x%08X)'
-                                %(block_index, stream.tell()))
-                # create the block
+                # get the block class
                 try:
-                    block = getattr(NifFormat, block_type)()
+                    block_class = getattr(NifFormat, block_type)
                 except AttributeError:
                     raise ValueError(
                         "Unknown block type '%s'." % block_type)
-                logger.debug("Reading %s block at 0x%08X"
-                             % (block_type, stream.tell()))
-                # read the block
-                try:
-                    block.read(stream, self)
-                except:
-                    logger.exception("Reading %s failed" % block.__class__)
-                    #logger.error("link stack: %s" % self._link_stack)
-                    #logger.error("block that failed:")
-                    #logger.error("%s" % block)
-                    raise
-                # complete NiDataStream data
-                if block_type == "NiDataStream":
-                    block.usage = data_stream_usage
-                    block.access.from_int(data_stream_access, self)
-                # store block index
-                self._block_dct[block_index] = block
-                self.blocks.append(block)
-                # check block size
+                offset = stream.tell()
                 if self.version >= 0x14020007:
-                    logger.debug("Checking block size")
-                    calculated_size = block.get_size(data=self)
-                    if calculated_size != self.header.block_size[block_num]:
-                        extra_size = self.header.block_size[block_num] - calculated_size
-                        logger.error(
-                            "Block size check failed: corrupt nif file "
-                            "or bad nif.xml?")
-                        logger.error("Skipping %i bytes in %s"
-                                     % (extra_size, block.__class__.__name__))
-                        # skip bytes that were missed
-                        stream.seek(extra_size, 1)
-                # add block to roots if flagged as such
-                if is_root:
-                    self.roots.append(block)
+                    size = self.header.block_size[block_num]
+                else:
+                    size = None
+                decode = types is None or issubclass(block_class, types)
+                if not decode and size is not None:
+                    # skip the block
+                    stream.seek(size, 1)
+                    block = None
+                else:
+                    # create the block
+                    block = block_class()
+                    logger.debug("Reading %s block at 0x%08X"
+                                 % (block_type, offset))
+                    # read the block
+                    try:
+                        block.read(stream, self)
+                    except:
+                        logger.exception("Reading %s failed" % block.__class__)
+                        #logger.error("link stack: %s" % self._link_stack)
+                        #logger.error("block that failed:")
+                        #logger.error("%s" % block)
+                        raise
+                    # complete NiDataStream data
+                    if block_type == "NiDataStream":
+                        block.usage = data_stream_usage
+                        block.access.from_int(data_stream_access, self)
+                    # check block size
+                    if size is not None:
+                        logger.debug("Checking block size")
+                        calculated_size = block.get_size(data=self)
+                        if calculated_size != size:
+                            extra_size = size - calculated_size
+                            logger.error(
+                                "Block size check failed: corrupt nif file "
+                                "or bad nif.xml?")
+                            logger.error("Skipping %i bytes in %s"
+                                         % (extra_size, block.__class__.__name__))
+                            # skip bytes that were missed
+                            stream.seek(extra_size, 1)
+                    else:
+                        size = stream.tell() - offset
+                    if not decode:
+                        block = None
+                yield block_num, block_index, block_type, offset, size, block, is_root
                 # check if we are done
                 block_num += 1
                 if self.version >= 0x0303000D:
                     if block_num >= self.header.num_blocks:
                         break
 
-            # read footer
-            ftr = NifFormat.Footer()
-            ftr.read(stream, self)
-
-            # check if we are at the end of the file
-            if stream.read(1):
-                logger.error(
-                    'End of file not reached: corrupt nif file?')
-
-            # fix links in blocks and footer (header has no links)
-            for block in self.blocks:
-                block.fix_links(self)
-            ftr.fix_links(self)
-            # the link stack should be empty now
-            if self._link_stack:
-                raise NifFormat.NifError('not all links have been popped from the stack (bug?)')
-            # add root objects in footer to roots list
-            if self.version >= 0x0303000D:
-                for root in ftr.roots:
-                    self.roots.append(root)
-
         def write(self, stream):
             """Write a nif file. The L{header} and the L{blocks} are recalculated
             from the tree at L{roots} (e.g. list of block types, number of blocks,
@@ -1448,8 +1829,19 @@ class NifFormat(FileFormat):
                 for block in root.tree():
                     self._string_list.extend(
                         block.get_strings(self))
-            self._string_list = list(set(self._string_list)) # ensure unique elements
+            if self._source_state is not None:
+                # keep strings of the original file at their index, so
+                # more blocks can be written as they were read
+                used = set(self._string_list)
+                self._string_list = [
+                    s for s in dict.fromkeys(self._source_state[4])
+                    if s in used]
+                self._string_list.extend(sorted(
+                    used.difference(self._string_list)))
+            else:
+                self._string_list = list(set(self._string_list)) # ensure unique elements
             #print(self._string_list) # debug
+            sources = self._get_block_sources()
 
             self.header.user_version = self.user_version # TODO dedicated type for user_version similar to FileVersion
             # for oblivion CS; apparently this is the version of the bhk blocks
@@ -1471,8 +1863,10 @@ class NifFormat(FileFormat):
             for i, s in enumerate(self._string_list):
                 self.header.strings[i] = s
             self.header.block_size.update_size()
-            for i, block in enumerate(self.blocks):
-                self.header.block_size[i] = block.get_size(data=self)
+            for i, (block, source) in enumerate(zip(self.blocks, sources)):
+                self.header.block_size[i] = (
+                    len(source) if source is not None
+                    else block.get_size(data=self))
             #if verbose >= 2:
             #    print(hdr)
 
@@ -1487,7 +1881,7 @@ class NifFormat(FileFormat):
             logger.debug("Writing header")
             #logger.debug("%s" % self.header)
             self.header.write(stream, self)
-            for block in self.blocks:
+            for block, source in zip(self.blocks, sources):
                 # signal top level object if block is a root object
                 if self.version < 0x0303000D and block in self.roots:
                     s = NifFormat.SizedString()
@@ -1510,13 +1904,72 @@ class NifFormat(FileFormat):
                     stream.write(struct.pack(self._byte_order + 'i',
                                              self._block_index_dct[block]))
                 # write block
-                block.write(stream, self)
+                if source is not None:
+                    stream.write(source)
+                else:
+                    block.write(stream, self)
             if self.version < 0x0303000D:
                 s = NifFormat.SizedString()
                 s.set_value("End Of File")
                 s.write(stream, self)
             ftr.write(stream, self)
 
+        def _get_block_sources(self):
+            """For every block in :attr:`blocks`, get the bytes it was
+            read from if it can be written as it was read, or ``None``
+            if it must be written field by field. A block can be written
+            as it was read if it is not dirty (see
+            :attr:`pyffi.object_models.xml.struct_.StructBase._dirty`),
+            if the file version and byte order did not change, and if
+            all blocks and strings which it refers to by index kept
+            their index. Helper function for :meth:`write`, after the
+            block list and string list have been set up.
+
+            :return: The bytes of each block, or ``None``.
+            :rtype: ``list``
+            """
+            no_sources = [None] * len(self.blocks)
+            if self._source_state is None:
+                return no_sources
+            version, user_version, user_version_2, byte_order, strings = (
+                self._source_state)
+            if (version != self.version
+                or user_version != self.user_version
+                or user_version_2 != self.user_version_2
+                or byte_order != self._byte_order
+                # links of old versions are memory addresses
+                or version < 0x0303000D):
+                return no_sources
+            # string indices matter only for versions with a string table
+            check_strings = (version >= 0x14010003)
+            if check_strings:
+                if len(set(strings)) != len(strings):
+                    return no_sources
+                old_string_index = dict(
+                    (s, i) for i, s in enumerate(strings))
+                new_string_index = dict(
+                    (s, i) for i, s in enumerate(self._string_list))
+            sources = []
+            for block in self.blocks:
+                source = block._source
+                if source is None or block._dirty:
+                    sources.append(None)
+                    continue
+                view, links = source
+                # note: the index of a missing block is written as -1
+                if ([self._block_index_dct.get(link, -1)
+                     for link in block.get_links(self)]
+                    != [index for index in links if index != -1]):
+                    sources.append(None)
+                    continue
+                if check_strings and block._has_strings:
+                    if any(old_string_index.get(s) != new_string_index.get(s)
+                           for s in block.get_strings(self)):
+                        sources.append(None)
+                        continue
+                sources.append(view)
+            return sources
+
         def _makeBlockList(
             self, root, block_index_dct, block_type_list, block_type_dct):
             """This is a helper function for write to set up the list of all blocks,
@@ -2216,9 +2669,7 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Apply scale factor C{scale} on data."""
             # apply scale on dimensions
-            self.dimensions.x *= scale
-            self.dimensions.y *= scale
-            self.dimensions.z *= scale
+            self.scale_basic_values([self.dimensions], scale)
             self.minimum_size  *= scale
 
         def get_mass_center_inertia(self, density = 1, solid = True):
@@ -2237,12 +2688,8 @@ class NifFormat(FileFormat):
             self.radius *= scale
             self.radius_1 *= scale
             self.radius_2 *= scale
-            self.first_point.x *= scale
-            self.first_point.y *= scale
-            self.first_point.z *= scale
-            self.second_point.x *= scale
-            self.second_point.y *= scale
-            self.second_point.z *= scale
+            self.scale_basic_values(
+                [self.first_point, self.second_point], scale)
 
         def get_mass_center_inertia(self, density = 1, solid = True):
             """Return mass, center, and inertia tensor."""
@@ -2304,12 +2751,8 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Apply scale factor on data."""
             if abs(scale - 1.0) < NifFormat.EPSILON: return
-            for v in self.vertices:
-                v.x *= scale
-                v.y *= scale
-                v.z *= scale
-            for n in self.normals:
-                n.w *= scale
+            self.scale_basic_values(self.vertices, scale)
+            self.scale_basic_values(self.normals, scale, names=("w",))
 
         def get_mass_center_inertia(self, density = 1, solid = True):
             """Return mass, center, and inertia tensor."""
@@ -2324,12 +2767,9 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Scale data."""
             # apply scale on transform
-            self.sub_constraint.limited_hinge.pivot_a.x *= scale
-            self.sub_constraint.limited_hinge.pivot_a.y *= scale
-            self.sub_constraint.limited_hinge.pivot_a.z *= scale
-            self.sub_constraint.limited_hinge.pivot_b.x *= scale
-            self.sub_constraint.limited_hinge.pivot_b.y *= scale
-            self.sub_constraint.limited_hinge.pivot_b.z *= scale
+            limited_hinge = self.sub_constraint.limited_hinge
+            self.scale_basic_values(
+                [limited_hinge.pivot_a, limited_hinge.pivot_b], scale)
 
         def update_a_b(self, parent):
             """Update the B data from the A data. The parent argument is simply a
@@ -2395,18 +2835,11 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Scale data."""
             # apply scale on transform
-            self.sub_constraint.ragdoll.pivot_a.x *= scale
-            self.sub_constraint.ragdoll.pivot_a.y *= scale
-            self.sub_constraint.ragdoll.pivot_a.z *= scale
-            self.sub_constraint.ragdoll.pivot_b.x *= scale
-            self.sub_constraint.ragdoll.pivot_b.y *= scale
-            self.sub_constraint.ragdoll.pivot_b.z *= scale
-            self.sub_constraint.limited_hinge.pivot_a.x *= scale
-            self.sub_constraint.limited_hinge.pivot_a.y *= scale
-            self.sub_constraint.limited_hinge.pivot_a.z *= scale
-            self.sub_constraint.limited_hinge.pivot_b.x *= scale
-            self.sub_constraint.limited_hinge.pivot_b.y *= scale
-            self.sub_constraint.limited_hinge.pivot_b.z *= scale
+            ragdoll = self.sub_constraint.ragdoll
+            limited_hinge = self.sub_constraint.limited_hinge
+            self.scale_basic_values(
+                [ragdoll.pivot_a, ragdoll.pivot_b,
+                 limited_hinge.pivot_a, limited_hinge.pivot_b], scale)
 
         def update_a_b(self, parent):
             """Update the B data from the A data."""
@@ -3096,12 +3529,8 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Scale data."""
             # apply scale on transform
-            self.ragdoll.pivot_a.x *= scale
-            self.ragdoll.pivot_a.y *= scale
-            self.ragdoll.pivot_a.z *= scale
-            self.ragdoll.pivot_b.x *= scale
-            self.ragdoll.pivot_b.y *= scale
-            self.ragdoll.pivot_b.z *= scale
+            self.scale_basic_values(
+                [self.ragdoll.pivot_a, self.ragdoll.pivot_b], scale)
 
         def update_a_b(self, parent):
             """Update the B data from the A data."""
@@ -3127,28 +3556,17 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Apply scale factor <scale> on data."""
             # apply scale on transform
-            self.translation.x *= scale
-            self.translation.y *= scale
-            self.translation.z *= scale
+            self.scale_basic_values([self.translation], scale)
 
             # apply scale on center of gravity
-            self.center.x *= scale
-            self.center.y *= scale
-            self.center.z *= scale
+            self.scale_basic_values([self.center], scale)
 
             # apply scale on inertia tensor
-            self.inertia.m_11 *= (scale ** 2)
-            self.inertia.m_12 *= (scale ** 2)
-            self.inertia.m_13 *= (scale ** 2)
-            self.inertia.m_14 *= (scale ** 2)
-            self.inertia.m_21 *= (scale ** 2)
-            self.inertia.m_22 *= (scale ** 2)
-            self.inertia.m_23 *= (scale ** 2)
-            self.inertia.m_24 *= (scale ** 2)
-            self.inertia.m_31 *= (scale ** 2)
-            self.inertia.m_32 *= (scale ** 2)
-            self.inertia.m_33 *= (scale ** 2)
-            self.inertia.m_34 *= (scale ** 2)
+            self.scale_basic_values(
+                [self.inertia], scale ** 2,
+                names=("m_11", "m_12", "m_13", "m_14",
+                       "m_21", "m_22", "m_23", "m_24",
+                       "m_31", "m_32", "m_33", "m_34"))
 
         def update_mass_center_inertia(self, density=1, solid=True, mass=None):
             """Look at all the objects under this rigid body and update the mass,
@@ -3209,9 +3627,8 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Apply scale factor <scale> on data."""
             # apply scale on translation
-            self.transform.m_14 *= scale
-            self.transform.m_24 *= scale
-            self.transform.m_34 *= scale
+            self.scale_basic_values(
+                [self.transform], scale, names=("m_14", "m_24", "m_34"))
 
         def get_mass_center_inertia(self, density=1, solid=True):
             """Return mass, center, and inertia tensor."""
@@ -3232,12 +3649,7 @@ class NifFormat(FileFormat):
     class BSBound:
         def apply_scale(self, scale):
             """Scale data."""
-            self.center.x *= scale
-            self.center.y *= scale
-            self.center.z *= scale
-            self.dimensions.x *= scale
-            self.dimensions.y *= scale
-            self.dimensions.z *= scale
+            self.scale_basic_values([self.center, self.dimensions], scale)
 
     class BSDismemberSkinInstance:
         def get_dismember_partitions(self):
@@ -3365,10 +3777,7 @@ class NifFormat(FileFormat):
             """Apply scale factor on data."""
             if abs(scale - 1.0) < NifFormat.EPSILON:
                 return
-            for vert in self.vertices:
-                vert.x *= scale
-                vert.y *= scale
-                vert.z *= scale
+            self.scale_basic_values(self.vertices, scale)
 
     class InertiaMatrix:
         def as_list(self):
@@ -4043,16 +4452,11 @@ class NifFormat(FileFormat):
 
             :param scale: The scale factor."""
             # apply scale on translation
-            self.translation.x *= scale
-            self.translation.y *= scale
-            self.translation.z *= scale
+            self.scale_basic_values([self.translation], scale)
             # apply scale on bounding box
-            self.bounding_box.translation.x *= scale
-            self.bounding_box.translation.y *= scale
-            self.bounding_box.translation.z *= scale
-            self.bounding_box.radius.x *= scale
-            self.bounding_box.radius.y *= scale
-            self.bounding_box.radius.z *= scale
+            self.scale_basic_values(
+                [self.bounding_box.translation, self.bounding_box.radius],
+                scale)
 
     class NiBSplineCompTransformInterpolator:
         def get_translations(self):
@@ -4073,9 +4477,7 @@ class NifFormat(FileFormat):
 
         def apply_scale(self, scale):
             """Apply scale factor on data."""
-            self.translation.x *= scale
-            self.translation.y *= scale
-            self.translation.z *= scale
+            self.scale_basic_values([self.translation], scale)
             self.translation_bias *= scale
             self.translation_multiplier *= scale
 
@@ -4294,9 +4696,7 @@ class NifFormat(FileFormat):
 
         def apply_scale(self, scale):
             """Apply scale factor on data."""
-            self.translation.x *= scale
-            self.translation.y *= scale
-            self.translation.z *= scale
+            self.scale_basic_values([self.translation], scale)
             # also scale translation float keys
             if self.translation_offset != 65535:
                 offset = self.translation_offset
@@ -4410,16 +4810,22 @@ class NifFormat(FileFormat):
                 r2 = max(r2, dx*dx+dy*dy+dz*dz)
             self.radius = r2 ** 0.5
 
+        def _apply_transform(self, transform):
+            """Transform vertices by the given matrix, and normals by its
+            upper left 3x3 part.
+
+            :param transform: The transform.
+            :type transform: :class:`NifFormat.Matrix44`
+            """
+            mat = transform.as_tuple()
+            self.transform_basic_values(self.vertices, mat)
+            self.transform_basic_values(self.normals, mat[:3])
+
         def apply_scale(self, scale):
             """Apply scale factor on data."""
             if abs(scale - 1.0) < NifFormat.EPSILON: return
-            for v in self.vertices:
-                v.x *= scale
-                v.y *= scale
-                v.z *= scale
-            self.center.x *= scale
-            self.center.y *= scale
-            self.center.z *= scale
+            self.scale_basic_values(self.vertices, scale)
+            self.scale_basic_values([self.center], scale)
             self.radius *= scale
 
         def get_vertex_hash_generator(
@@ -4588,26 +4994,175 @@ class NifFormat(FileFormat):
             geomdata = self.data
             skininst = self.skin_instance
             skindata = skininst.data
-            # XXX todo: should we use list of dictionaries for this
-            #           where each dict maps bone number to the weight?
-            weights = [[] for i in range(geomdata.num_vertices)]
+            # per vertex, a dictionary mapping bone number to weight
+            # (which keeps the bones in order of first appearance)
+            weights = [{} for i in range(geomdata.num_vertices)]
             for bonenum, bonedata in enumerate(skindata.bone_list):
                 for skinweight in bonedata.vertex_weights:
+                    weight = skinweight.weight
                     # skip zero weights
-                    if skinweight.weight != 0:
-                        # boneweightlist is the list of (bonenum, weight) pairs that
-                        # we must update now
-                        boneweightlist = weights[skinweight.index]
-                        # is bonenum already in there?
-                        for i, (otherbonenum, otherweight) in enumerate(boneweightlist):
-                            if otherbonenum == bonenum:
-                                # yes! add the weight to the bone
-                                boneweightlist[i][1] += skinweight.weight
-                                break
-                        else:
-                            # nope... so add new [bone, weight] entry
-                            boneweightlist.append([bonenum, skinweight.weight])
-            return weights
+                    if weight != 0:
+                        boneweights = weights[skinweight.index]
+                        boneweights[bonenum] = (
+                            boneweights.get(bonenum, 0) + weight)
+            return [[[bonenum, weight]
+                     for bonenum, weight in boneweights.items()]
+                    for boneweights in weights]
+
+        def get_columns(self):
+            """Get the vertices, normals, vertex colors, uv sets
+            (``uv0``, ``uv1``, ...), triangles, and skin weights of the
+            geometry in bulk, as tables of numbers. Skin weights have a
+            row for every weight, with the vertex in ``skin_vertices``,
+            the bone (numbered as in the skin instance) in
+            ``skin_bones``, and the weight in ``skin_weights``.
+
+            :return: The tables which the geometry has, by name.
+            :rtype: ``dict`` of :class:`pyffi.utils.columns.Column`
+            """
+            Column = pyffi.utils.columns.Column
+            copy = StructBase.copy_basic_values
+            data = self.data
+            columns = {}
+            if data.has_vertices:
+                columns["vertices"] = Column("f", 3, chain.from_iterable(
+                    copy(data.vertices, ("x", "y", "z"))))
+            if data.has_normals:
+                columns["normals"] = Column("f", 3, chain.from_iterable(
+                    copy(data.normals, ("x", "y", "z"))))
+            if data.has_vertex_colors:
+                columns["vertex_colors"] = Column("f", 4, chain.from_iterable(
+                    copy(data.vertex_colors, ("r", "g", "b", "a"))))
+            for i, uvset in enumerate(data.uv_sets):
+                columns["uv%i" % i] = Column("f", 2, chain.from_iterable(
+                    copy(uvset, ("u", "v"))))
+            if isinstance(data, NifFormat.NiTriBasedGeomData):
+                columns["triangles"] = Column(
+                    "I", 3, chain.from_iterable(data.get_triangles()))
+            if self.skin_instance and self.skin_instance.data:
+                vertices = Column("I")
+                bones = Column("I")
+                weights = Column("f")
+                for bonenum, bonedata in enumerate(
+                    self.skin_instance.data.bone_list):
+                    values = copy(bonedata.vertex_weights, ("index", "weight"))
+                    vertices.values.extend(index for index, weight in values)
+                    bones.values.extend(repeat(bonenum, len(values)))
+                    weights.values.extend(weight for index, weight in values)
+                columns["skin_vertices"] = vertices
+                columns["skin_bones"] = bones
+                columns["skin_weights"] = weights
+            return columns
+
+        def remap_vertices(self, v_map_inverse):
+            """Apply a vertex map to every per vertex channel of the
+            geometry: vertices, normals, tangents, bitangents, vertex
+            colors, uv sets, skin weights, morphs, and tangent space
+            extra data. Every channel is copied once, resized, and
+            gathered in bulk. The triangles are not touched.
+
+            :param v_map_inverse: For every new vertex, the index of the
+                old vertex to copy from. Old vertices may be dropped or
+                duplicated.
+            :type v_map_inverse: ``list`` of ``int``
+            """
+            data = self.data
+            old_num_vertices = data.num_vertices
+            new_num_vertices = len(v_map_inverse)
+            copy = StructBase.copy_basic_values
+            gather = StructBase.gather_basic_values
+
+            # per vertex arrays of the data, with their attribute names
+            has_tangents = (data.has_normals
+                            and len(data.tangents) == old_num_vertices)
+            def get_channels():
+                if data.has_vertices:
+                    yield data.vertices, ("x", "y", "z")
+                if data.has_normals:
+                    yield data.normals, ("x", "y", "z")
+                if has_tangents:
+                    yield data.tangents, ("x", "y", "z")
+                    yield data.bitangents, ("x", "y", "z")
+                if data.has_vertex_colors:
+                    yield data.vertex_colors, ("r", "g", "b", "a")
+                for uvset in data.uv_sets:
+                    yield uvset, ("u", "v")
+            old_values = [copy(array, names)
+                          for array, names in get_channels()]
+            data.num_vertices = new_num_vertices
+            for array in (data.vertices, data.normals, data.vertex_colors,
+                          data.uv_sets):
+                array.update_size()
+            if has_tangents:
+                data.tangents.update_size()
+                data.bitangents.update_size()
+            for (array, names), values in zip(get_channels(), old_values):
+                gather(array, values, v_map_inverse, names)
+
+            # skin weights: for every old vertex, the new vertices
+            if self.skin_instance:
+                self._validate_skin()
+                new_indices = [[] for i in range(old_num_vertices)]
+                for i, old_i in enumerate(v_map_inverse):
+                    new_indices[old_i].append(i)
+                for bonedata in self.skin_instance.data.bone_list:
+                    weights = {}
+                    for skinweight in bonedata.vertex_weights:
+                        weight = skinweight.weight
+                        # skip zero weights
+                        if weight != 0:
+                            for i in new_indices[skinweight.index]:
+                                weights[i] = weights.get(i, 0) + weight
+                    bonedata.num_vertices = len(weights)
+                    bonedata.vertex_weights.update_size()
+                    for skinweight, i in zip(bonedata.vertex_weights,
+                                             sorted(weights)):
+                        skinweight.index = i
+                        skinweight.weight = weights[i]
+
+            # morphs
+            for morphctrl in self.get_controllers():
+                if not isinstance(morphctrl, NifFormat.NiGeomMorpherController):
+                    continue
+                morphdata = morphctrl.data
+                # skip empty morph data
+                if not morphdata:
+                    continue
+                # check size and fix it if needed
+                # (see issue #3395484 reported by rlibiez)
+                if morphdata.num_vertices != old_num_vertices:
+                    logging.getLogger("pyffi.nif.nigeometry").warn(
+                        "number of vertices in morph ({0}) does not match"
+                        " number of vertices in shape ({1}):"
+                        " resizing morph, graphical glitches might result"
+                        .format(morphdata.num_vertices, old_num_vertices))
+                    morphdata.num_vertices = old_num_vertices
+                    for morph in morphdata.morphs:
+                        morph.arg = morphdata.num_vertices # manual argument passing
+                        morph.vectors.update_size()
+                old_vectors = [copy(morph.vectors)
+                               for morph in morphdata.morphs]
+                morphdata.num_vertices = new_num_vertices
+                for morph, values in zip(morphdata.morphs, old_vectors):
+                    morph.arg = morphdata.num_vertices # manual argument passing
+                    morph.vectors.update_size()
+                    gather(morph.vectors, values, v_map_inverse)
+
+            # tangent space extra data: tangents followed by binormals,
+            # as 12 byte triples of floats
+            for extra in self.get_extra_datas():
+                if (isinstance(extra, NifFormat.NiBinaryExtraData)
+                    and extra.name
+                    == b'Tangent space (binormal & tangent vectors)'):
+                    binary_data = extra.binary_data
+                    if len(binary_data) != 24 * old_num_vertices:
+                        continue
+                    half = 12 * old_num_vertices
+                    extra.binary_data = b''.join(
+                        binary_data[offset + 12 * old_i:
+                                    offset + 12 * old_i + 12]
+                        for offset in (0, half)
+                        for old_i in v_map_inverse)
 
 
         def flatten_skin(self):
@@ -4624,31 +5179,54 @@ class NifFormat(FileFormat):
             skindata = skininst.data
             skelroot = skininst.skeleton_root
 
+            # parents of all blocks in the chains from the skeleton root
+            # (kept up to date while reparenting below)
+            parents = skelroot._get_chain_parents(
+                block_type = NifFormat.NiAVObject)
+
+            def get_transform(block, relative_to):
+                # same as block.get_transform(relative_to), but uses the
+                # parents dictionary rather than find_chain
+                m = block.get_transform()
+                parent = parents.get(block)
+                while parent is not relative_to:
+                    if parent is None:
+                        raise ValueError(
+                            'cannot find a chain of NiAVObject blocks '
+                            'between %s and %s.'
+                            % (block.name, relative_to.name))
+                    m *= parent.get_transform()
+                    parent = parents.get(parent)
+                return m
+
             # reparent geometry
-            self.set_transform(self.get_transform(skelroot))
-            geometry_parent = skelroot.find_chain(self, block_type = NifFormat.NiAVObject)[-2]
+            self.set_transform(get_transform(self, skelroot))
+            geometry_parent = parents[self]
             geometry_parent.remove_child(self) # detatch geometry from tree
             skelroot.add_child(self, front = True) # and attatch it to the skeleton root
+            parents[self] = skelroot
 
             # reparent all the bone blocks
             for bone_block in skininst.bones:
                 # skeleton root, if it is used as bone, does not need to be processed
                 if bone_block == skelroot: continue
                 # get bone parent
-                bone_parent = skelroot.find_chain(bone_block, block_type = NifFormat.NiAVObject)[-2]
+                bone_parent = parents[bone_block]
                 # set new child transforms
                 for child in bone_block.children:
-                    child.set_transform(child.get_transform(bone_parent))
+                    child.set_transform(get_transform(child, bone_parent))
                 # reparent children
                 for child in bone_block.children:
                     bone_parent.add_child(child)
+                    parents[child] = bone_parent
                 bone_block.num_children = 0
                 bone_block.children.update_size() # = remove_child on each child
                 # set new bone transform
-                bone_block.set_transform(bone_block.get_transform(skelroot))
+                bone_block.set_transform(get_transform(bone_block, skelroot))
                 # reparent bone block
                 bone_parent.remove_child(bone_block)
                 skelroot.add_child(bone_block)
+                parents[bone_block] = skelroot
                 result.append(bone_block)
 
             return result
@@ -4676,8 +5254,11 @@ class NifFormat(FileFormat):
             skindata = skininst.data
             skelroot = skininst.skeleton_root
 
-            vertices = [ NifFormat.Vector3() for i in range(self.data.num_vertices) ]
-            normals = [ NifFormat.Vector3() for i in range(self.data.num_vertices) ]
+            # the skinning is done in batch on tuples: first collect the
+            # bone matrices, and the sparse weights of every bone
+            transforms = []
+            rotations = []
+            weights = []
             sumweights = [ 0.0 for i in range(self.data.num_vertices) ]
             skin_offset = skindata.get_transform()
             for i, bone_block in enumerate(skininst.bones):
@@ -4686,13 +5267,29 @@ class NifFormat(FileFormat):
                 bone_matrix = bone_block.get_transform(skelroot)
                 transform = bone_offset * bone_matrix * skin_offset
                 scale, rotation, translation = transform.get_scale_rotation_translation()
-                for skinweight in bonedata.vertex_weights:
-                    index = skinweight.index
-                    weight = skinweight.weight
-                    vertices[index] += weight * (self.data.vertices[index] * transform)
-                    if self.data.has_normals:
-                        normals[index] += weight * (self.data.normals[index] * rotation)
+                transforms.append(transform.as_tuple())
+                rotations.append(rotation.as_tuple())
+                boneweights = [(skinweight.index, skinweight.weight)
+                               for skinweight in bonedata.vertex_weights]
+                for index, weight in boneweights:
                     sumweights[index] += weight
+                weights.append(boneweights)
+
+            vertices = vecListSkinned(
+                [vert.as_tuple() for vert in self.data.vertices],
+                transforms, weights)
+            if self.data.has_normals:
+                normals = vecListSkinned(
+                    [norm.as_tuple() for norm in self.data.normals],
+                    rotations, weights)
+            else:
+                normals = [(0.0, 0.0, 0.0)] * self.data.num_vertices
+            def vector3(vec):
+                v = NifFormat.Vector3()
+                v.x, v.y, v.z = vec
+                return v
+            vertices = [vector3(vert) for vert in vertices]
+            normals = [vector3(norm) for norm in normals]
 
             for i, s in enumerate(sumweights):
                 if abs(s - 1.0) > 0.01: 
@@ -4793,17 +5390,46 @@ class NifFormat(FileFormat):
     class NiKeyframeData:
         def apply_scale(self, scale):
             """Apply scale factor on data."""
-            for key in self.translations.keys:
-                key.value.x *= scale
-                key.value.y *= scale
-                key.value.z *= scale
-                #key.forward.x *= scale
-                #key.forward.y *= scale
-                #key.forward.z *= scale
-                #key.backward.x *= scale
-                #key.backward.y *= scale
-                #key.backward.z *= scale
-                # what to do with TBC?
+            self.scale_basic_values(
+                [key.value for key in self.translations.keys], scale)
+            # XXX should key.forward and key.backward be scaled too?
+            # XXX what to do with TBC?
+
+        def get_columns(self):
+            """Get the keys in bulk, as tables of numbers: the times of
+            the keys of each channel in ``<channel>_times``, and their
+            values in ``rotations`` (as w, x, y, z), or ``x_rotations``,
+            ``y_rotations``, and ``z_rotations`` for euler angles, and
+            in ``translations`` and ``scales``. Interpolation
+            parameters are not included.
+
+            :return: The tables of the channels which have keys, by
+                name.
+            :rtype: ``dict`` of :class:`pyffi.utils.columns.Column`
+            """
+            Column = pyffi.utils.columns.Column
+            copy = StructBase.copy_basic_values
+            columns = {}
+            def add_keys(name, keys, names=None):
+                if not keys:
+                    return
+                columns[name + "_times"] = Column(
+                    "f", 1, chain.from_iterable(copy(keys, ("time",))))
+                values = [key.value for key in keys]
+                if names:
+                    columns[name + "s"] = Column("f", len(names),
+                        chain.from_iterable(copy(values, names)))
+                else:
+                    columns[name + "s"] = Column("f", 1, values)
+            if self.rotation_type == 4:
+                for axis, rotations in zip("xyz", self.xyz_rotations):
+                    add_keys(axis + "_rotation", rotations.keys)
+            else:
+                add_keys("rotation", self.quaternion_keys,
+                         ("w", "x", "y", "z"))
+            add_keys("translation", self.translations.keys, ("x", "y", "z"))
+            add_keys("scale", self.scales.keys)
+            return columns
 
     class NiMaterialColorController:
         def get_target_color(self):
@@ -4819,10 +5445,7 @@ class NifFormat(FileFormat):
         def apply_scale(self, scale):
             """Apply scale factor on data."""
             for morph in self.morphs:
-                for v in morph.vectors:
-                    v.x *= scale
-                    v.y *= scale
-                    v.z *= scale
+                self.scale_basic_values(morph.vectors, scale)
 
     class NiNode:
         """
@@ -5139,19 +5762,25 @@ class NifFormat(FileFormat):
             # sort geometries by bone level
             # this ensures that "parent" geometries serve as reference for "child"
             # geometries
+            geom_bones = [(geom, set(geom.skin_instance.bones))
+                          for geom in geoms]
             sorted_geoms = []
             for bone in self.get_global_iterator():
                 if not isinstance(bone, NifFormat.NiNode):
                     continue
-                for geom in geoms:
-                    if not geom in sorted_geoms:
-                        if bone in geom.skin_instance.bones:
-                            sorted_geoms.append(geom)
+                for geom, bones in geom_bones:
+                    if bone in bones:
+                        sorted_geoms.append(geom)
+                geom_bones = [(geom, bones) for geom, bones in geom_bones
+                              if bone not in bones]
             geoms = sorted_geoms
             # now go over all geometries and synchronize their relative bind poses
             for geom in geoms:
                 skininst = geom.skin_instance
                 skindata = skininst.data
+                # geometry transform relative to self (this is not changed
+                # by the bind position fixes below)
+                geomtransform = geom.get_transform(self)
                 # set difference matrix to identity
                 diff = NifFormat.Matrix44()
                 diff.set_identity()
@@ -5166,7 +5795,7 @@ class NifFormat(FileFormat):
                         # (see explanation below)
                         diff = (bonedata.get_transform()
                                 * bone_bind_transform[bonenode.name]
-                                * geom.get_transform(self).get_inverse(fast=False))
+                                * geomtransform.get_inverse(fast=False))
                         break
 
                 if diff.is_identity():
@@ -5199,16 +5828,7 @@ class NifFormat(FileFormat):
                                                * bonedata.get_transform())
                     # transform geometry
                     logger.debug("transforming vertices and normals")
-                    for vert in geom.data.vertices:
-                        newvert = vert * diff
-                        vert.x = newvert.x
-                        vert.y = newvert.y
-                        vert.z = newvert.z
-                    for norm in geom.data.normals:
-                        newnorm = norm * diff.get_matrix_33()
-                        norm.x = newnorm.x
-                        norm.y = newnorm.y
-                        norm.z = newnorm.z
+                    geom.data._apply_transform(diff)
 
                 # store updated bind position for future reference
                 for bonenode, bonedata in zip(skininst.bones, skindata.bone_list):
@@ -5217,7 +5837,7 @@ class NifFormat(FileFormat):
                         continue
                     bone_bind_transform[bonenode.name] = (
                         bonedata.get_transform().get_inverse(fast=False)
-                        * geom.get_transform(self))
+                        * geomtransform)
 
             # validation: check that bones share bind position
             bone_bind_transform = {}
@@ -5225,6 +5845,7 @@ class NifFormat(FileFormat):
             for geom in geoms:
                 skininst = geom.skin_instance
                 skindata = skininst.data
+                geomtransform = geom.get_transform(self)
                 # go over all bones in current geometry, see if it has been visited
                 # before
                 for bonenode, bonedata in zip(skininst.bones, skindata.bone_list):
@@ -5234,7 +5855,7 @@ class NifFormat(FileFormat):
                     if bonenode.name in bone_bind_transform:
                         # calculate difference
                         diff = ((bonedata.get_transform().get_inverse(fast=False)
-                                 * geom.get_transform(self))
+                                 * geomtransform)
                                 - bone_bind_transform[bonenode.name])
                         # calculate error (sup norm)
                         error = max(error,
@@ -5243,7 +5864,7 @@ class NifFormat(FileFormat):
                     else:
                         bone_bind_transform[bonenode.name] = (
                             bonedata.get_transform().get_inverse(fast=False)
-                            * geom.get_transform(self))
+                            * geomtransform)
 
             logger.debug("Geometry bind position error is %f" % error)
             if error > 1e-3:
@@ -5372,16 +5993,7 @@ class NifFormat(FileFormat):
                                               * bonedata.get_transform())
                     # transform geometry
                     logger.debug("transforming vertices and normals")
-                    for vert in geom.data.vertices:
-                        newvert = vert * diff
-                        vert.x = newvert.x
-                        vert.y = newvert.y
-                        vert.z = newvert.z
-                    for norm in geom.data.normals:
-                        newnorm = norm * diff.get_matrix_33()
-                        norm.x = newnorm.x
-                        norm.y = newnorm.y
-                        norm.z = newnorm.z
+                    geom.data._apply_transform(diff)
 
         def send_bones_to_bind_position(self):
             """This function will send all bones of geometries of this skeleton root
@@ -5395,35 +6007,32 @@ class NifFormat(FileFormat):
             # get logger
             logger = logging.getLogger("pyffi.nif.ninode")
             # check all bones and bone datas to see if a bind position exists
-            bonelist = []
+            # maps bone node to (geom, bone data, bind transform)
+            bonedict = {}
             error = 0.0
             geoms = list(self.get_skinned_geometries())
             for geom in geoms:
                 skininst = geom.skin_instance
                 skindata = skininst.data
+                geomtransform = geom.get_transform(self)
                 for bonenode, bonedata in zip(skininst.bones, skindata.bone_list):
                     # bonenode can be None; see pyffi issue #3114079
                     if not bonenode:
                         continue
+                    bindtransform = (
+                        bonedata.get_transform().get_inverse(fast=False)
+                        * geomtransform)
                     # make sure all bone data of shared bones coincides
-                    for othergeom, otherbonenode, otherbonedata in bonelist:
-                        if bonenode is otherbonenode:
-                            diff = ((otherbonedata.get_transform().get_inverse(fast=False)
-                                     *
-                                     othergeom.get_transform(self))
-                                    -
-                                    (bonedata.get_transform().get_inverse(fast=False)
-                                     *
-                                     geom.get_transform(self)))
-                            if diff.sup_norm() > 1e-3:
-                                logger.warning("Geometries %s and %s do not share the same bind position: bone %s will be sent to a position matching only one of these" % (geom.name, othergeom.name, bonenode.name))
-                            # break the loop
-                            break
+                    if bonenode in bonedict:
+                        othergeom, otherbonedata, otherbindtransform = (
+                            bonedict[bonenode])
+                        diff = otherbindtransform - bindtransform
+                        if diff.sup_norm() > 1e-3:
+                            logger.warning("Geometries %s and %s do not share the same bind position: bone %s will be sent to a position matching only one of these" % (geom.name, othergeom.name, bonenode.name))
                     else:
-                        # the loop did not break, so the bone was not yet added
-                        # add it now
+                        # the bone was not yet added, add it now
                         logger.debug("Found bind position data for %s" % bonenode.name)
-                        bonelist.append((geom, bonenode, bonedata))
+                        bonedict[bonenode] = (geom, bonedata, bindtransform)
 
             # the algorithm simply makes all transforms correct by changing
             # each local bone matrix in such a way that the global matrix
@@ -5431,14 +6040,13 @@ class NifFormat(FileFormat):
 
             # this algorithm is numerically most stable if bones are traversed
             # in hierarchical order, so first sort the bones
-            sorted_bonelist = []
+            bonelist = []
             for node in self.tree():
                 if not isinstance(node, NifFormat.NiNode):
                     continue
-                for geom, bonenode, bonedata in bonelist:
-                    if node is bonenode:
-                        sorted_bonelist.append((geom, bonenode, bonedata))
-            bonelist = sorted_bonelist
+                if node in bonedict:
+                    geom, bonedata, bindtransform = bonedict[node]
+                    bonelist.append((geom, node, bonedata))
             # now reposition the bones
             for geom, bonenode, bonedata in bonelist:
                 # explanation:
@@ -5643,6 +6251,14 @@ class NifFormat(FileFormat):
             self.add_extra_data(extra)
 
     class NiObject:
+        # bytes and link indices of the block as it was read, so it can
+        # be written as it was if it does not change (see Data.write)
+        _source = None
+
+        # weak reference to the data whose block tree index contains
+        # this block, see Data._update_tree_index
+        _tree_data = None
+
         def find(self, block_name = None, block_type = None):
             # does this block match the search criteria?
             if block_name and block_type:
@@ -5684,6 +6300,31 @@ class NifFormat(FileFormat):
 
             return []
 
+        def _get_chain_parents(self, block_type = None):
+            """Map every block in the tree below C{self} to its parent in
+            the chain that L{find_chain} returns for it. This finds all
+            chains in a single walk of the tree.
+
+            :param block_type: The type that blocks should have in the
+                chains.
+            :return: Dictionary mapping blocks to parent blocks.
+            """
+            parents = {}
+            visited = set()
+            stack = [(self, None)]
+            while stack:
+                block, parent = stack.pop()
+                if block in visited:
+                    continue
+                visited.add(block)
+                if parent is not None:
+                    parents[block] = parent
+                for child in reversed(block.get_refs()):
+                    if block_type and not isinstance(child, block_type):
+                        continue
+                    stack.append((child, block))
+            return parents
+
         def apply_scale(self, scale):
             """Scale data in this block. This implementation does nothing.
             Override this method if it contains geometry data that can be
@@ -5701,11 +6342,11 @@ class NifFormat(FileFormat):
             :param unique: Whether the generator can return the same block twice or not."""
             # unique blocks: reduce this to the case of non-unique blocks
             if unique:
-                block_list = []
+                block_set = set()
                 for block in self.tree(block_type = block_type, follow_all = follow_all, unique = False):
-                    if not block in block_list:
+                    if not block in block_set:
                         yield block
-                        block_list.append(block)
+                        block_set.add(block)
                 return
 
             # yield self
@@ -5728,11 +6369,11 @@ class NifFormat(FileFormat):
             # will visit some child more than once (and as a consequence, infinitely
             # many times). So, walk the reference tree and check that every block is
             # only visited once.
-            children = []
+            children = set()
             for child in self.tree():
                 if child in children:
                     raise ValueError('cyclic references detected')
-                children.append(child)
+                children.add(child)
 
         def is_interchangeable(self, other):
             """Are the two blocks interchangeable?
@@ -5961,26 +6602,22 @@ class NifFormat(FileFormat):
             -1.0
             """
 
-            self.skin_transform.translation.x *= scale
-            self.skin_transform.translation.y *= scale
-            self.skin_transform.translation.z *= scale
+            self.scale_basic_values([self.skin_transform.translation], scale)
 
-            for skindata in self.bone_list:
-                skindata.skin_transform.translation.x *= scale
-                skindata.skin_transform.translation.y *= scale
-                skindata.skin_transform.translation.z *= scale
-                skindata.bounding_sphere_offset.x *= scale
-                skindata.bounding_sphere_offset.y *= scale
-                skindata.bounding_sphere_offset.z *= scale
-                skindata.bounding_sphere_radius *= scale
+            self.scale_basic_values(
+                [skindata.skin_transform.translation
+                 for skindata in self.bone_list]
+                + [skindata.bounding_sphere_offset
+                   for skindata in self.bone_list],
+                scale)
+            self.scale_basic_values(
+                self.bone_list, scale, names=("bounding_sphere_radius",))
 
     class NiTransformInterpolator:
         def apply_scale(self, scale):
             """Apply scale factor <scale> on data."""
             # apply scale on translation
-            self.translation.x *= scale
-            self.translation.y *= scale
-            self.translation.z *= scale
+            self.scale_basic_values([self.translation], scale)
 
     class NiTriBasedGeomData:
         def is_interchangeable(self, other):
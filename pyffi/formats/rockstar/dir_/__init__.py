@@ -48,6 +48,47 @@ Create an DIR file from scratch and write to file
 >>> from tempfile import TemporaryFile
 >>> stream = TemporaryFile()
 >>> data.write(stream)
+
+Unpack and pack an IMG file
+^^^^^^^^^^^^^^^^^^^^^^^^^^^
+
+>>> import os
+>>> import shutil
+>>> import tempfile
+>>> folder = tempfile.mkdtemp()
+>>> data = DirFormat.Data()
+>>> with open('tests/rockstar/dir/test.dir', 'rb') as stream:
+...     data.read(stream)
+>>> # unpack selected files only
+>>> with open('tests/rockstar/dir/test.img', 'rb') as image:
+...     data.unpack(image, folder, names=["*.TXT"])
+2048
+>>> sorted(os.listdir(folder))
+['hello.txt']
+>>> # unpack all files, in parallel
+>>> def progress(file_record, num_bytes):
+...     print(data.get_filename(file_record), num_bytes)
+>>> with open('tests/rockstar/dir/test.img', 'rb') as image:
+...     data.unpack(image, folder, jobs=2)
+4096
+>>> with open('tests/rockstar/dir/test.img', 'rb') as image:
+...     data.unpack(image, folder, progress=progress)
+hello.txt 2048
+test.dds 2048
+4096
+>>> # pack them again
+>>> data = DirFormat.Data(folder=folder)
+>>> [(file_record.offset, file_record.size) for file_record in data.files]
+[(0, 1), (1, 1)]
+>>> image = TemporaryFile()
+>>> data.pack(image, folder)
+4096
+>>> _ = image.seek(0)
+>>> with open('tests/rockstar/dir/test.img', 'rb') as original:
+...     image.read() == original.read()
+True
+>>> image.close()
+>>> shutil.rmtree(folder)
 """
 
 # ***** BEGIN LICENSE BLOCK *****
@@ -88,6 +129,9 @@ Create an DIR file from scratch and write to file
 # ***** END LICENSE BLOCK *****
 
 from itertools import chain
+import concurrent.futures # ThreadPoolExecutor
+import fnmatch
+import mmap
 import struct
 import os
 import re
@@ -109,6 +153,7 @@ class DirFormat(pyffi.object_models.xml.FileFormat):
     # basic types
     UInt = pyffi.object_models.common.UInt
     class String(pyffi.object_models.common.FixedString):
+        __slots__ = ()
         _len = 24
 
     class Data(pyffi.object_models.FileFormat.Data):
@@ -202,30 +247,188 @@ class DirFormat(pyffi.object_models.xml.FileFormat):
         def get_global_child_nodes(self, edge_filter=EdgeFilter()):
             return self.files
 
-        def unpack(self, image, folder):
+        def get_filename(self, file_record):
+            """Return the name of the file record as ``str``, suitable
+            for use as a file name on disk.
+            """
+            return pyffi.object_models.common._as_str(file_record.name)
+
+        def select_files(self, names=None):
+            """Generator for all file records whose name matches any of
+            the given names. Names can contain shell-style wildcards
+            (see :mod:`fnmatch`), and are matched case insensitively.
+
+            :param names: Names or patterns to match, or ``None`` for all
+                files.
+            :type names: ``list`` of ``str``
+            """
+            if names is None:
+                for file_record in self.files:
+                    yield file_record
+                return
+            patterns = [name.lower() for name in names]
+            for file_record in self.files:
+                filename = self.get_filename(file_record).lower()
+                if any(fnmatch.fnmatchcase(filename, pattern)
+                       for pattern in patterns):
+                    yield file_record
+
+        def unpack(self, image, folder, names=None, jobs=1, progress=None):
             """Unpack all files, whose data resides in the given
             image, into the given folder.
+
+            The data is copied by the kernel where possible (see
+            :func:`os.copy_file_range`), and otherwise from a memory map
+            of the image, so file data never passes through intermediate
+            Python buffers of the full file size.
+
+            :param image: The .img file, opened for reading.
+            :type image: ``file``
+            :param folder: The folder to unpack to.
+            :type folder: ``str``
+            :param names: If specified, only unpack files whose name
+                matches one of these names or patterns (see
+                :meth:`select_files`).
+            :type names: ``list`` of ``str``
+            :param jobs: Number of files to unpack in parallel.
+            :type jobs: ``int``
+            :param progress: Called with each file record and the number
+                of bytes unpacked, once that file is done.
+            :type progress: ``function``
+            :return: Total number of bytes unpacked.
+            :rtype: ``int``
             """
-            for file_record in self.files:
-                image.seek(file_record.offset * 2048)
-                with open(os.path.join(folder, file_record.name), 'wb') as data:
-                    data.write(image.read(file_record.size * 2048))
+            file_records = list(self.select_files(names))
+            image.flush()
+            src_fd = image.fileno()
+            src_map = _map_file(src_fd)
+
+            def unpack_file(file_record):
+                filename = os.path.join(
+                    folder, self.get_filename(file_record))
+                with open(filename, 'wb') as data:
+                    num_bytes = _copy_range(
+                        src_fd, file_record.offset * 2048,
+                        data.fileno(), 0,
+                        file_record.size * 2048, src_map)
+                if progress:
+                    progress(file_record, num_bytes)
+                return num_bytes
 
-        def pack(self, image, folder):
+            try:
+                if jobs > 1:
+                    with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=jobs) as executor:
+                        return sum(executor.map(unpack_file, file_records))
+                else:
+                    return sum(unpack_file(file_record)
+                               for file_record in file_records)
+            finally:
+                if src_map is not None:
+                    src_map.close()
+
+        def pack(self, image, folder, progress=None):
             """Pack all files, whose data resides in the given folder,
             into the given image.
+
+            The data is copied by the kernel where possible (see
+            :func:`os.copy_file_range`). Padding is not written
+            explicitly: the image is extended instead, so the padding
+            reads back as zeros and is stored sparsely on file systems
+            that support it.
+
+            :param image: The .img file, opened for writing.
+            :type image: ``file``
+            :param folder: The folder containing the files.
+            :type folder: ``str``
+            :param progress: Called with each file record and the number
+                of bytes packed, once that file is done.
+            :type progress: ``function``
+            :return: Total number of bytes packed (excluding padding).
+            :rtype: ``int``
             """
+            total = 0
             for file_record in self.files:
-                if image.tell() != file_record.offset * 2048:
+                offset = file_record.offset * 2048
+                size = file_record.size * 2048
+                if image.tell() != offset:
                     raise ValueError('file offset mismatch')
-                with open(os.path.join(folder, file_record.name), 'rb') as data:
-                    allbytes = data.read()
-                    size = file_record.size * 2048
-                    if len(allbytes) > size:
+                filename = os.path.join(
+                    folder, self.get_filename(file_record))
+                with open(filename, 'rb') as data:
+                    length = os.fstat(data.fileno()).st_size
+                    if length > size:
                         raise ValueError('file larger than record size')
-                    image.write(allbytes)
-                    if len(allbytes) < size:
-                        image.write('\x00' * (size - len(allbytes)))
+                    src_map = _map_file(data.fileno())
+                    try:
+                        image.flush()
+                        num_bytes = _copy_range(
+                            data.fileno(), 0, image.fileno(), offset,
+                            length, src_map)
+                    finally:
+                        if src_map is not None:
+                            src_map.close()
+                # skip the padding (also resyncs the stream position
+                # with the file descriptor)
+                image.seek(offset + size)
+                total += num_bytes
+                if progress:
+                    progress(file_record, num_bytes)
+            # extend the image to cover the padding of the last file
+            image.truncate()
+            return total
+
+_COPY_CHUNK_SIZE = 1 << 20
+"""Number of bytes to copy at once when the kernel cannot copy for us."""
+
+def _map_file(fd):
+    """Map a file into memory for reading, or return ``None`` if the
+    file is empty (empty files cannot be mapped).
+    """
+    if not os.fstat(fd).st_size:
+        return None
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+def _copy_range(src_fd, src_offset, dst_fd, dst_offset, count, src_map):
+    """Copy *count* bytes from *src_fd* at *src_offset* to *dst_fd* at
+    *dst_offset*. Uses :func:`os.copy_file_range` if the platform
+    supports it, and otherwise falls back on writing slices of
+    *src_map*, which is a memory map of the source file. Does not use
+    the file positions of the source, so files can be copied from the
+    same source in parallel.
+
+    :return: Number of bytes copied, which is less than *count* if the
+        source ends early.
+    """
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < count:
+                num_bytes = os.copy_file_range(
+                    src_fd, dst_fd, count - copied,
+                    src_offset + copied, dst_offset + copied)
+                if not num_bytes:
+                    # end of source reached
+                    return copied
+                copied += num_bytes
+        except OSError:
+            # not supported for these files (for instance, when
+            # copying across file systems on older kernels)
+            pass
+    if copied < count and src_map is not None:
+        os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+        while copied < count:
+            start = src_offset + copied
+            chunk = memoryview(
+                src_map[start:start + min(count - copied, _COPY_CHUNK_SIZE)])
+            if not chunk:
+                # end of source reached
+                break
+            while chunk:
+                num_bytes = os.write(dst_fd, chunk)
+                chunk = chunk[num_bytes:]
+                copied += num_bytes
+    return copied
 
 if __name__=='__main__':
     import doctest
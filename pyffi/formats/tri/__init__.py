@@ -124,6 +124,7 @@ class TriFormat(pyffi.object_models.xml.FileFormat):
     # implementation of tri-specific basic types
 
     class SizedStringZ(pyffi.object_models.common.SizedString):
+        __slots__ = ()
 
         def get_size(self, data=None):
             """Return number of bytes this type occupies in a file.
@@ -75,6 +75,7 @@ contained in a file whose format is described in a particular way
 # ***** END LICENSE BLOCK *****
 
 import codecs
+import io
 import logging
 import os.path # os.path.altsep
 import re # compile
@@ -212,6 +213,33 @@ class FileFormat(object):
             """
             raise NotImplementedError
 
+        def read_buffered(self, stream):
+            """Read the whole stream into memory, and then read the
+            data from memory with :meth:`read`. This is much faster
+            than reading directly from a file, which does a small read
+            for every field. The stream is left at its original
+            position.
+
+            :param stream: The file to read from.
+            :type stream: ``file``
+            """
+            self.read(pyffi.utils.buffer_stream(stream))
+
+        def write_buffered(self, stream):
+            """Write the data to memory with :meth:`write`, and then
+            write the result to the stream with a single call. This is
+            much faster than writing directly to a file, which does a
+            small write for every field.
+
+            :param stream: The file to write to.
+            :type stream: ``file``
+            """
+            buffered = io.BytesIO()
+            buffered.name = getattr(stream, "name", None)
+            self.write(buffered)
+            with buffered.getbuffer() as view:
+                stream.write(view)
+
     @staticmethod
     def version_number(version_str):
         """Converts version string into an integer.
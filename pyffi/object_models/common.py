@@ -118,6 +118,7 @@ class Int(BasicBase, EditableSpinBox):
     >>> hex(i.get_value())
     '0x44332211'
     """
+    __slots__ = ('_value',)
 
     _min = -0x80000000 #: Minimum value.
     _max = 0x7fffffff  #: Maximum value.
@@ -208,6 +209,7 @@ class Int(BasicBase, EditableSpinBox):
 
 class UInt(Int):
     """Implementation of a 32-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffffffff
     _struct = 'I'
@@ -215,6 +217,7 @@ class UInt(Int):
 
 class Int64(Int):
     """Implementation of a 64-bit signed integer type."""
+    __slots__ = ()
     _min = -0x8000000000000000
     _max = 0x7fffffffffffffff
     _struct = 'q'
@@ -222,6 +225,7 @@ class Int64(Int):
 
 class UInt64(Int):
     """Implementation of a 64-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffffffffffffffff
     _struct = 'Q'
@@ -229,6 +233,7 @@ class UInt64(Int):
 
 class Byte(Int):
     """Implementation of a 8-bit signed integer type."""
+    __slots__ = ()
     _min = -0x80
     _max = 0x7f
     _struct = 'b'
@@ -236,6 +241,7 @@ class Byte(Int):
 
 class UByte(Int):
     """Implementation of a 8-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xff
     _struct = 'B'
@@ -243,6 +249,7 @@ class UByte(Int):
 
 class Short(Int):
     """Implementation of a 16-bit signed integer type."""
+    __slots__ = ()
     _min = -0x8000
     _max = 0x7fff
     _struct = 'h'
@@ -250,6 +257,7 @@ class Short(Int):
 
 class UShort(UInt):
     """Implementation of a 16-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffff
     _struct = 'H'
@@ -259,6 +267,8 @@ class ULittle32(UInt):
     """Little endian 32 bit unsigned integer (ignores specified data
     byte order).
     """
+    __slots__ = ()
+
     def read(self, stream, data):
         """Read value from stream.
 
@@ -278,6 +288,7 @@ class ULittle32(UInt):
 
 class Bool(UByte, EditableBoolComboBox):
     """Simple bool implementation."""
+    __slots__ = ()
 
     def get_value(self):
         """Return stored value.
@@ -296,6 +307,7 @@ class Bool(UByte, EditableBoolComboBox):
 
 class Char(BasicBase, EditableLineEdit):
     """Implementation of an (unencoded) 8-bit character."""
+    __slots__ = ('_value',)
 
     def __init__(self, **kwargs):
         """Initialize the character."""
@@ -354,6 +366,10 @@ class Char(BasicBase, EditableLineEdit):
 
 class Float(BasicBase, EditableFloatSpinBox):
     """Implementation of a 32-bit float."""
+    __slots__ = ('_value',)
+
+    _struct = 'f'      #: Character used to represent type in struct.
+    _size = 4          #: Number of bytes.
 
     def __init__(self, **kwargs):
         """Initialize the float."""
@@ -434,6 +450,7 @@ class ZString(BasicBase, EditableLineEdit):
     >>> str(m)
     'Hi There!'
     """
+    __slots__ = ('_value',)
     _maxlen = 1000 #: The maximum length.
 
     def __init__(self, **kwargs):
@@ -529,6 +546,7 @@ class FixedString(BasicBase, EditableLineEdit):
     >>> str(m)
     'Hi There'
     """
+    __slots__ = ('_value',)
     _len = 0
 
     def __init__(self, **kwargs):
@@ -614,6 +632,7 @@ class SizedString(BasicBase, EditableLineEdit):
     >>> str(m)
     'Hi There'
     """
+    __slots__ = ('_value',)
 
     def __init__(self, **kwargs):
         """Initialize the string."""
@@ -680,6 +699,8 @@ class SizedString(BasicBase, EditableLineEdit):
 
 class UndecodedData(BasicBase):
     """Basic type for undecoded data trailing at the end of a file."""
+    __slots__ = ('_value',)
+
     def __init__(self, **kwargs):
         BasicBase.__init__(self, **kwargs)
         self._value = b''
@@ -39,13 +39,19 @@ file, and xml handler for converting the xml description into Python classes.
 #
 # ***** END LICENSE BLOCK *****
 
+import hashlib
+import io
 import logging
-import time # for timing stuff
-import types
+import os
 import os.path
+import pickle
 import sys
+import tempfile
+import time # for timing stuff
+import types
 import xml.sax
 
+import pyffi # for pyffi.__version__
 import pyffi.object_models
 from pyffi.object_models.xml.struct_    import StructBase
 from pyffi.object_models.xml.basic      import BasicBase
@@ -90,24 +96,226 @@ class MetaFileFormat(pyffi.object_models.MetaFileFormat):
         # the hierarchy
         xml_file_name = dct.get('xml_file_name')
         if xml_file_name:
-            # set up XML parser
-            parser = xml.sax.make_parser()
-            parser.setContentHandler(XmlSaxHandler(cls, name, bases, dct))
-
-            # open XML file
+            # read the XML file
             xml_file = cls.openfile(xml_file_name, cls.xml_file_path)
+            try:
+                xml_text = xml_file.read()
+            finally:
+                xml_file.close()
+
+            # set up the handler, which takes care of the class creation
+            handler = XmlSaxHandler(cls, name, bases, dct)
+            start = time.time()
+
+            # try to rebuild the classes from the schema cache
+            cache_file_name = cls.get_schema_cache_file_name(name, xml_text)
+            schema = cls.load_schema_cache(cache_file_name)
+            if schema is not None:
+                cls.logger.debug("Generating classes from %s."
+                                 % cache_file_name)
+                handler.load_schema(schema)
+                cls.logger.debug("Generating finished in %.3f seconds."
+                                 % (time.time() - start))
+                return
 
             # parse the XML file: control is now passed on to XmlSaxHandler
             # which takes care of the class creation
+            handler.schema_cache_file_name = cache_file_name
+            parser = xml.sax.make_parser()
+            parser.setContentHandler(handler)
             cls.logger.debug("Parsing %s and generating classes."
                              % xml_file_name)
-            start = time.clock()
-            try:
-                parser.parse(xml_file)
-            finally:
-                xml_file.close()
+            parser.parse(io.StringIO(xml_text))
             cls.logger.debug("Parsing finished in %.3f seconds."
-                             % (time.clock() - start))
+                             % (time.time() - start))
+
+    def get_schema_cache_file_name(cls, name, xml_text):
+        """Return the name of the file in which the schema of the
+        format is cached, or ``None`` if caching is disabled. The name
+        depends on the format class, on the contents of the xml file,
+        on the pyffi version, and on the version of the cache layout,
+        so a cache file never goes stale: any change simply leads to a
+        different file.
+
+        :param name: The name of the class, for example 'NifFormat'.
+        :type name: ``str``
+        :param xml_text: The contents of the xml file.
+        :type xml_text: ``str``
+        """
+        cache_path = cls.xml_cache_path
+        if not cache_path:
+            return None
+        xml_hash = hashlib.sha1(xml_text.encode("utf-8")).hexdigest()
+        return os.path.join(
+            cache_path, "%s.%s-%s-%i-%s.pickle"
+            % (cls.__module__, name, pyffi.__version__,
+               SCHEMA_CACHE_VERSION, xml_hash))
+
+    def load_schema_cache(cls, cache_file_name):
+        """Load a schema from the cache, or return ``None`` if there
+        is no usable cache file.
+
+        :param cache_file_name: The name of the cache file, or ``None``.
+        :type cache_file_name: ``str``
+        """
+        if not cache_file_name:
+            return None
+        try:
+            with open(cache_file_name, "rb") as cache_file:
+                return pickle.load(cache_file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # corrupt or incompatible cache file: regenerate it
+            cls.logger.debug("Ignoring invalid cache file %s."
+                             % cache_file_name)
+            return None
+
+    def save_schema_cache(cls, cache_file_name, schema):
+        """Save a schema to the cache. Failures are logged and
+        otherwise ignored, as the cache is only an optimization.
+
+        :param cache_file_name: The name of the cache file.
+        :type cache_file_name: ``str``
+        :param schema: The schema, as generated by
+            :meth:`XmlSaxHandler.get_schema`.
+        """
+        cache_path = os.path.dirname(cache_file_name)
+        try:
+            os.makedirs(cache_path, exist_ok=True)
+            # write to a temporary file first and then move it in
+            # place, so processes importing at the same time never see
+            # a half written cache file
+            fd, tmp_file_name = tempfile.mkstemp(dir=cache_path)
+            try:
+                with os.fdopen(fd, "wb") as cache_file:
+                    pickle.dump(schema, cache_file,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_file_name, cache_file_name)
+            except:
+                os.remove(tmp_file_name)
+                raise
+        except Exception as exc:
+            cls.logger.debug("Cannot write cache file %s: %s"
+                             % (cache_file_name, exc))
+
+    def get_reachable_types(cls, struct_type):
+        """Return all struct classes whose instances can be reached
+        from an instance of *struct_type* by following references
+        (as returned by :meth:`StructBase.get_refs`), or ``None`` if
+        *struct_type* is not a struct class of this format. The
+        reachability table is generated from the attributes of the
+        classes on first call, and extended lazily.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> reachable = CgfFormat.get_reachable_types(CgfFormat.NodeChunk)
+        >>> CgfFormat.MeshChunk in reachable
+        True
+        >>> CgfFormat.get_reachable_types(CgfFormat.Vector3)
+        frozenset()
+        >>> print(CgfFormat.get_reachable_types(CgfFormat.Data))
+        None
+
+        :param struct_type: The struct class.
+        :type struct_type: ``type``
+        :return: The reachable struct classes.
+        :rtype: ``frozenset`` of ``type``
+        """
+        if "_reachable_types" not in cls.__dict__:
+            cls._struct_types = [
+                obj for obj in list(cls.__dict__.values())
+                if isinstance(obj, type) and issubclass(obj, StructBase)]
+            cls._ref_types = {}
+            cls._reachable_types = {}
+        try:
+            return cls._reachable_types[struct_type]
+        except KeyError:
+            pass
+        if struct_type not in cls._struct_types:
+            return None
+        # breadth first search over the classes that references point to
+        reachable = set()
+        todo = [struct_type]
+        while todo:
+            for ref_type in cls._get_ref_types(todo.pop()):
+                if ref_type not in reachable:
+                    reachable.add(ref_type)
+                    todo.append(ref_type)
+        result = frozenset(reachable)
+        cls._reachable_types[struct_type] = result
+        return result
+
+    def _get_ref_types(cls, struct_type):
+        """Helper function for :meth:`get_reachable_types`: return the
+        struct classes that references of *struct_type* can point to
+        directly, including subclasses of their templates.
+        """
+        try:
+            return cls._ref_types[struct_type]
+        except KeyError:
+            pass
+        templates = cls._get_ref_templates(struct_type, None, set())
+        if None in templates:
+            # a reference without template: can point to anything
+            ref_types = frozenset(cls._struct_types)
+        else:
+            ref_types = frozenset(
+                obj for obj in cls._struct_types
+                if issubclass(obj, tuple(templates)))
+        cls._ref_types[struct_type] = ref_types
+        return ref_types
+
+    def _get_ref_templates(cls, struct_type, template, visited):
+        """Helper function for :meth:`_get_ref_types`: return the set
+        of templates of all references in *struct_type*, including
+        references in embedded structs. ``None`` in the result means
+        that some reference has no (known) template.
+        """
+        if (struct_type, template) in visited:
+            return set()
+        visited.add((struct_type, template))
+        templates = set()
+        for attr in struct_type._attribute_list:
+            attr_type = (attr.type_ if attr.type_ is not type(None)
+                         else template)
+            attr_template = (attr.template
+                             if attr.template is not type(None)
+                             else template)
+            if attr_type is None:
+                # template type not known: could be a reference
+                templates.add(None)
+            elif not attr_type._has_refs:
+                continue
+            elif issubclass(attr_type, StructBase):
+                templates |= cls._get_ref_templates(
+                    attr_type, attr_template, visited)
+            elif isinstance(attr_template, type):
+                templates.add(attr_template)
+            else:
+                templates.add(None)
+        return templates
+
+
+SCHEMA_CACHE_VERSION = 2
+"""Version of the layout of schema cache files. Increase this
+whenever the schema layout, or anything stored in it, changes."""
+
+def _get_default_cache_path():
+    """Return the folder for schema cache files: the
+    :envvar:`PYFFICACHEPATH` environment variable if set (set it to an
+    empty string to disable the cache), or else a pyffi folder in the
+    user's cache folder.
+    """
+    cache_path = os.getenv("PYFFICACHEPATH")
+    if cache_path is not None:
+        return cache_path
+    if sys.platform == "win32":
+        cache_root = (os.getenv("LOCALAPPDATA")
+                      or os.path.expanduser("~"))
+    else:
+        cache_root = (os.getenv("XDG_CACHE_HOME")
+                      or os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_root, "pyffi")
 
 
 class FileFormat(pyffi.object_models.FileFormat, metaclass=MetaFileFormat):
@@ -115,6 +323,7 @@ class FileFormat(pyffi.object_models.FileFormat, metaclass=MetaFileFormat):
     described by an xml file."""
     xml_file_name = None #: Override.
     xml_file_path = None #: Override.
+    xml_cache_path = _get_default_cache_path() #: Folder of the schema cache.
     logger = logging.getLogger("pyffi.object_models.xml")
 
     # We also keep an ordered list of all classes that have been created.
@@ -203,14 +412,9 @@ class StructAttribute(object):
         except KeyError:
             raise AttributeError("'%s' is missing a type attribute"
                                  % self.displayname)
-        if attrs_type_str != "TEMPLATE":
-            try:
-                self.type_ = getattr(cls, attrs_type_str)
-            except AttributeError:
-                # forward declaration, resolved at endDocument
-                self.type_ = attrs_type_str
-        else:
-            self.type_ = type(None) # type determined at runtime
+        # type name is kept for pickling (see __getstate__)
+        self.type_name = attrs_type_str
+        self.type_ = self._get_type(cls, attrs_type_str)
         # optional parameters
         self.default = attrs.get("default")
         self.template = attrs.get("template") # resolved in endDocument
@@ -255,6 +459,35 @@ class StructAttribute(object):
         if self.ver2:
             self.ver2 = cls.version_number(self.ver2)
 
+    @staticmethod
+    def _get_type(cls, type_name):
+        """Look up the type with the given name in *cls*. Returns
+        the name itself for forward declarations, which are resolved
+        at endDocument.
+        """
+        if type_name == "TEMPLATE":
+            return type(None) # type determined at runtime
+        try:
+            return getattr(cls, type_name)
+        except AttributeError:
+            # forward declaration, resolved at endDocument
+            return type_name
+
+    def __getstate__(self):
+        """Generated classes cannot be pickled, so when pickling, store
+        the type by name. Call :meth:`resolve_type` after unpickling.
+        """
+        state = self.__dict__.copy()
+        state["type_"] = self.type_name
+        return state
+
+    def resolve_type(self, cls):
+        """Look up the type by name after unpickling.
+
+        :param cls: The class where all types reside.
+        """
+        self.type_ = self._get_type(cls, self.type_name)
+
 
 class BitStructAttribute(object):
     """Helper class to collect attribute data of bitstruct bits tags."""
@@ -369,6 +602,14 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
         self.class_name = None
         self.class_dict = None
         self.class_bases = ()
+        # the bases, with generated classes replaced by their name
+        # (for the schema cache)
+        self.class_base_names = ()
+
+        # all definitions of classes and basic types, in the order in
+        # which they were parsed (for the schema cache)
+        self.definitions = []
+        self.schema_cache_file_name = None
 
         # elements for basic classes
         self.basic_class = None
@@ -484,8 +725,10 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
                         raise XmlError(
                             "typo, or forward declaration of struct %s"
                             % class_basename)
+                    self.class_base_names += (class_basename,)
                 else:
                     self.class_bases = (StructBase,)
+                    self.class_base_names = (StructBase,)
                 # istemplate attribute is optional
                 # if not set, then the struct is not a template
                 # set attributes (see class StructBase)
@@ -513,6 +756,7 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
             # fileformat -> enum
             elif tag == self.tag_enum:
                 self.class_bases += (EnumBase,)
+                self.class_base_names += (EnumBase,)
                 self.class_name = attrs["name"]
                 try:
                     numbytes = int(attrs["numbytes"])
@@ -528,6 +772,7 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
                             % typename)
                     numbytes = typ.get_size()
                 self.class_dict = {"__doc__": "",
+                                  "__slots__": (),
                                   "_numbytes": numbytes,
                                   "_enumkeys": [], "_enumvalues": [],
                                   "__module__": self.cls.__module__}
@@ -541,7 +786,9 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
                 except AttributeError:
                     raise XmlError(
                         "typo, or forward declaration of type %s" % typename)
+                self.class_base_names += (typename,)
                 self.class_dict = {"__doc__": "",
+                                  "__slots__": (),
                                   "__module__": self.cls.__module__}
 
             # fileformat -> bitstruct
@@ -549,6 +796,7 @@ class XmlSaxHandler(xml.sax.handler.ContentHandler):
             # BitStruct base class later
             elif tag == self.tag_bit_struct:
                 self.class_bases += (BitStructBase,)
+                self.class_base_names += (BitStructBase,)
                 self.class_name = attrs["name"]
                 try:
                     numbytes = int(attrs["numbytes"])
@@ -647,56 +895,18 @@ but got %s instead""" % name)
                      self.tag_enum,
                      self.tag_alias,
                      self.tag_bit_struct):
-            # create class
-            # assign it to cls.<class_name> if it has not been implemented
-            # internally
-            cls_klass = getattr(self.cls, self.class_name, None)
-            if cls_klass and issubclass(cls_klass, BasicBase):
-                # overrides a basic type - not much to do
-                pass
-            else:
-                # check if we have a customizer class
-                if cls_klass:
-                    # exists: create and add to base class of customizer
-                    gen_klass = type(
-                        "_" + str(self.class_name),
-                        self.class_bases, self.class_dict)
-                    setattr(self.cls, "_" + self.class_name, gen_klass)
-                    # recreate the class, to ensure that the
-                    # metaclass is called!!
-                    # (otherwise, cls_klass does not have correct
-                    # _attribute_list, etc.)
-                    cls_klass = type(
-                        cls_klass.__name__,
-                        (gen_klass,) + cls_klass.__bases__,
-                        dict(cls_klass.__dict__))
-                    setattr(self.cls, self.class_name, cls_klass)
-                    # if the class derives from Data, then make an alias
-                    if issubclass(
-                        cls_klass,
-                        pyffi.object_models.FileFormat.Data):
-                        self.cls.Data = cls_klass
-                    # for the stuff below
-                    gen_class = cls_klass
-                else:
-                    # does not yet exist: create it and assign to class dict
-                    gen_klass = type(
-                        str(self.class_name), self.class_bases, self.class_dict)
-                    setattr(self.cls, self.class_name, gen_klass)
-                # append class to the appropriate list
-                if tag == self.tag_struct:
-                    self.cls.xml_struct.append(gen_klass)
-                elif tag == self.tag_enum:
-                    self.cls.xml_enum.append(gen_klass)
-                elif tag == self.tag_alias:
-                    self.cls.xml_alias.append(gen_klass)
-                elif tag == self.tag_bit_struct:
-                    self.cls.xml_bit_struct.append(gen_klass)
+            self.definitions.append(
+                (tag, self.class_name, self.class_base_names,
+                 self.class_dict))
+            self.create_class(
+                tag, self.class_name, self.class_bases, self.class_dict)
             # reset variables
             self.class_name = None
             self.class_dict = None
             self.class_bases = ()
+            self.class_base_names = ()
         elif tag == self.tag_basic:
+            self.definitions.append((tag, self.class_name, (), None))
             # link class cls.<class_name> to self.basic_class
             setattr(self.cls, self.class_name, self.basic_class)
             # reset variable
@@ -705,10 +915,110 @@ but got %s instead""" % name)
             # reset variable
             self.version_string = None
 
+    def create_class(self, tag, class_name, class_bases, class_dict):
+        """Create a class for a struct, enum, alias, or bitstruct, and
+        assign it to cls.<class_name> if it has not been implemented
+        internally.
+
+        :param tag: The tag of the class.
+        :param class_name: The name of the class.
+        :param class_bases: The base classes.
+        :param class_dict: The class dictionary.
+        """
+        cls_klass = getattr(self.cls, class_name, None)
+        if cls_klass and issubclass(cls_klass, BasicBase):
+            # overrides a basic type - not much to do
+            return
+        # check if we have a customizer class
+        if cls_klass:
+            # exists: create and add to base class of customizer
+            gen_klass = type(
+                "_" + str(class_name),
+                class_bases, class_dict)
+            setattr(self.cls, "_" + class_name, gen_klass)
+            # recreate the class, to ensure that the
+            # metaclass is called!!
+            # (otherwise, cls_klass does not have correct
+            # _attribute_list, etc.)
+            # (the __dict__ and __weakref__ descriptors of the
+            # customizer only apply to instances of the customizer)
+            cls_klass_dict = dict(cls_klass.__dict__)
+            cls_klass_dict.pop("__dict__", None)
+            cls_klass_dict.pop("__weakref__", None)
+            cls_klass = type(
+                cls_klass.__name__,
+                (gen_klass,) + cls_klass.__bases__,
+                cls_klass_dict)
+            setattr(self.cls, class_name, cls_klass)
+            # if the class derives from Data, then make an alias
+            if issubclass(
+                cls_klass,
+                pyffi.object_models.FileFormat.Data):
+                self.cls.Data = cls_klass
+            # for the stuff below
+            gen_class = cls_klass
+        else:
+            # does not yet exist: create it and assign to class dict
+            gen_klass = type(
+                str(class_name), class_bases, class_dict)
+            setattr(self.cls, class_name, gen_klass)
+        # append class to the appropriate list
+        if tag == self.tag_struct:
+            self.cls.xml_struct.append(gen_klass)
+        elif tag == self.tag_enum:
+            self.cls.xml_enum.append(gen_klass)
+        elif tag == self.tag_alias:
+            self.cls.xml_alias.append(gen_klass)
+        elif tag == self.tag_bit_struct:
+            self.cls.xml_bit_struct.append(gen_klass)
+
+    def get_schema(self):
+        """Return everything needed to generate the classes without
+        parsing the xml again: versions, games, and all class
+        definitions. The result can be pickled, and is passed to
+        :meth:`load_schema` to generate the classes.
+        """
+        return dict(versions=self.cls.versions,
+                    games=self.cls.games,
+                    definitions=self.definitions)
+
+    def load_schema(self, schema):
+        """Generate all classes from a schema, as returned by
+        :meth:`get_schema`, instead of parsing the xml.
+
+        :param schema: The schema.
+        :type schema: ``dict``
+        """
+        self.cls.versions.update(schema["versions"])
+        self.cls.games.update(schema["games"])
+        for tag, class_name, class_base_names, class_dict in (
+            schema["definitions"]):
+            if tag == self.tag_basic:
+                # the basic class is already implemented by cls
+                continue
+            class_bases = tuple(
+                getattr(self.cls, base) if isinstance(base, str) else base
+                for base in class_base_names)
+            if tag == self.tag_struct:
+                for attr in class_dict["_attrs"]:
+                    attr.resolve_type(self.cls)
+            self.create_class(tag, class_name, class_bases, class_dict)
+        self.resolve_forward_declarations()
+
     def endDocument(self):
         """Called when the xml is completely parsed.
 
-        Searches and adds class customized functions.
+        Saves the schema cache, and resolves forward declarations.
+        """
+        # save before forward declarations are resolved, as
+        # this puts generated classes into the attributes
+        if self.schema_cache_file_name:
+            self.cls.save_schema_cache(
+                self.schema_cache_file_name, self.get_schema())
+        self.resolve_forward_declarations()
+
+    def resolve_forward_declarations(self):
+        """Searches and adds class customized functions.
         For version tags, adds version to version and game lists.
         """
         # get 'name_attribute' for all classes
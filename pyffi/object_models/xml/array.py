@@ -41,10 +41,14 @@
 
 # note: some imports are defined at the end to avoid problems with circularity
 
+import struct
 import weakref
 
 from pyffi.utils.graph import DetailNode, EdgeFilter
 
+# cache for Array._get_bulk_codec
+_BULK_CODECS = {}
+
 class _ListWrap(list, DetailNode):
     """A wrapper for list, which uses get_value and set_value for
     getting and setting items of the basic type."""
@@ -254,6 +258,10 @@ class Array(_ListWrap):
         ## TODO also update row numbers
         old_size = len(self)
         new_size = self._len1()
+        # let the element type know if the array is resized, for
+        # instance so references can track changes of the block tree
+        on_resize = getattr(self._elementType, "_on_resize", None)
+        resized = (new_size != old_size)
         if self._count2 == None:
             if new_size < old_size:
                 del self[new_size:old_size]
@@ -272,6 +280,7 @@ class Array(_ListWrap):
             for i, elemlist in enumerate(list.__iter__(self)):
                 old_size_i = len(elemlist)
                 new_size_i = self._len2(i)
+                resized = resized or (new_size_i != old_size_i)
                 if new_size_i < old_size_i:
                     del elemlist[new_size_i:old_size_i]
                 else:
@@ -280,6 +289,8 @@ class Array(_ListWrap):
                             template = self._elementTypeTemplate,
                             argument = self._elementTypeArgument)
                         elemlist.append(elem)
+        if on_resize and resized:
+            on_resize(self)
 
     def read(self, stream, data):
         """Read array from stream."""
@@ -292,28 +303,95 @@ class Array(_ListWrap):
         del self[0:self.__len__()]
         # read array
         if self._count2 == None:
-            for i in range(len1):
-                elem = self._elementType(
-                    template = self._elementTypeTemplate,
-                    argument = self._elementTypeArgument,
-                    parent = self)
-                elem.read(stream, data)
-                self.append(elem)
+            self._read_elements(self, len1, stream, data)
         else:
             for i in range(len1):
                 len2i = self._len2(i)
                 if len2i > 0x10000000:
                     raise ValueError('array too long (%i)' % len2i)
                 elemlist = _ListWrap(self._elementType, parent = self)
-                for j in range(len2i):
-                    elem = self._elementType(
-                        template = self._elementTypeTemplate,
-                        argument = self._elementTypeArgument,
-                        parent = elemlist)
-                    elem.read(stream, data)
-                    elemlist.append(elem)
+                self._read_elements(elemlist, len2i, stream, data)
                 self.append(elemlist)
 
+    def _read_elements(self, elemlist, count, stream, data):
+        """Read *count* elements from stream, and append them to
+        *elemlist*. Elements of a fixed size are read with a single
+        read, and unpacked in bulk.
+        """
+        codec = self._get_bulk_codec(data)
+        if codec is None:
+            for i in range(count):
+                elem = self._elementType(
+                    template = self._elementTypeTemplate,
+                    argument = self._elementTypeArgument,
+                    parent = elemlist)
+                elem.read(stream, data)
+                elemlist.append(elem)
+            return
+        elems = [self._elementType(
+                    template = self._elementTypeTemplate,
+                    argument = self._elementTypeArgument,
+                    parent = elemlist)
+                 for i in range(count)]
+        if codec.__class__ is _FieldRun:
+            codec.read_array(elems, stream)
+        else:
+            fmt = "%s%i%s" % (data._byte_order, count, codec)
+            for elem, value in zip(
+                elems, struct.unpack(fmt, stream.read(struct.calcsize(fmt)))):
+                elem._value = value
+        elemlist.extend(elems)
+
+    def _write_elements(self, elemlist, stream, data):
+        """Write the elements of *elemlist* to stream. Elements of a
+        fixed size are packed in bulk, and written with a single write.
+        """
+        codec = self._get_bulk_codec(data, write=True)
+        elems = list.__iter__(elemlist)
+        if codec is None:
+            for elem in elems:
+                elem.write(stream, data)
+        elif codec.__class__ is _FieldRun:
+            codec.write_array(list(elems), stream, data)
+        else:
+            values = [elem._value for elem in elems]
+            try:
+                stream.write(struct.pack(
+                    "%s%i%s" % (data._byte_order, len(values), codec),
+                    *values))
+            except (struct.error, OverflowError):
+                # let each element handle (or report) its own problem
+                for elem in list.__iter__(elemlist):
+                    elem.write(stream, data)
+
+    def _get_bulk_codec(self, data, write=False):
+        """Find how elements can be read or written in bulk: a
+        :class:`_FieldRun` for structs which consist of a single run of
+        fixed size basic attributes, the struct format character for
+        fixed size basic types, or ``None`` if elements must be read
+        and written one by one. Results are cached per element type,
+        version, user version, and byte order.
+        """
+        element_type = self._elementType
+        key = (element_type, data.version, data.user_version,
+               data._byte_order, write)
+        try:
+            return _BULK_CODECS[key]
+        except KeyError:
+            pass
+        codec = None
+        if _has_fixed_size_codec(element_type):
+            codec = element_type._struct
+        elif (isinstance(element_type, type)
+              and issubclass(element_type, StructBase)
+              and (element_type.write is StructBase.write if write
+                   else element_type.read is StructBase.read)):
+            plan = element_type._get_codec_plan(data)
+            if len(plan) == 1 and plan[0].__class__ is _FieldRun:
+                codec = plan[0]
+        _BULK_CODECS[key] = codec
+        return codec
+
     def write(self, stream, data):
         """Write array to stream."""
         self._elementTypeArgument = self.arg
@@ -324,8 +402,7 @@ describing number of elements (%i)'%(self.__len__(),len1))
         if len1 > 0x10000000:
             raise ValueError('array too long (%i)' % len1)
         if self._count2 == None:
-            for elem in list.__iter__(self):
-                elem.write(stream, data)
+            self._write_elements(self, stream, data)
         else:
             for i, elemlist in enumerate(list.__iter__(self)):
                 len2i = self._len2(i)
@@ -334,8 +411,7 @@ describing number of elements (%i)'%(self.__len__(),len1))
 describing number of elements (%i)"%(elemlist.__len__(),len2i))
                 if len2i > 0x10000000:
                     raise ValueError('array too long (%i)' % len2i)
-                for elem in list.__iter__(elemlist):
-                    elem.write(stream, data)
+                self._write_elements(elemlist, stream, data)
 
     def fix_links(self, data):
         """Fix the links in the array by calling C{fix_links} on all elements
@@ -403,4 +479,5 @@ describing number of elements (%i)"%(elemlist.__len__(),len2i))
                     yield elem
 
 from pyffi.object_models.xml.basic import BasicBase
-from pyffi.object_models.xml.struct_ import StructBase
+from pyffi.object_models.xml.struct_ import (
+    StructBase, _FieldRun, _has_fixed_size_codec)
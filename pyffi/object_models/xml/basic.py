@@ -75,11 +75,13 @@ class BasicBase(DetailNode):
         ...
     NotImplementedError
     """
+    __slots__ = ()
 
     _is_template = False # is it a template type?
     _has_links = False # does the type contain a Ref or a Ptr?
     _has_refs = False # does the type contain a Ref?
     _has_strings = False # does the type contain a string?
+    _has_mutable_value = False # can its value be changed in place?
     arg = None # default argument
 
     def __init__(self, template = None, argument = None, parent = None):
@@ -87,6 +87,7 @@ class _MetaEnumBase(type):
             setattr(cls, item, value)
 
 class EnumBase(BasicBase, EditableComboBox, metaclass=_MetaEnumBase):
+    __slots__ = ('_value',)
     _enumkeys = []
     _enumvalues = []
     _numbytes = 1 # default width of an enum
@@ -42,9 +42,12 @@
 # note: some imports are defined at the end to avoid problems with circularity
 
 from functools import partial
-
+from itertools import groupby
+import struct
+import weakref
 
 from pyffi.utils.graph import DetailNode, GlobalNode, EdgeFilter
+from pyffi.utils.mathutils import vecListTransformed
 import pyffi.object_models.common
 
 class _MetaStructBase(type):
@@ -69,7 +72,10 @@ class _MetaStructBase(type):
                 issubclass(attr.type_, BasicBase) and attr.arr1 is None:
                 # get and set basic attributes
                 setattr(cls, attr.name, property(
-                    partial(StructBase.get_basic_attribute, name=attr.name),
+                    partial(StructBase.get_mutable_basic_attribute
+                            if attr.type_._has_mutable_value
+                            else StructBase.get_basic_attribute,
+                            name=attr.name),
                     partial(StructBase.set_basic_attribute, name=attr.name),
                     doc=attr.doc))
             elif not isinstance(attr.type_, str) and \
@@ -134,6 +140,135 @@ class _MetaStructBase(type):
         # precalculate the attribute name list
         cls._names = cls._get_names()
 
+        # map names of attribute values to attributes, for creating
+        # attribute values on first access
+        # (for duplicate names, the first attribute is used)
+        cls._attribute_values = {}
+        for attr in cls._attribute_list:
+            cls._attribute_values.setdefault(
+                "_%s_value_" % attr.name, attr)
+
+        # instances share the keys of their attribute dictionaries, but
+        # python only adds keys to the shared ones for the first few
+        # instances of a class; so, add all keys now, otherwise values
+        # that are created on first access force a full dictionary
+        # for every instance
+        instance = object.__new__(cls)
+        instance._template = None
+        instance.arg = None
+        for name in cls._attribute_values:
+            setattr(instance, name, None)
+
+        # read and write plans, per version, user version, and byte
+        # order (see StructBase._get_codec_plan)
+        cls._codec_plans = {}
+
+class _FieldRun(object):
+    """A run of consecutive fixed size basic attributes, which are
+    read and written with a single precompiled :class:`struct.Struct`.
+    """
+
+    __slots__ = ('names', 'types', 'struct', 'size')
+
+    def __init__(self, attrs, byte_order):
+        """Initialize the run.
+
+        :param attrs: The attributes in the run.
+        :param byte_order: The byte order, as struct format character.
+        """
+        self.names = tuple("_%s_value_" % attr.name for attr in attrs)
+        self.types = tuple(attr.type_ for attr in attrs)
+        fmt = byte_order
+        for char, group in groupby(attr.type_._struct for attr in attrs):
+            count = len(list(group))
+            fmt += "%i%s" % (count, char) if count > 1 else char
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+
+    def read(self, instance, stream):
+        """Read all attribute values of the run from stream."""
+        attr_values = instance.__dict__
+        for name, type_, value in zip(
+            self.names, self.types,
+            self.struct.unpack(stream.read(self.size))):
+            try:
+                attr_values[name]._value = value
+            except KeyError:
+                # first access: create the value here, which is much
+                # faster than through StructBase.__getattr__
+                attr_value = type_()
+                attr_value._value = value
+                attr_values[name] = attr_value
+
+    def write(self, instance, stream, data):
+        """Write all attribute values of the run to stream."""
+        try:
+            stream.write(self.struct.pack(
+                *[getattr(instance, name)._value for name in self.names]))
+        except (struct.error, OverflowError):
+            # let each value handle (or report) its own problem
+            for name in self.names:
+                getattr(instance, name).write(stream, data)
+
+    def read_array(self, instances, stream):
+        """Read all attribute values of the run for each of the
+        instances, with a single read from stream.
+        """
+        size = self.size * len(instances)
+        buffer = stream.read(size)
+        if len(buffer) != size:
+            raise struct.error("unpack requires a buffer of %i bytes" % size)
+        names = self.names
+        types = self.types
+        for instance, values in zip(instances,
+                                    self.struct.iter_unpack(buffer)):
+            attr_values = instance.__dict__
+            for name, type_, value in zip(names, types, values):
+                try:
+                    attr_values[name]._value = value
+                except KeyError:
+                    attr_value = type_()
+                    attr_value._value = value
+                    attr_values[name] = attr_value
+
+    def write_array(self, instances, stream, data):
+        """Write all attribute values of the run for each of the
+        instances, with a single write to stream.
+        """
+        size = self.size
+        buffer = bytearray(size * len(instances))
+        pack_into = self.struct.pack_into
+        names = self.names
+        try:
+            for offset, instance in zip(range(0, len(buffer), size),
+                                        instances):
+                pack_into(buffer, offset,
+                          *[getattr(instance, name)._value for name in names])
+        except (struct.error, OverflowError):
+            # let each instance handle (or report) its own problem
+            for instance in instances:
+                self.write(instance, stream, data)
+            return
+        stream.write(buffer)
+
+def _has_fixed_size_codec(type_):
+    """Check whether values of the given type can be part of a
+    :class:`_FieldRun`, that is, whether the type is a basic type which
+    reads and writes its value with a single struct format character
+    (and does not override this behaviour).
+    """
+    common = pyffi.object_models.common
+    if not isinstance(type_, type):
+        return False
+    for base in (common.Int, common.Float, EnumBase):
+        if issubclass(type_, base):
+            return type_.read is base.read and type_.write is base.write
+    return False
+
+_DEFAULT_INSTANCES = {}
+"""Instances with default values, by class, template, and argument,
+for sizing arrays which are created on first access."""
+
 class StructBase(GlobalNode, metaclass=_MetaStructBase):
     """Base class from which all file struct types are derived.
 
@@ -223,6 +358,16 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     _games = {}
     arg = None
 
+    _is_default_instance = False
+
+    _dirty = True
+    """Whether the structure may have changed since it was read, as far
+    as its attribute properties can tell: set when an attribute is set,
+    and when a structure or array attribute is fetched, as these can be
+    changed in place. File formats which write unchanged parts as they
+    were read clear it after reading (see
+    :meth:`pyffi.formats.nif.NifFormat.Data.write`)."""
+
     # initialize all attributes
     def __init__(self, template = None, argument = None, parent = None):
         """The constructor takes a tempate: any attribute whose type,
@@ -230,67 +375,112 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         TEMPLATE in the xml description - will be replaced by this
         type. The argument is what the ARG xml tags will be replaced with.
 
+        Attribute values are not created here, but on first access
+        (see :meth:`__getattr__`). So, reading a structure only creates
+        the attributes that are present in the version of the file.
+
         :param template: If the class takes a template type
             argument, then this argument describes the template type.
         :param argument: If the class takes a type argument, then
             it is described here.
         :param parent: The parent of this instance, that is, the instance this
             array is an attribute of."""
-        # used to track names of attributes that have already been added
-        # is faster than self.__dict__.has_key(...)
-        names = set()
-        # initialize argument
+        # initialize template and argument
+        # (always set, and in the same order, so all instances of a
+        # class can share their attribute dictionary keys)
+        self._template = template
         self.arg = argument
         # save parent (note: disabled for performance)
         #self._parent = weakref.ref(parent) if parent else None
-        # initialize item list
-        # this list is used for instance by qskope to display the structure
-        # in a tree view
-        self._items = []
-        # initialize attributes
-        for attr in self._attribute_list:
-            # skip attributes with dupiclate names
-            # (for this to work properly, duplicates must have the same
-            # type, template, argument, arr1, and arr2)
-            if attr.name in names:
-                continue
-            names.add(attr.name)
 
-            # things that can only be determined at runtime (rt_xxx)
-            rt_type = attr.type_ if attr.type_ != type(None) \
-                      else template
-            rt_template = attr.template if attr.template != type(None) \
-                          else template
-            rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
-                     else getattr(self, attr.arg)
-
-            # instantiate the class, handling arrays at the same time
-            if attr.arr1 == None:
-                attr_instance = rt_type(
-                    template = rt_template, argument = rt_arg,
-                    parent = self)
-                if attr.default != None:
-                    attr_instance.set_value(attr.default)
-            elif attr.arr2 == None:
-                attr_instance = Array(
-                    element_type = rt_type,
-                    element_type_template = rt_template,
-                    element_type_argument = rt_arg,
-                    count1 = attr.arr1,
-                    parent = self)
-            else:
-                attr_instance = Array(
-                    element_type = rt_type,
-                    element_type_template = rt_template,
-                    element_type_argument = rt_arg,
-                    count1 = attr.arr1, count2 = attr.arr2,
-                    parent = self)
-
-            # assign attribute value
-            setattr(self, "_%s_value_" % attr.name, attr_instance)
-
-            # add instance to item list
-            self._items.append(attr_instance)
+    def __getattr__(self, name):
+        """Create the value of an attribute on first access. Only
+        called if the instance has no such value yet.
+
+        >>> from pyffi.object_models.common import UInt
+        >>> from pyffi.object_models.xml import StructAttribute as Attr
+        >>> class SimpleFormat(object):
+        ...     UInt = UInt
+        ...     @staticmethod
+        ...     def name_attribute(name):
+        ...         return name
+        >>> class X(StructBase):
+        ...     _attrs = [
+        ...         Attr(SimpleFormat, dict(name='a', type='UInt', default='7')),
+        ...         Attr(SimpleFormat, dict(name='b', type='UInt', arr1='a'))]
+        >>> x = X()
+        >>> "_a_value_" in x.__dict__
+        False
+        >>> x.a
+        7
+        >>> "_a_value_" in x.__dict__
+        True
+        >>> x.a = 2
+        >>> len(x.b) # sized for the default value of a, until updated
+        7
+        >>> x.b.update_size()
+        >>> len(x.b)
+        2
+        >>> x._c_value_
+        Traceback (most recent call last):
+            ...
+        AttributeError: 'X' object has no attribute '_c_value_'
+        """
+        try:
+            attr = self._attribute_values[name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'"
+                                 % (self.__class__.__name__, name))
+        # things that can only be determined at runtime (rt_xxx)
+        rt_type = attr.type_ if attr.type_ is not type(None) \
+                  else self._template
+        rt_template = attr.template if attr.template is not type(None) \
+                      else self._template
+        rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
+                 else getattr(self, attr.arg)
+
+        # instantiate the class, handling arrays at the same time
+        if attr.arr1 is None:
+            attr_instance = rt_type(
+                template = rt_template, argument = rt_arg,
+                parent = self)
+            if attr.default is not None:
+                attr_instance.set_value(attr.default)
+        else:
+            # size the array for the default values of the structure,
+            # as it was sized when all attributes were created in the
+            # constructor, so arrays which are not in the version of
+            # the file stay empty after reading
+            attr_instance = Array(
+                element_type = rt_type,
+                element_type_template = rt_template,
+                element_type_argument = rt_arg,
+                count1 = attr.arr1, count2 = attr.arr2,
+                parent = self._get_default_instance())
+            attr_instance._parent = weakref.ref(self)
+        setattr(self, name, attr_instance)
+        return attr_instance
+
+    def _get_default_instance(self):
+        """An instance of the same class, template, and argument, whose
+        attributes all have their default value. Instances are shared,
+        and must not be changed.
+        """
+        if self._is_default_instance:
+            return self
+        key = (self.__class__, self._template, self.arg)
+        try:
+            return _DEFAULT_INSTANCES[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable argument
+            key = None
+        instance = self.__class__(template=self._template, argument=self.arg)
+        instance._is_default_instance = True
+        if key is not None:
+            _DEFAULT_INSTANCES[key] = instance
+        return instance
 
     def deepcopy(self, block):
         """Copy attributes from a given block (one block class must be a
@@ -339,17 +529,22 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     def read(self, stream, data):
         """Read structure from stream."""
         # read all attributes
-        for attr in self._get_filtered_attribute_list(data):
+        for attr in self._get_active_codec_plan(data):
+            # read runs of fixed size basic attributes at once
+            if attr.__class__ is _FieldRun:
+                attr.read(self, stream)
+                continue
             # skip abstract attributes
             if attr.is_abstract:
                 continue
-            # get attribute argument (can only be done at runtime)
-            rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
-                     else getattr(self, attr.arg)
             # read the attribute
             attr_value = getattr(self, "_%s_value_" % attr.name)
-            attr_value.arg = rt_arg
-            if hasattr(attr, "type_"):
+            # basic types take no argument, and have no slots to store it
+            if not isinstance(attr_value, BasicBase):
+                # get attribute argument (can only be done at runtime)
+                attr_value.arg = (
+                    attr.arg if isinstance(attr.arg, (int, type(None)))
+                    else getattr(self, attr.arg))
                 attr_value._elementType = attr.type_
             attr_value.read(stream, data)
             ### UNCOMMENT FOR DEBUGGING WHILE READING
@@ -366,17 +561,23 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     def write(self, stream, data):
         """Write structure to stream."""
         # write all attributes
-        for attr in self._get_filtered_attribute_list(data):
+        for attr in self._get_active_codec_plan(data):
+            # write runs of fixed size basic attributes at once
+            if attr.__class__ is _FieldRun:
+                attr.write(self, stream, data)
+                continue
             # skip abstract attributes
             if attr.is_abstract:
                 continue
-            # get attribute argument (can only be done at runtime)
-            rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
-                     else getattr(self, attr.arg)
             # write the attribute
             attr_value = getattr(self, "_%s_value_" % attr.name)
-            attr_value.arg = rt_arg
-            getattr(self, "_%s_value_" % attr.name).write(stream, data)
+            # basic types take no argument, and have no slots to store it
+            if not isinstance(attr_value, BasicBase):
+                # get attribute argument (can only be done at runtime)
+                attr_value.arg = (
+                    attr.arg if isinstance(attr.arg, (int, type(None)))
+                    else getattr(self, attr.arg))
+            attr_value.write(stream, data)
             ### UNCOMMENT FOR DEBUGGING WHILE WRITING
             #print("* %s.%s" % (self.__class__.__name__, attr.name)) # debug
             #val = getattr(self, "_%s_value_" % attr.name) # debug
@@ -470,6 +671,7 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
         return tuple(hsh)
 
     def replace_global_node(self, oldbranch, newbranch, **kwargs):
+        self._dirty = True
         for attr in self._get_filtered_attribute_list():
             # check if there are any links at all
             # (this speeds things up considerably)
@@ -576,14 +778,138 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             # so yield the attribute
             yield attr
 
+    @classmethod
+    def _get_codec_plan(cls, data):
+        """List the attributes that are active for the version, user
+        version, and byte order of C{data}, as far as this can be
+        decided without looking at an instance, in the order in which
+        they are read and written. Consecutive fixed size basic
+        attributes without conditions are joined into a
+        :class:`_FieldRun`. Plans are cached per class.
+
+        >>> from pyffi.object_models import FileFormat
+        >>> from pyffi.object_models.common import Float, UInt
+        >>> from pyffi.object_models.xml import StructAttribute as Attr
+        >>> class SimpleFormat(object):
+        ...     Float = Float
+        ...     UInt = UInt
+        ...     @staticmethod
+        ...     def name_attribute(name):
+        ...         return name
+        ...     @staticmethod
+        ...     def version_number(version_str):
+        ...         return int(version_str)
+        >>> class X(StructBase):
+        ...     _attrs = [
+        ...         Attr(SimpleFormat, dict(name='x', type='Float')),
+        ...         Attr(SimpleFormat, dict(name='y', type='Float')),
+        ...         Attr(SimpleFormat, dict(name='z', type='Float')),
+        ...         Attr(SimpleFormat, dict(name='n', type='UInt')),
+        ...         Attr(SimpleFormat, dict(name='w', type='Float',
+        ...                                 cond='n')),
+        ...         Attr(SimpleFormat, dict(name='a', type='UInt',
+        ...                                 ver2='5'))]
+        >>> data = FileFormat.Data()
+        >>> data.version = 10
+        >>> plan = X._get_codec_plan(data)
+        >>> plan[0].struct.format, plan[0].names
+        ('<3fI', ('_x_value_', '_y_value_', '_z_value_', '_n_value_'))
+        >>> [attr.name for attr in plan[1:]]
+        ['w']
+        >>> from io import BytesIO
+        >>> x = X()
+        >>> x.read(BytesIO(struct.pack('<3fI', 1, 2, 3, 0)), data)
+        >>> x.x, x.y, x.z, x.n
+        (1.0, 2.0, 3.0, 0)
+        >>> stream = BytesIO()
+        >>> x.write(stream, data)
+        >>> struct.unpack('<3fI', stream.getvalue())
+        (1.0, 2.0, 3.0, 0)
+        """
+        key = (data.version, data.user_version, data._byte_order)
+        try:
+            return cls._codec_plans[key]
+        except KeyError:
+            pass
+        version, user_version, byte_order = key
+        attrs = []
+        for attr in cls._attribute_list:
+            # an attribute which is listed twice is only read once
+            if any(attr is other for other in attrs):
+                continue
+            if version is not None:
+                if attr.ver1 is not None and version < attr.ver1:
+                    continue
+                if attr.ver2 is not None and version > attr.ver2:
+                    continue
+            if (attr.userver is not None and user_version is not None
+                and user_version != attr.userver):
+                continue
+            attrs.append(attr)
+        # attributes with duplicate names are resolved at runtime
+        names = [attr.name for attr in attrs]
+        plan = []
+        run = []
+        for attr in attrs:
+            if (attr.arr1 is None and not attr.is_abstract
+                and attr.cond is None
+                and (attr.vercond is None
+                     or version is None or user_version is None)
+                and names.count(attr.name) == 1
+                and _has_fixed_size_codec(attr.type_)):
+                run.append(attr)
+                continue
+            plan.extend(cls._get_codec_plan_run(run, byte_order))
+            run = []
+            plan.append(attr)
+        plan.extend(cls._get_codec_plan_run(run, byte_order))
+        cls._codec_plans[key] = plan
+        return plan
+
+    @staticmethod
+    def _get_codec_plan_run(attrs, byte_order):
+        """Helper function for :meth:`_get_codec_plan`: turn a list of
+        fixed size basic attributes into plan items.
+        """
+        if len(attrs) > 1:
+            return [_FieldRun(attrs, byte_order)]
+        else:
+            return attrs
+
+    def _get_active_codec_plan(self, data):
+        """Generator for the items of the codec plan which are active
+        for this instance: like :meth:`_get_filtered_attribute_list`,
+        but yields runs of fixed size basic attributes as a single
+        :class:`_FieldRun`.
+        """
+        check_vercond = (data.version is not None
+                         and data.user_version is not None)
+        names = set()
+        for attr in self._get_codec_plan(data):
+            if attr.__class__ is _FieldRun:
+                yield attr
+                continue
+            if attr.cond is not None and not attr.cond.eval(self):
+                continue
+            if check_vercond and attr.vercond is not None:
+                if not attr.vercond.eval(data):
+                    continue
+            if attr.name in names:
+                continue
+            names.add(attr.name)
+            yield attr
+
     def get_attribute(self, name):
         """Get a (non-basic) attribute."""
+        # the caller can change it in place
+        self._dirty = True
         return getattr(self, "_" + name + "_value_")
 
     # important note: to apply partial(set_attribute, name = 'xyz') the
     # name argument must be last
     def set_attribute(self, value, name):
         """Set a (non-basic) attribute."""
+        self._dirty = True
         # check class
         attr = getattr(self, "_" + name + "_value_")
         if attr.__class__ is not value.__class__:
@@ -601,8 +927,145 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     # name argument must be last
     def set_basic_attribute(self, value, name):
         """Set the value of a basic attribute."""
+        self._dirty = True
         getattr(self, "_" + name + "_value_").set_value(value)
 
+    def get_mutable_basic_attribute(self, name):
+        """Get a basic attribute whose value can be changed in place."""
+        self._dirty = True
+        return getattr(self, "_" + name + "_value_").get_value()
+
+    @staticmethod
+    def get_basic_values(structs, names):
+        """Get the basic value instances (rather than their values) of
+        the given basic attributes of all given structs, as a list with
+        one tuple for every struct. For bulk operations on large arrays,
+        calling get_value and set_value directly on these instances is
+        much faster than going through the attribute properties.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> vec = CgfFormat.Vector3()
+        >>> vec.x, vec.y, vec.z = 1, 2, 3
+        >>> [[value.get_value() for value in values]
+        ...  for values in StructBase.get_basic_values([vec], "zx")]
+        [[3.0, 1.0]]
+
+        :param structs: The structs.
+        :type structs: Iterable of :class:`StructBase`
+        :param names: Names of basic attributes of the structs.
+        :type names: Iterable of ``str``
+        :return: List of tuples of :class:`BasicBase` instances.
+        """
+        value_names = ["_" + name + "_value_" for name in names]
+        return [tuple(getattr(struct_, value_name)
+                      for value_name in value_names)
+                for struct_ in structs]
+
+    @staticmethod
+    def scale_basic_values(structs, scale, names=("x", "y", "z")):
+        """Multiply the given basic attributes of all given structs by a
+        scale factor, in bulk.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> vecs = [CgfFormat.Vector3(), CgfFormat.Vector3()]
+        >>> vecs[0].x, vecs[1].z = 1, 2
+        >>> StructBase.scale_basic_values(vecs, 3)
+        >>> [vec.as_tuple() for vec in vecs]
+        [(3.0, 0.0, 0.0), (0.0, 0.0, 6.0)]
+
+        :param structs: The structs.
+        :type structs: Iterable of :class:`StructBase`
+        :param scale: The scale factor.
+        :type scale: ``float``
+        :param names: Names of basic attributes of the structs.
+        :type names: Iterable of ``str``
+        """
+        for values in StructBase.get_basic_values(structs, names):
+            for value in values:
+                value.set_value(value.get_value() * scale)
+
+    @staticmethod
+    def transform_basic_values(structs, transform, names=("x", "y", "z")):
+        """Transform the given three basic attributes of all given
+        structs as vectors, in bulk, see
+        :func:`pyffi.utils.mathutils.vecListTransformed`.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> vec = CgfFormat.Vector3()
+        >>> vec.x, vec.y, vec.z = 1, 2, 3
+        >>> StructBase.transform_basic_values(
+        ...     [vec], ((0, 1, 0, 0), (1, 0, 0, 0), (0, 0, 1, 0), (5, 5, 5, 1)))
+        >>> vec.as_tuple()
+        (7.0, 6.0, 8.0)
+
+        :param structs: The structs.
+        :type structs: Iterable of :class:`StructBase`
+        :param transform: A 4x4 (affine) or 3x3 matrix, as tuple of rows,
+            which multiplies the vectors on the right.
+        :type transform: ``tuple`` of ``tuple`` of ``float``
+        :param names: Names of the three basic attributes of the structs.
+        :type names: Iterable of ``str``
+        """
+        values = StructBase.get_basic_values(structs, names)
+        vecs = vecListTransformed(
+            [tuple(value.get_value() for value in vec_values)
+             for vec_values in values],
+            transform)
+        for vec_values, vec in zip(values, vecs):
+            for value, coord in zip(vec_values, vec):
+                value.set_value(coord)
+
+    @staticmethod
+    def copy_basic_values(structs, names=("x", "y", "z")):
+        """Get the values of the given basic attributes of all given
+        structs, in bulk, as a list with one tuple for every struct.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> vecs = [CgfFormat.Vector3(), CgfFormat.Vector3()]
+        >>> vecs[0].x, vecs[0].y, vecs[0].z = 1, 2, 3
+        >>> vecs[1].x, vecs[1].y, vecs[1].z = 4, 5, 6
+        >>> StructBase.copy_basic_values(vecs)
+        [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)]
+
+        :param structs: The structs.
+        :type structs: Iterable of :class:`StructBase`
+        :param names: Names of basic attributes of the structs.
+        :type names: Iterable of ``str``
+        :return: List of tuples of values.
+        """
+        return [tuple(value.get_value() for value in values)
+                for values in StructBase.get_basic_values(structs, names)]
+
+    @staticmethod
+    def gather_basic_values(structs, values, indices, names=("x", "y", "z")):
+        """Set the given basic attributes of every struct to the tuple of
+        values at the corresponding index, in bulk. Together with
+        :meth:`copy_basic_values`, this applies a vertex map to an array:
+        copy the values, resize the array, and gather the values.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> vecs = [CgfFormat.Vector3(), CgfFormat.Vector3()]
+        >>> vecs[0].x, vecs[0].y, vecs[0].z = 1, 2, 3
+        >>> vecs[1].x, vecs[1].y, vecs[1].z = 4, 5, 6
+        >>> StructBase.gather_basic_values(
+        ...     vecs, StructBase.copy_basic_values(vecs), [1, 0])
+        >>> [vec.as_tuple() for vec in vecs]
+        [(4.0, 5.0, 6.0), (1.0, 2.0, 3.0)]
+
+        :param structs: The structs.
+        :type structs: Iterable of :class:`StructBase`
+        :param values: The values, as a list of tuples.
+        :type values: ``list`` of ``tuple``
+        :param indices: For every struct, the index of its values.
+        :type indices: Iterable of ``int``
+        :param names: Names of basic attributes of the structs.
+        :type names: Iterable of ``str``
+        """
+        for struct_values, index in zip(
+            StructBase.get_basic_values(structs, names), indices):
+            for value, new_value in zip(struct_values, values[index]):
+                value.set_value(new_value)
+
     def get_template_attribute(self, name):
         """Get a template attribute."""
         try:
@@ -630,7 +1093,9 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
 
     def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
         """Yield children of this structure."""
-        return (item for item in self._items)
+        # the caller can change them in place
+        self._dirty = True
+        return (getattr(self, "_%s_value_" % name) for name in self._names)
 
     def get_detail_child_names(self, edge_filter=EdgeFilter()):
         """Yield names of the children of this structure."""
@@ -651,3 +1116,4 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
 
 from pyffi.object_models.xml.basic import BasicBase
 from pyffi.object_models.xml.array import Array
+from pyffi.object_models.xml.enum import EnumBase
@@ -48,7 +48,7 @@ toaster.
 
 .. autoclass:: Spell
    :show-inheritance:
-   :members: READONLY, SPELLNAME, data, stream, toaster,
+   :members: READONLY, SPELLNAME, TARGETTYPES, data, stream, toaster,
              __init__, recurse, _datainspect, datainspect, _branchinspect,
              branchinspect, dataentry, dataexit, branchentry,
              branchexit, toastentry, toastexit
@@ -138,7 +138,9 @@ the file format class of the files it can toast.
 from configparser import ConfigParser
 from copy import deepcopy
 from io import StringIO
+import collections
 import gc
+import io
 
 import logging # Logger
 import concurrent.futures # ProcessPoolExecutor
@@ -151,9 +153,14 @@ import shlex # shlex.split for parsing option lists in ini files
 import subprocess
 import sys # sys.stdout
 import tempfile
+import threading
+import time
 
 import pyffi # for pyffi.__version__
 import pyffi.object_models # pyffi.object_models.FileFormat
+import pyffi.utils # AtomicFile, walk
+import pyffi.utils.delta # make_patch, apply_patch
+import pyffi.utils.workqueue # WorkQueue
 
 class Spell(object):
     """Spell base class. A spell takes a data file and then does something
@@ -195,6 +202,18 @@ class Spell(object):
     Override this class attribute when subclassing.
     """
 
+    TARGETTYPES = None
+    """A ``tuple`` of the branch classes that the spell acts on, or
+    ``None`` (the default) if the spell can act on any branch. If set,
+    :meth:`recurse` skips every branch which is not of one of these
+    classes, and from which no branch of these classes can be reached
+    (see :meth:`pyffi.object_models.xml.MetaFileFormat.get_reachable_types`).
+    Only set this if :meth:`branchentry` does nothing but return ``True``
+    on branches of other classes.
+    """
+
+    _target_reachable = None
+
     def __init__(self, toaster=None, data=None, stream=None):
         """Initialize the spell data.
 
@@ -244,9 +263,55 @@ class Spell(object):
         :return: ``True`` if the branch must be processed, ``False`` otherwise.
         :rtype: ``bool``
         """
+        # skip branches that cannot lead to a target of the spell
+        if (self.TARGETTYPES is not None
+            and not self._is_target_reachable(branch.__class__)):
+            return False
         # fall back on the toaster implementation
         return self.toaster.is_admissible_branch_class(branch.__class__)
 
+    def _is_target_reachable(self, branchtype):
+        """Check whether a branch of the given class is of one of the
+        :attr:`TARGETTYPES`, or can lead to one. When in doubt, returns
+        ``True``.
+
+        >>> from pyffi.formats.cgf import CgfFormat
+        >>> class CgfToaster(Toaster):
+        ...     FILEFORMAT = CgfFormat
+        >>> class SpellMesh(Spell):
+        ...     TARGETTYPES = (CgfFormat.MeshChunk,)
+        >>> spell = SpellMesh(toaster=CgfToaster())
+        >>> spell._is_target_reachable(CgfFormat.MeshChunk)
+        True
+        >>> spell._is_target_reachable(CgfFormat.NodeChunk)
+        True
+        >>> spell._is_target_reachable(CgfFormat.MtlNameChunk)
+        False
+
+        :param branchtype: The class of the branch.
+        :type branchtype: ``type``
+        :return: ``False`` if the branch can be skipped, ``True`` otherwise.
+        :rtype: ``bool``
+        """
+        if self._target_reachable is None:
+            self._target_reachable = {}
+        try:
+            return self._target_reachable[branchtype]
+        except KeyError:
+            pass
+        if issubclass(branchtype, self.TARGETTYPES):
+            result = True
+        else:
+            get_reachable_types = getattr(
+                self.toaster.FILEFORMAT, "get_reachable_types", None)
+            reachable = (get_reachable_types(branchtype)
+                         if get_reachable_types else None)
+            result = (reachable is None
+                      or any(issubclass(reachable_type, self.TARGETTYPES)
+                             for reachable_type in reachable))
+        self._target_reachable[branchtype] = result
+        return result
+
     def branchinspect(self, branch):
         """Like :meth:`_branchinspect`, but for customization: can be overridden to
         perform an extra inspection (the default implementation always
@@ -281,8 +346,7 @@ class Spell(object):
             branch = self.data
         # the root data element: datainspect has already been called
         if branch is self.data:
-            self.toaster.msgblockbegin(
-                "--- %s ---" % self.SPELLNAME)
+            self.toaster.msgblockbegin("--- %s ---", self.SPELLNAME)
             if self.dataentry():
                 # spell returned True so recurse to children
                 # we use the abstract tree functions to parse the tree
@@ -292,10 +356,7 @@ class Spell(object):
                 self.dataexit()
             self.toaster.msgblockend()
         elif self._branchinspect(branch) and self.branchinspect(branch):
-            self.toaster.msgblockbegin(
-                """~~~ %s [%s] ~~~"""
-                % (branch.__class__.__name__,
-                   branch.get_global_display()))
+            self.toaster.msgblockbegin("~~~ %s ~~~", _BranchDisplay(branch))
             # cast the spell on the branch
             if self.branchentry(branch):
                 # spell returned True so recurse to children
@@ -536,7 +597,12 @@ def SpellGroupParallel(*args):
                  "SPELLNAME":
                      " & ".join(spellclass.SPELLNAME for spellclass in args),
                  "READONLY": 
-                      all(spellclass.READONLY for spellclass in args)})
+                      all(spellclass.READONLY for spellclass in args),
+                 "TARGETTYPES":
+                      None if any(spellclass.TARGETTYPES is None
+                                  for spellclass in args)
+                      else sum((spellclass.TARGETTYPES for spellclass in args),
+                               ())})
 
 class SpellApplyPatch(Spell):
     """A spell for applying a patch on files."""
@@ -551,28 +617,62 @@ class SpellApplyPatch(Spell):
         :return: ``False``
         :rtype: ``bool``
         """
-        # get the patch command (if there is one)
-        patchcmd = self.toaster.options["patchcmd"]
-        if not patchcmd:
-            raise ValueError("must specify a patch command")
         # first argument is always the stream, by convention
         oldfile = self.stream
         oldfilename = oldfile.name
         newfilename = oldfilename + ".patched"
         patchfilename = oldfilename + ".patch"
+        # get the patch command (if there is one)
+        patchcmd = self.toaster.options["patchcmd"]
+        if patchcmd:
+            self.toaster.msg("writing %s..." % newfilename)
+            # close all files before calling external command
+            oldfile.close()
+            subprocess.call(
+                [patchcmd, oldfilename, newfilename, patchfilename])
+            return False
+        # apply the patch in memory with pyffi.utils.delta
+        if not os.path.exists(patchfilename):
+            self.toaster.msg("no patch found")
+            return False
+        with open(patchfilename, "rb") as patchfile:
+            patch = patchfile.read()
+        oldfile.seek(0)
+        newdata = pyffi.utils.delta.apply_patch(oldfile.read(), patch)
         self.toaster.msg("writing %s..." % newfilename)
-        # close all files before calling external command
-        oldfile.close()
-        subprocess.call([patchcmd, oldfilename, newfilename, patchfilename])
+        newfile = pyffi.utils.AtomicFile(newfilename)
+        try:
+            newfile.write(newdata)
+        except:
+            newfile.discard()
+            raise
+        newfile.close()
 
         # do not go further, spell is done
         return False
 
 
+class _BranchDisplay(object):
+    """Display string of a branch for the toaster log, which is only
+    computed when the message is actually logged.
+    """
+    __slots__ = ("branch",)
+
+    def __init__(self, branch):
+        self.branch = branch
+
+    def __str__(self):
+        return "%s [%s]" % (self.branch.__class__.__name__,
+                            self.branch.get_global_display())
+
 class fake_logger:
     """Simple logger for testing."""
     level = logging.DEBUG
 
+    @classmethod
+    def isEnabledFor(cls, level):
+        return level >= cls.level
+
     @classmethod
     def _log(cls, level, level_str, msg):
         # do not actually log, just print
@@ -626,8 +726,8 @@ def _toaster_job(args):
         return
 
     # toast single file
-    stream = open(filename, mode='rb' if toaster.spellclass.READONLY else 'r+b')
-    toaster._toast(stream)
+    with open(filename, mode='rb') as stream:
+        toaster._toast(stream)
 
     # toast exit code
     toaster.spellclass.toastexit(toaster)
@@ -641,6 +741,50 @@ if multiprocessing:
 else:
     CPU_COUNT = 1
 
+class _PipelineStats(object):
+    """Time spent, and data processed, in each stage of the pipeline
+    of :meth:`Toaster._toast_prefetched`. Stages run in different
+    threads, so updates are locked.
+    """
+
+    def __init__(self, threads):
+        """Start the clock.
+
+        :param threads: The number of reader threads.
+        :type threads: ``int``
+        """
+        self.threads = threads
+        self.start = time.perf_counter()
+        self.times = dict(read=0.0, wait=0.0, toast=0.0, write=0.0)
+        self.num_files = 0
+        self.num_bytes = 0
+        self.lock = threading.Lock()
+
+    def add(self, stage, duration, files=0, num_bytes=0):
+        """Record time spent in a stage."""
+        with self.lock:
+            self.times[stage] += duration
+            self.num_files += files
+            self.num_bytes += num_bytes
+
+    def log(self, logger):
+        """Log throughput and utilisation of every stage."""
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        logger.info(
+            "pipeline: %i files, %.1f MB read in %.2f seconds"
+            " (%.1f files/s, %.1f MB/s)"
+            % (self.num_files, self.num_bytes / 1048576.0, elapsed,
+               self.num_files / elapsed,
+               self.num_bytes / 1048576.0 / elapsed))
+        logger.info(
+            "pipeline utilisation: read %.0f%% (of %i threads),"
+            " toast %.0f%% (waiting for reads %.0f%%), write %.0f%%"
+            % (100 * self.times["read"] / (elapsed * self.threads),
+               self.threads,
+               100 * self.times["toast"] / elapsed,
+               100 * self.times["wait"] / elapsed,
+               100 * self.times["write"] / elapsed))
+
 class Toaster(object):
     """Toaster base class. Toasters run spells on large quantities of files.
     They load each file and pass the data structure to any number of spells.
@@ -673,6 +817,8 @@ class Toaster(object):
         archives=False,
         resume=False,
         gccollect=False,
+        prefetch=0, prefetchmemory=256,
+        queue="", queuehost="", queuelease=60.0,
         inifile="")
 
     """List of spell classes of the particular :class:`Toaster` instance."""
@@ -698,6 +844,21 @@ class Toaster(object):
     exclude_types = []
     """Tuple of types corresponding to the exclude key of :attr:`options`."""
 
+    _writer = None
+    """The writer thread pool when toasting with --prefetch, or
+    ``None``."""
+
+    _writes = None
+    """The writes in flight when toasting with --prefetch, as a deque
+    of futures and sizes, or ``None``."""
+
+    _write_bytes = 0
+    """The total size of the writes in flight."""
+
+    _pipeline_stats = None
+    """The :class:`_PipelineStats` when toasting with --prefetch, or
+    ``None``."""
+
     only_regexs = []
     """Tuple of regular expressions corresponding to the only key of
     :attr:`options`."""
@@ -810,29 +971,44 @@ class Toaster(object):
         else:
             self.spellclass = spellclasses[0]
 
-    def msg(self, message):
+    def msg(self, message, *args):
         """Write log message with :meth:`logger.info`, taking into account
-        :attr:`indent`.
+        :attr:`indent`. If the logger does not log info messages, then
+        this returns immediately, without formatting the message.
+
+        >>> toaster = Toaster()
+        >>> toaster.logger = fake_logger
+        >>> toaster.msg("%s and %i", "one", 2)
+        pyffi.toaster:INFO:one and 2
+        >>> fake_logger.setLevel(logging.WARNING)
+        >>> toaster.msg("%s and %i", "no", "formatting")
+        >>> fake_logger.setLevel(logging.DEBUG)
 
         :param message: The message to write.
         :type message: ``str``
+        :param args: If given, the message is formatted with these
+            arguments, as in ``message % args``.
         """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        if args:
+            message = message % args
         for line in message.split("\n"):
             self.logger.info("  " * self.indent + line)
 
-    def msgblockbegin(self, message):
+    def msgblockbegin(self, message, *args):
         """Acts like :meth:`msg`, but also increases :attr:`indent` after writing the
         message."""
-        self.msg(message)
+        self.msg(message, *args)
         self.indent += 1
 
-    def msgblockend(self, message=None):
+    def msgblockend(self, message=None, *args):
         """Acts like :meth:`msg`, but also decreases :attr:`indent` before writing the
         message, but if the message argument is ``None``, then no message is
         printed."""
         self.indent -= 1
         if not(message is None):
-            self.msg(message)
+            self.msg(message, *args)
 
     def is_admissible_branch_class(self, branchtype):
         """Helper function which checks whether a given branch type should
@@ -972,7 +1148,12 @@ class Toaster(object):
         only: []
         patchcmd: 
         pause: True
+        prefetch: 0
+        prefetchmemory: 256
         prefix: 
+        queue: 
+        queuehost: 
+        queuelease: 60.0
         raisetesterror: False
         refresh: 32
         resume: True
@@ -1044,7 +1225,8 @@ class Toaster(object):
             type="string",
             metavar="CMD",
             help=
-            "use CMD as diff command; this command must accept precisely"
+            "use CMD as diff command instead of the built-in one;"
+            " this command must accept precisely"
             " 3 arguments: 'CMD oldfile newfile patchfile'.")
         parser.add_option(
             "--dry-run", dest="dryrun",
@@ -1114,12 +1296,29 @@ class Toaster(object):
             type="string",
             metavar="CMD",
             help=
-            "use CMD as patch command; this command must accept precisely "
+            "use CMD as patch command instead of the built-in one;"
+            " this command must accept precisely "
             "3 arguments: 'CMD oldfile newfile patchfile'.""")
         parser.add_option(
             "-p", "--pause", dest="pause",
             action="store_true",
             help="pause when done")
+        parser.add_option(
+            "--prefetch", dest="prefetch",
+            type="int",
+            metavar="N",
+            help=
+            "with a single job, read the next N files in the background"
+            " while toasting, and write results in the background"
+            " [default: %default]")
+        parser.add_option(
+            "--prefetch-memory", dest="prefetchmemory",
+            type="int",
+            metavar="MB",
+            help=
+            "keep at most MB megabytes of files in memory with --prefetch,"
+            " counting files read ahead and results waiting to be written"
+            " [default: %default]")
         parser.add_option(
             "--prefix", dest="prefix",
             type="string",
@@ -1127,6 +1326,31 @@ class Toaster(object):
             help=
             "prepend PREFIX to file name when saving modification"
             " instead of overwriting the original")
+        parser.add_option(
+            "--queue", dest="queue",
+            type="string",
+            metavar="DIR",
+            help=
+            "share the files with toasters on other hosts through the"
+            " folder DIR on a shared file system: the first toaster"
+            " writes the list of files to DIR, every toaster claims files"
+            " from it until all are done, and the last one merges the"
+            " results; use a new folder for every run")
+        parser.add_option(
+            "--queue-host", dest="queuehost",
+            type="string",
+            metavar="HOST",
+            help=
+            "name of this host in the --queue folder"
+            " [default: the name of the machine]")
+        parser.add_option(
+            "--queue-lease", dest="queuelease",
+            type="float",
+            metavar="SECONDS",
+            help=
+            "give files claimed by a toaster to others if it has not"
+            " been heard of for SECONDS seconds, for instance because"
+            " its host crashed [default: %default]")
         parser.add_option(
             "-r", "--raise", dest="raisetesterror",
             action="store_true",
@@ -1364,9 +1588,14 @@ may destroy them. Make a backup of your files before running this script.
 
         # walk over all streams, and create a data instance for each of them
         # inspect the file but do not yet read in full
-        if jobs == 1:
-            for stream in self.FILEFORMAT.walk(
-                top, mode='rb' if self.spellclass.READONLY else 'r+b'):
+        if self.options.get("queue"):
+            if not self._toast_queue(top):
+                # another toaster merges the results and runs the exit code
+                return
+        elif jobs == 1 and self.options.get("prefetch", 0) > 0:
+            self._toast_prefetched(top)
+        elif jobs == 1:
+            for stream in self.FILEFORMAT.walk(top, mode='rb'):
                 self._toast(stream)
                 if self.options["gccollect"]:
                     # force free memory (helps when parsing many files)
@@ -1388,6 +1617,209 @@ may destroy them. Make a backup of your files before running this script.
         # toast exit code
         self.spellclass.toastexit(self)
 
+    def _toast_prefetched(self, top):
+        """Toast all files with a single job, as a pipeline: a pool of
+        threads reads the next files into memory, the main thread
+        parses them and casts the spell, and a writer thread writes
+        the results to disk. The number of files read ahead is limited
+        by the prefetch option, and the memory taken by files read
+        ahead and by results waiting to be written is limited by the
+        prefetchmemory option. Throughput and the utilisation of
+        each stage are logged at the end.
+
+        :param top: The directory or file to toast.
+        :type top: str
+        """
+        depth = self.options["prefetch"]
+        max_bytes = self.options["prefetchmemory"] << 20
+        stats = _PipelineStats(threads=depth)
+        filenames = pyffi.utils.walk(
+            top, onerror=None, re_filename=self.FILEFORMAT.RE_FILENAME)
+        # files in flight: name, size, and future with the stream
+        pending = collections.deque()
+        pending_bytes = 0
+        reader = concurrent.futures.ThreadPoolExecutor(max_workers=depth)
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._writes = collections.deque()
+        self._write_bytes = 0
+        self._pipeline_stats = stats
+        try:
+            for filename in filenames:
+                # skipped files are not read ahead
+                if self.inspect_filename(filename):
+                    size = os.path.getsize(filename)
+                    future = reader.submit(self._prefetch, filename)
+                else:
+                    size = 0
+                    future = None
+                pending.append((filename, size, future))
+                pending_bytes += size
+                # results waiting to be written count as well
+                self._wait_writes(max_bytes)
+                # toast once the next depth files are in flight, or
+                # earlier if they take too much memory; always keep at
+                # least one file in flight
+                while (len(pending) > depth
+                       or pending_bytes + self._write_bytes >= max_bytes):
+                    pending_bytes -= self._toast_pending(pending)
+                    if not pending:
+                        break
+            while pending:
+                self._toast_pending(pending)
+        finally:
+            reader.shutdown()
+            self._writer.shutdown()
+            self._writer = None
+            self._writes = None
+            self._write_bytes = 0
+            self._pipeline_stats = None
+            # files which failed in the writer thread are not done
+            for filename in self.files_failed:
+                self.files_done.pop(filename, None)
+        stats.log(self.logger)
+
+    def _toast_pending(self, pending):
+        """Toast the first file of the pipeline (see
+        :meth:`_toast_prefetched`).
+
+        :return: The size of the file.
+        """
+        stats = self._pipeline_stats
+        filename, size, future = pending.popleft()
+        if future is None:
+            stream = open(filename, "rb")
+        else:
+            start = time.perf_counter()
+            try:
+                stream = future.result()
+            except OSError as exc:
+                self.files_failed.add(filename)
+                self.logger.error("READ FAILED ON %s: %s" % (filename, exc))
+                return size
+            finally:
+                stats.add("wait", time.perf_counter() - start)
+        start = time.perf_counter()
+        try:
+            self._toast(stream)
+        finally:
+            stream.close()
+            stats.add("toast", time.perf_counter() - start, files=1)
+        if self.options["gccollect"]:
+            # force free memory (helps when parsing many files)
+            gc.collect()
+        return size
+
+    def _wait_writes(self, max_bytes):
+        """Forget about writes of the pipeline which have completed,
+        and wait for the oldest ones until the results waiting to be
+        written take less than the given number of bytes (see
+        :meth:`_toast_prefetched`).
+
+        :param max_bytes: The number of bytes.
+        :type max_bytes: ``int``
+        """
+        while self._writes and (self._writes[0][0].done()
+                                or self._write_bytes >= max_bytes):
+            future, size = self._writes.popleft()
+            future.result()
+            self._write_bytes -= size
+
+    def _prefetch(self, filename):
+        """Read a file into memory, in a reader thread of the pipeline
+        (see :meth:`_toast_prefetched`).
+
+        :return: The in memory stream.
+        """
+        start = time.perf_counter()
+        with open(filename, "rb") as stream:
+            buffered = io.BytesIO(stream.read())
+        buffered.name = filename
+        self._pipeline_stats.add(
+            "read", time.perf_counter() - start,
+            num_bytes=len(buffered.getbuffer()))
+        return buffered
+
+    def _flush(self, filename, outstream, buffered):
+        """Write data to disk, in the writer thread of the pipeline
+        (see :meth:`_toast_prefetched` and :meth:`write`).
+        """
+        start = time.perf_counter()
+        try:
+            try:
+                with buffered.getbuffer() as view:
+                    outstream.write(view)
+            except:
+                if isinstance(outstream, pyffi.utils.AtomicFile):
+                    outstream.discard()
+                else:
+                    outstream.close()
+                raise
+            outstream.close()
+        except Exception as exc:
+            self.files_failed.add(filename)
+            self.logger.error("WRITE FAILED ON %s: %s" % (filename, exc))
+        finally:
+            self._pipeline_stats.add("write", time.perf_counter() - start)
+
+    def _toast_queue(self, top):
+        """Toast files from the queue in the ``--queue`` folder,
+        shared with toasters on other hosts (see
+        :class:`pyffi.utils.workqueue.WorkQueue`). A toaster which
+        finds the queue empty waits until the files claimed by others
+        are finished, or until their leases expire, and the toaster
+        which finishes last merges the results of all toasters into
+        :attr:`files_done`, :attr:`files_failed`, and
+        :attr:`files_skipped`. With ``--queue``, every toaster runs a
+        single job: start several toasters to use more processors.
+
+        :param top: The directory or file to toast.
+        :type top: str
+        :return: ``True`` if this toaster merged the results.
+        """
+        queue = pyffi.utils.workqueue.WorkQueue(
+            self.options["queue"],
+            host=self.options.get("queuehost"),
+            lease_time=self.options.get("queuelease", 60.0))
+        try:
+            queue.open(pyffi.utils.walk(
+                top, onerror=None, re_filename=self.FILEFORMAT.RE_FILENAME))
+            self.msg("toasting %i files from %s as %s"
+                     % (len(queue.filenames), queue.folder, queue.worker))
+            for index, filename in queue.claims():
+                try:
+                    stream = open(filename, "rb")
+                except OSError as exc:
+                    self.files_failed.add(filename)
+                    self.logger.error(
+                        "READ FAILED ON %s: %s" % (filename, exc))
+                else:
+                    with stream:
+                        self._toast(stream)
+                if filename in self.files_failed:
+                    queue.finish(index, "failed")
+                elif filename in self.files_skipped:
+                    queue.finish(index, "skipped")
+                else:
+                    queue.finish(index, "done", self.files_done.get(filename))
+                if self.options["gccollect"]:
+                    # force free memory (helps when parsing many files)
+                    gc.collect()
+            if not queue.claim_merge():
+                return False
+            for record in queue.results():
+                filename = record["filename"]
+                if record["status"] == "failed":
+                    self.files_failed.add(filename)
+                elif record["status"] == "skipped":
+                    self.files_skipped.add(filename)
+                else:
+                    self.files_done[filename] = record["data"]
+            self.msg("merged the results of %i files"
+                     % len(queue.filenames))
+            return True
+        finally:
+            queue.close()
+
     def toast_archives(self, top):
         """Toast all files in all archives."""
         if not self.FILEFORMAT.ARCHIVE_CLASSES:
@@ -1447,8 +1879,8 @@ may destroy them. Make a backup of your files before running this script.
             
             # inspect the spell instance
             if spell._datainspect() and spell.datainspect():
-                # read the full file
-                data.read(stream)
+                # read the full file, from memory
+                data.read_buffered(stream)
                 
                 # cast the spell on the data tree
                 spell.recurse()
@@ -1546,68 +1978,109 @@ may destroy them. Make a backup of your files before running this script.
                 self.msg("overwriting %s" % filename)
             else:
                 self.msg("writing %s" % filename)
-            return open(filename, "wb")
+            # the file is only replaced when the stream is closed
+            return pyffi.utils.AtomicFile(filename)
 
     def write(self, stream, data):
-        """Writes the data to data and raises an exception if the
-        write fails, but restores file if fails on overwrite.
+        """Writes the data, and raises an exception if the write
+        fails. The destination file is only replaced once the write
+        has completed (see :class:`pyffi.utils.AtomicFile`), so
+        nothing needs to be restored if it fails.
         """
         outstream = self.spellclass.get_toast_stream(self, stream.name)
-        if stream is outstream:
-            # make backup
-            stream.seek(0)
-            backup = stream.read(-1)
-            stream.seek(0)
         try:
-            try:
-                data.write(outstream)
-            except: # not just Exception, also CTRL-C
-                self.msg("write failed!!!")
-                if stream is outstream:
-                    self.msg("attempting to restore original file...")
-                    stream.seek(0)
-                    stream.write(backup)
-                    stream.truncate()
-                else:
-                    outstream_name = outstream.name
-                    self.msg("removing incompletely written file...")
-                    outstream.close()
-                    # temporary streams are removed on close
-                    # so check if it exists before removing
-                    if os.path.exists(outstream_name):
-                        os.remove(outstream_name)
-                raise
-            if stream is outstream:
-                stream.truncate()
-        finally:
+            if self._writer is None:
+                data.write_buffered(outstream)
+            else:
+                # write to memory now, and to disk in the writer thread
+                buffered = io.BytesIO()
+                buffered.name = getattr(outstream, "name", None)
+                data.write(buffered)
+        except: # not just Exception, also CTRL-C
+            self.msg("write failed!!!")
+            self.msg("removing incompletely written file...")
+            if isinstance(outstream, pyffi.utils.AtomicFile):
+                outstream.discard()
+            else:
+                outstream_name = outstream.name
+                outstream.close()
+                # temporary streams are removed on close
+                # so check if it exists before removing
+                if (isinstance(outstream_name, str)
+                    and os.path.exists(outstream_name)):
+                    os.remove(outstream_name)
+            raise
+        if self._writer is None:
+            # the data was read into memory, so close the original
+            # file before it is replaced: windows cannot replace a
+            # file which is open
+            if (isinstance(outstream, pyffi.utils.AtomicFile)
+                and isinstance(stream.name, str)
+                and os.path.abspath(outstream.name)
+                    == os.path.abspath(stream.name)):
+                stream.close()
             outstream.close()
+        else:
+            size = len(buffered.getbuffer())
+            self._writes.append((
+                self._writer.submit(
+                    self._flush, stream.name, outstream, buffered),
+                size))
+            self._write_bytes += size
+            # do not let results pile up if writing is the bottleneck
+            self._wait_writes(self.options["prefetchmemory"] << 20)
 
     def writepatch(self, stream, data):
-        """Creates a binary patch for the updated file."""
-        diffcmd = self.options.get('diffcmd')
-        if not diffcmd:
-            raise ValueError("must specify a diff command")
-
-
-        # create a temporary file that won't get deleted when closed
-        self.options["suffix"] = ".tmp"
-        newfile = self.spellclass.get_toast_stream(self, stream.name)
+        """Creates a binary patch for the updated file, next to where
+        the updated file would be written, with ``.patch`` appended to
+        its name. The patch is created in memory with
+        :mod:`pyffi.utils.delta`, unless a diff command is specified.
+        """
+        # write the updated file to memory
+        newfile = io.BytesIO()
+        newfile.name = stream.name
         try:
             data.write(newfile)
         except: # not just Exception, also CTRL-C
             self.msg("write failed!!!")
             raise
-        # use external diff command
-        oldfile = stream
-        oldfilename = oldfile.name
-        patchfilename = newfile.name[:-4] + ".patch"
-        # close all files before calling external command
-        oldfile.close()
-        newfile.close()
-        self.msg("calling %s" % diffcmd)
-        subprocess.call([diffcmd, oldfilename, newfilename, patchfilename])
-        # delete temporary file
-        os.remove(newfilename)
+        head, root, ext = self.get_toast_head_root_ext(stream.name)
+        if self.options["dryrun"]:
+            patchfilename = None
+        else:
+            if head and not os.path.exists(head):
+                self.logger.info("creating destination path %s" % head)
+                os.makedirs(head)
+            patchfilename = os.path.join(head, root + ext + ".patch")
+        diffcmd = self.options.get('diffcmd')
+        if diffcmd:
+            if patchfilename is None:
+                self.msg("not calling %s (dry run)" % diffcmd)
+                return
+            # the external diff command needs the updated file on disk
+            with tempfile.NamedTemporaryFile(
+                dir=head or os.curdir, suffix=ext, delete=False) as tmpfile:
+                tmpfile.write(newfile.getbuffer())
+            try:
+                self.msg("calling %s" % diffcmd)
+                subprocess.call(
+                    [diffcmd, stream.name, tmpfile.name, patchfilename])
+            finally:
+                os.remove(tmpfile.name)
+            return
+        stream.seek(0)
+        patch = pyffi.utils.delta.make_patch(stream.read(), newfile.getvalue())
+        if patchfilename is None:
+            self.msg("patch has %i bytes (dry run)" % len(patch))
+            return
+        self.msg("writing %s" % patchfilename)
+        patchfile = pyffi.utils.AtomicFile(patchfilename)
+        try:
+            patchfile.write(patch)
+        except:
+            patchfile.discard()
+            raise
+        patchfile.close()
 
 if __name__ == '__main__':
     import doctest
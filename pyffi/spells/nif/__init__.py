@@ -114,12 +114,11 @@ class SpellVisitSkeletonRoots(NifSpell):
     def dataentry(self):
         # make list of skeleton roots
         self._skelroots = set()
-        for branch in self.data.get_global_iterator():
-            if isinstance(branch, NifFormat.NiGeometry):
-                if branch.skin_instance:
-                    skelroot = branch.skin_instance.skeleton_root
-                    if skelroot and not(id(skelroot) in self._skelroots):
-                        self._skelroots.add(id(skelroot))
+        for branch in self.data.get_blocks_by_type(NifFormat.NiGeometry):
+            if branch.skin_instance:
+                skelroot = branch.skin_instance.skeleton_root
+                if skelroot and not(id(skelroot) in self._skelroots):
+                    self._skelroots.add(id(skelroot))
         # only apply spell if there are skeleton roots
         if self._skelroots:
             return True
@@ -167,9 +167,9 @@ class SpellCompareSkinData(pyffi.spells.nif.NifSpell):
             toaster.refdata.read(reffile)
         # find bone data in reference nif
         toaster.refbonedata = []
-        for refgeom in toaster.refdata.get_global_iterator():
-            if (isinstance(refgeom, NifFormat.NiGeometry)
-                and refgeom.skin_instance and refgeom.skin_instance.data):
+        for refgeom in toaster.refdata.get_blocks_by_type(
+            NifFormat.NiGeometry):
+            if refgeom.skin_instance and refgeom.skin_instance.data:
                 toaster.refbonedata += list(zip(
                     repeat(refgeom.skin_instance.skeleton_root),
                     repeat(refgeom.skin_instance.data),
@@ -217,10 +217,8 @@ class SpellCompareSkinData(pyffi.spells.nif.NifSpell):
                             # can we find skeleton root of data in reference
                             # data?
                             for refskelroot_branch \
-                                in self.toaster.refdata.get_global_iterator():
-                                if not isinstance(refskelroot_branch,
-                                                  NifFormat.NiAVObject):
-                                    continue
+                                in self.toaster.refdata.get_blocks_by_type(
+                                    NifFormat.NiAVObject):
                                 if skelroot.name == refskelroot_branch.name:
                                     # yes! found!
                                     #self.toaster.msg(
@@ -230,10 +228,8 @@ class SpellCompareSkinData(pyffi.spells.nif.NifSpell):
                                     break
                             else:
                                 for skelroot_ref \
-                                    in self.data.get_global_iterator():
-                                    if not isinstance(skelroot_ref,
-                                                      NifFormat.NiAVObject):
-                                        continue
+                                    in self.data.get_blocks_by_type(
+                                        NifFormat.NiAVObject):
                                     if refskelroot.name == skelroot_ref.name:
                                         # yes! found!
                                         #self.toaster.msg(
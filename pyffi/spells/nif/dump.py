@@ -41,6 +41,7 @@
 
 import codecs
 import http.server
+import multiprocessing # parent_process
 import ntpath # explicit windows style path manipulations
 import os
 import tempfile
@@ -50,6 +51,8 @@ from xml.sax.saxutils import escape # for htmlreport
 
 from pyffi.formats.nif import NifFormat
 from pyffi.spells.nif import NifSpell
+import pyffi.utils # AtomicFile, walk
+import pyffi.utils.columns
 import pyffi.object_models.xml.array
 import pyffi.object_models.xml.struct_
 
@@ -548,3 +551,139 @@ class SpellDumpPython(NifSpell):
         with codecs.open(filename, "wb", encoding="ascii") as stream:
             for line in self.lines:
                 print(line, file=stream)
+
+class SpellDumpColumns(NifSpell):
+    """Export the vertices, normals, vertex colors, uv sets,
+    triangles, and skin weights of all geometries, and the keys of all
+    keyframe data, as tables of numbers, to ``<nifname>.npz`` next to
+    where the toaster would write the nif (see ``--dest-dir``,
+    ``--prefix``, and ``--suffix``), for numpy to load. Every block
+    with data is an entry of the archive, with its block index, type,
+    and name (for keyframe data, the name of the animated node); see
+    :mod:`pyffi.utils.columns` for the layout. If the toaster's
+    ``--dryrun`` option is enabled, nothing is written.
+
+    If ``--arg=N`` is given, then once all files are done, their
+    archives are merged into shards of *N* files each, in folders
+    ``columns-<n>`` of the destination folder, with one ``.npy`` file
+    for every table, which numpy can memory map.
+    """
+
+    SPELLNAME = "dump_columns"
+
+    @classmethod
+    def toastentry(cls, toaster):
+        arg = toaster.options["arg"]
+        if arg and not (arg.isdigit() and int(arg) > 0):
+            toaster.logger.warn(
+                "must specify number of files per shard as argument "
+                "(e.g. -a 1000), or no argument, to apply spell")
+            return False
+        return True
+
+    @classmethod
+    def get_toast_stream(cls, toaster, filename, test_exists=False):
+        """We do not toast the original file, so stream construction
+        is delegated to :meth:`get_archive_name`.
+        """
+        if test_exists:
+            return False
+        else:
+            return None
+
+    @staticmethod
+    def get_archive_name(toaster, filename):
+        """The name of the archive for a nif file, or ``None`` if
+        ``--dryrun`` is specified."""
+        head, root, ext = toaster.get_toast_head_root_ext(filename)
+        if head is None:
+            return None
+        return os.path.join(head, root + ext + ".npz")
+
+    def datainspect(self):
+        return (self.inspectblocktype(NifFormat.NiGeometry)
+                or self.inspectblocktype(NifFormat.NiKeyframeData))
+
+    def dataentry(self):
+        # names of the nodes which keyframe data animate
+        names = {}
+        for block in self.data.blocks:
+            if isinstance(block, NifFormat.NiSequence):
+                targets = [
+                    (controlled_block.get_node_name(), controller)
+                    for controlled_block in block.controlled_blocks
+                    for controller in (controlled_block.interpolator,
+                                       controlled_block.controller)]
+            elif isinstance(block, NifFormat.NiObjectNET):
+                targets = [
+                    (block.name, controller)
+                    for ctrl in block.get_controllers()
+                    for controller in (ctrl, getattr(ctrl, "interpolator",
+                                                     None))]
+            else:
+                continue
+            for name, controller in targets:
+                data = getattr(controller, "data", None)
+                if isinstance(data, NifFormat.NiKeyframeData):
+                    names[id(data)] = name
+        # one entry for every block with data, in the order of the file
+        entries = []
+        for index, block in enumerate(self.data.blocks):
+            if isinstance(block, NifFormat.NiGeometry):
+                if not isinstance(block.data, NifFormat.NiGeometryData):
+                    continue
+                name = block.name
+            elif isinstance(block, NifFormat.NiKeyframeData):
+                name = names.get(id(block), b"")
+            else:
+                continue
+            name = name.decode("ascii", "replace")
+            self.toaster.msg("%s [%s]" % (block.__class__.__name__, name))
+            entries.append(dict(
+                block=index, type=block.__class__.__name__, name=name,
+                columns=block.get_columns()))
+        # write the archive
+        filename = self.get_archive_name(self.toaster, self.stream.name)
+        if filename is None:
+            self.toaster.msg("not writing archive")
+        elif self.toaster.options["resume"] and os.path.exists(filename):
+            self.toaster.msg("%s (already done)" % filename)
+        else:
+            self.toaster.msg("writing %s" % filename)
+            head = os.path.dirname(filename)
+            if head and not os.path.exists(head):
+                os.makedirs(head, exist_ok=True)
+            stream = pyffi.utils.AtomicFile(filename)
+            try:
+                pyffi.utils.columns.write_npz(
+                    stream, entries, file=self.stream.name)
+            except:
+                stream.discard()
+                raise
+            stream.close()
+        # nothing to recurse into
+        return False
+
+    @classmethod
+    def toastexit(cls, toaster):
+        if (not toaster.options["arg"]) or toaster.options["dryrun"]:
+            return
+        # workers of the toaster's pool run this too, but only the main
+        # toaster merges, once all files are done
+        if multiprocessing.parent_process() is not None:
+            return
+        size = int(toaster.options["arg"])
+        archives = []
+        for filename in pyffi.utils.walk(
+            toaster.top or toaster.options["sourcedir"],
+            re_filename=toaster.FILEFORMAT.RE_FILENAME):
+            archive = cls.get_archive_name(toaster, filename)
+            if os.path.exists(archive):
+                archives.append(archive)
+        folder = (toaster.options["destdir"] or toaster.options["sourcedir"]
+                  or os.curdir)
+        for num, start in enumerate(range(0, len(archives), size)):
+            shard = os.path.join(folder, "columns-%i" % num)
+            toaster.msg("writing %s" % shard)
+            pyffi.utils.columns.write_shard(
+                shard, archives[start:start + size])
@@ -132,6 +132,7 @@ class SpellDelTangentSpace(NifSpell):
 
     SPELLNAME = "fix_deltangentspace"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiTriBasedGeom,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiBinaryExtraData)
@@ -160,6 +161,7 @@ class SpellAddTangentSpace(NifSpell):
 
     SPELLNAME = "fix_addtangentspace"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiTriBasedGeom,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiTriBasedGeom)
@@ -193,6 +195,7 @@ class SpellFFVT3RSkinPartition(NifSpell):
 
     SPELLNAME = "fix_ffvt3rskinpartition"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiTriBasedGeom,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiSkinInstance)
@@ -224,6 +227,7 @@ class SpellParseTexturePath(NifSpell):
 
     # abstract spell, so no spell name
     READONLY = False
+    TARGETTYPES = (NifFormat.NiSourceTexture, NifFormat.BSShaderTextureSet)
 
     def substitute(self, old_path):
         """Helper function to allow subclasses of this spell to
@@ -305,6 +309,7 @@ class SpellDetachHavokTriStripsData(NifSpell):
 
     SPELLNAME = "fix_detachhavoktristripsdata"
     READONLY = False
+    TARGETTYPES = (NifFormat.bhkNiTriStripsShape,)
 
     def __init__(self, *args, **kwargs):
         NifSpell.__init__(self, *args, **kwargs)
@@ -317,8 +322,7 @@ class SpellDetachHavokTriStripsData(NifSpell):
 
     def dataentry(self):
         # build list of all NiTriStrips blocks
-        self.nitristrips = [branch for branch in self.data.get_global_iterator()
-                            if isinstance(branch, NifFormat.NiTriStrips)]
+        self.nitristrips = self.data.get_blocks_by_type(NifFormat.NiTriStrips)
         if self.nitristrips:
             return True
         else:
@@ -348,6 +352,7 @@ class SpellClampMaterialAlpha(NifSpell):
 
     SPELLNAME = "fix_clampmaterialalpha"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiMaterialProperty,)
 
     def datainspect(self):
         # only run the spell if there are material property blocks
@@ -430,12 +435,11 @@ class SpellMergeSkeletonRoots(NifSpell):
     def dataentry(self):
         # make list of skeleton roots
         skelroots = []
-        for branch in self.data.get_global_iterator():
-            if isinstance(branch, NifFormat.NiGeometry):
-                if branch.skin_instance:
-                    skelroot = branch.skin_instance.skeleton_root
-                    if skelroot and not skelroot in skelroots:
-                        skelroots.append(skelroot)
+        for branch in self.data.get_blocks_by_type(NifFormat.NiGeometry):
+            if branch.skin_instance:
+                skelroot = branch.skin_instance.skeleton_root
+                if skelroot and not skelroot in skelroots:
+                    skelroots.append(skelroot)
         # find the 'root' skeleton roots (those that have no other skeleton
         # roots as child)
         self.skelrootlist = set()
@@ -498,7 +502,7 @@ class SpellScale(NifSpell):
     def dataentry(self):
         # initialize list of blocks that have been scaled
         self.toaster.msg("scaling by factor %f" % self.toaster.scale)
-        self.scaled_branches = []
+        self.scaled_branches = set()
         return True
 
     def branchinspect(self, branch):
@@ -508,7 +512,7 @@ class SpellScale(NifSpell):
     def branchentry(self, branch):
         branch.apply_scale(self.toaster.scale)
         self.changed = True
-        self.scaled_branches.append(branch)
+        self.scaled_branches.add(branch)
         # continue recursion
         return True
 
@@ -526,6 +530,7 @@ class SpellFixMopp(pyffi.spells.nif.check.SpellCheckMopp):
     """Recalculate mopp data from collision geometry."""
     SPELLNAME = "fix_mopp"
     READONLY = False
+    TARGETTYPES = (NifFormat.bhkMoppBvTreeShape,)
 
     def branchentry(self, branch):
         # we don't recycle the check mopp code here
@@ -803,6 +808,7 @@ class SpellFixBhkSubShapes(NifSpell):
 
     SPELLNAME = "fix_bhksubshapes"
     READONLY = False
+    TARGETTYPES = (NifFormat.bhkPackedNiTriStripsShape,)
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.bhkPackedNiTriStripsShape)
@@ -857,6 +863,7 @@ class SpellFixEmptySkeletonRoots(NifSpell):
 
     SPELLNAME = "fix_emptyskeletonroots"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiSkinInstance,)
 
     def datainspect(self):
         # only run the spell if there is a skin instance block
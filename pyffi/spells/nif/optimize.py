@@ -16,6 +16,10 @@
    :show-inheritance:
    :members:
 
+.. autoclass:: SpellSplitGeometry
+   :show-inheritance:
+   :members:
+
 .. autoclass:: SpellDelUnusedBones
    :show-inheritance:
    :members:
@@ -65,6 +69,8 @@
 import os.path # exists
 
 from pyffi.formats.nif import NifFormat
+from pyffi.object_models.xml.array import Array
+from pyffi.object_models.xml.struct_ import StructBase
 from pyffi.utils import unique_map
 import pyffi.utils.tristrip
 import pyffi.utils.vertex_cache
@@ -220,6 +226,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
 
     SPELLNAME = "opt_geometry"
     READONLY = False
+    TARGETTYPES = (NifFormat.NiTriBasedGeom,)
 
     # spell parameters
     VERTEXPRECISION = 3
@@ -368,69 +375,17 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
         else:
             data.set_triangles(triangles)
 
-        # copy old data
-        oldverts = [(v.x, v.y, v.z) for v in data.vertices]
-        oldnorms = [(n.x, n.y, n.z) for n in data.normals]
-        olduvs   = [[(uv.u, uv.v) for uv in uvset] for uvset in data.uv_sets]
-        oldvcols = [(c.r, c.g, c.b, c.a) for c in data.vertex_colors]
-        if branch.skin_instance: # for later
-            oldweights = branch.get_vertex_weights()
-        # set new data
-        data.num_vertices = new_numvertices
-        if data.has_vertices:
-            data.vertices.update_size()
-            for i, v in enumerate(data.vertices):
-                old_i = v_map_inverse[i]
-                v.x = oldverts[old_i][0]
-                v.y = oldverts[old_i][1]
-                v.z = oldverts[old_i][2]
-        if data.has_normals:
-            data.normals.update_size()
-            for i, n in enumerate(data.normals):
-                old_i = v_map_inverse[i]
-                n.x = oldnorms[old_i][0]
-                n.y = oldnorms[old_i][1]
-                n.z = oldnorms[old_i][2]
-        # XXX todo: if ...has_uv_sets...:
-        data.uv_sets.update_size()
-        for j, uvset in enumerate(data.uv_sets):
-            for i, uv in enumerate(uvset):
-                old_i = v_map_inverse[i]
-                uv.u = olduvs[j][old_i][0]
-                uv.v = olduvs[j][old_i][1]
-        if data.has_vertex_colors:
-            data.vertex_colors.update_size()
-            for i, c in enumerate(data.vertex_colors):
-                old_i = v_map_inverse[i]
-                c.r = oldvcols[old_i][0]
-                c.g = oldvcols[old_i][1]
-                c.b = oldvcols[old_i][2]
-                c.a = oldvcols[old_i][3]
-        del oldverts
-        del oldnorms
-        del olduvs
-        del oldvcols
-
-        # update skin data
+        # copy vertex data, skin weights, and morphs into the new order
         if branch.skin_instance:
             self.toaster.msg("update skin data vertex mapping")
-            skindata = branch.skin_instance.data
-            newweights = []
-            for i in range(new_numvertices):
-                newweights.append(oldweights[v_map_inverse[i]])
-            for bonenum, bonedata in enumerate(skindata.bone_list):
-                w = []
-                for i, weightlist in enumerate(newweights):
-                    for bonenum_i, weight_i in weightlist:
-                        if bonenum == bonenum_i:
-                            w.append((i, weight_i))
-                bonedata.num_vertices = len(w)
-                bonedata.vertex_weights.update_size()
-                for j, (i, weight_i) in enumerate(w):
-                    bonedata.vertex_weights[j].index = i
-                    bonedata.vertex_weights[j].weight = weight_i
-
-            # update skin partition (only if branch already exists)
+        for morphctrl in branch.get_controllers():
+            if (isinstance(morphctrl, NifFormat.NiGeomMorpherController)
+                and morphctrl.data):
+                self.toaster.msg("updating morphs")
+        branch.remap_vertices(v_map_inverse)
+
+        # update skin partition (only if branch already exists)
+        if branch.skin_instance:
             if branch.get_skin_partition():
                 self.toaster.msg("updating skin partition")
                 if isinstance(branch.skin_instance,
@@ -466,45 +421,6 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
                     triangles=triangles, trianglepartmap=trianglepartmap,
                     maximize_bone_sharing=maximize_bone_sharing)
 
-        # update morph data
-        for morphctrl in branch.get_controllers():
-            if isinstance(morphctrl, NifFormat.NiGeomMorpherController):
-                morphdata = morphctrl.data
-                # skip empty morph data
-                if not morphdata:
-                    continue
-                # convert morphs
-                self.toaster.msg("updating morphs")
-                # check size and fix it if needed
-                # (see issue #3395484 reported by rlibiez)
-                # remap of morph vertices works only if
-                # morph.num_vertices == len(v_map)
-                if morphdata.num_vertices != len(v_map):
-                    self.toaster.logger.warn(
-                        "number of vertices in morph ({0}) does not match"
-                        " number of vertices in shape ({1}):"
-                        " resizing morph, graphical glitches might result"
-                        .format(morphdata.num_vertices, len(v_map)))
-                    morphdata.num_vertices = len(v_map)
-                    for morph in morphdata.morphs:
-                        morph.arg = morphdata.num_vertices # manual argument passing
-                        morph.vectors.update_size()
-                # now remap morph vertices
-                for morph in morphdata.morphs:
-                    # store a copy of the old vectors
-                    oldmorphvectors = [(vec.x, vec.y, vec.z)
-                                       for vec in morph.vectors]
-                    for old_i, vec in zip(v_map_inverse, morph.vectors):
-                        vec.x = oldmorphvectors[old_i][0]
-                        vec.y = oldmorphvectors[old_i][1]
-                        vec.z = oldmorphvectors[old_i][2]
-                    del oldmorphvectors
-                # resize matrices
-                morphdata.num_vertices = new_numvertices
-                for morph in morphdata.morphs:
-                    morph.arg = morphdata.num_vertices # manual argument passing
-                    morph.vectors.update_size()
-
         # recalculate tangent space (only if the branch already exists)
         if (branch.find(block_name=b'Tangent space (binormal & tangent vectors)',
                         block_type=NifFormat.NiBinaryExtraData)
@@ -516,133 +432,93 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
         # stop recursion
         return False
 
-# XXX todo
 class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
-    """Optimize geometry by splitting large models into pieces.
-    (This spell is not yet fully implemented!)
+    """Optimize geometry by splitting large models into pieces, for
+    better frustum culling. A geometry whose radius exceeds
+    :attr:`THRESHOLD_RADIUS`, or which has more than
+    :attr:`MAX_TRIANGLES` triangles, is replaced by a
+    :class:`NifFormat.NiNode` with one :class:`NifFormat.NiTriShape`
+    child for every piece. Geometries with controllers or with
+    dismember skins are left alone.
     """
     SPELLNAME = "opt_split"
     READONLY = False
     THRESHOLD_RADIUS = 100 #: Threshold where to split geometry.
+    MAX_TRIANGLES = 4096 #: Maximal number of triangles of each piece.
 
-    # XXX todo
-    @staticmethod
-    def addVertex(sourceindex, v_map, sourcedata, destdata):
-        """Add a vertex from source to destination. Returns index in
-        destdata of the vertex."""
-        # v_map maps source indices that have already been added to the
-        # index they already have in the destdata
-
-        # has_normals, num_uv_sets, etc. of destdata must already match
-        # the sourcedata
-        try:
-            return v_map[sourceindex]
-        except KeyError:
-            v_map[sourceindex] = destdata.num_vertices
-            destdata.num_vertices += 1
-            destdata.vertices.update_size()
-            destdata.vertices[-1].x = sourcedata.vertices[sourceindex].x
-            destdata.vertices[-1].y = sourcedata.vertices[sourceindex].y
-            destdata.vertices[-1].z = sourcedata.vertices[sourceindex].z
-            if sourcedata.has_normals:
-                destdata.normals.update_size()
-                destdata.normals[-1].x = sourcedata.normals[sourceindex].x
-                destdata.normals[-1].y = sourcedata.normals[sourceindex].y
-                destdata.normals[-1].z = sourcedata.normals[sourceindex].z
-            if sourcedata.has_vertex_colors:
-                destdata.vertex_colors.update_size()
-                destdata.vertex_colors[-1].r = sourcedata.vertex_colors[sourceindex].r
-                destdata.vertex_colors[-1].g = sourcedata.vertex_colors[sourceindex].g
-                destdata.vertex_colors[-1].b = sourcedata.vertex_colors[sourceindex].b
-                destdata.vertex_colors[-1].a = sourcedata.vertex_colors[sourceindex].a
-            if sourcedata.has_uv:
-                for sourceuvset, destuvset in zip(sourcedata.uv_sets, destdata.uv_sets):
-                    destuvset.update_size()
-                    destuvset[-1].u = sourceuvset[sourceindex].u
-                    destuvset[-1].v = sourceuvset[sourceindex].v
-            return destdata.num_vertices
-
-    # XXX todo
-    @staticmethod
-    def addTriangle(sourcetriangle, v_map, sourcedata, destdata):
-        """Add a triangle from source to destination."""
-        desttriangle = [
-            destdata.addVertex(sourceindex)
-            for sourceindex in sourcetriangle]
-        destdata.num_triangles += 1
-        destdata.triangles.update_size()
-        destdata.triangles[-1].v_1 = desttriangle[0]
-        destdata.triangles[-1].v_2 = desttriangle[0]
-        destdata.triangles[-1].v_3 = desttriangle[0]
-
-    # XXX todo
     @staticmethod
-    def get_size(vertices, triangle):
-        """Calculate size of geometry data + given triangle."""
-        def helper(oper, coord):
-            return oper((getattr(vert, coord) for vert in triangle),
-                        oper(getattr(vert, coord) for vert in vertices))
-        minx = helper(min, "x")
-        miny = helper(min, "y")
-        minz = helper(min, "z")
-        maxx = helper(max, "x")
-        maxy = helper(max, "y")
-        maxz = helper(max, "z")
-        return max((maxx - minx, maxy - miny, maxz - minz))
-
-    # XXX todo: merge into branchentry spell
-    @staticmethod
-    def split(geom, threshold_radius = THRESHOLD_RADIUS):
-        """Takes a NiGeometry block and splits the geometries. Returns a NiNode
-        which contains the splitted geometry. Note that everything is triangulated
-        in the process."""
-        # make list of triangles
-        # this will be used as the list of triangles still to add
-        triangles = geom.data.get_triangles()
-        node = NifFormat.NiNode().deepcopy(
-            NifFormat.NiAVObject.deepcopy(geom))
-        geomsplit = None
-        # while there are still triangles to add...
-        while triangles:
-            if geomsplit is None:
-                # split new geometry
-                geomsplit = NifFormat.NiTriShape()
-                node.add_child(geomsplit)
-                geomsplit.data = NifFormat.NiTriShapeData()
-                v_map = {}
-                # copy relevant data
-                geomsplit.name = "%s:%i" % (geom.name, node.num_children - 1)
-                geomsplit.data.has_vertices = geom.data.has_vertices
-                geomsplit.data.has_normals = geom.data.has_normals
-                geomsplit.data.has_vertex_colors = geom.data.has_vertex_colors
-                geomsplit.data.num_uv_sets = geom.data.num_uv_sets
-                geomsplit.data.has_uv = geom.data.has_uv
-                geomsplit.data.uv_sets.update_size()
-                # assign it a random triangle
-                triangle = triangles.pop(0)
-                addTriangle(triangle, v_map, geom.data, geomsplit.data)
-            # find face that is close to current geometry
-            for triangle in triangles:
-                 if get_size(geomsplit.data,
-                            tuple(geom.data.vertices[index]
-                                  for index in triangle)) < threshold_radius:
-                     addTriangle(triangle, v_map, geom.data, geomsplit.data)
-                     break
-            else:
-                # if exceeded, start new geometry
-                # first finish some things in geomsplit data
-                geomsplit.data.update_center_radius()
-                # setting geomsplit to None flags this for
-                # the next iteration
-                geomsplit = None
-        # return grouping node
-        return node
+    def get_clusters(vertices, triangles,
+                     max_radius=THRESHOLD_RADIUS, max_triangles=None):
+        """Partition the triangles into spatially coherent clusters, by
+        recursively splitting them at the median of their centroids
+        along the longest axis of the bounding box of the centroids,
+        until the bounding box of the vertices of every cluster has a
+        half diagonal of at most max_radius, and every cluster has at
+        most max_triangles triangles (clusters whose triangles all have
+        the same centroid are never split).
+
+        >>> vertices = [(x, y, 0) for x in range(4) for y in range(2)]
+        >>> triangles = [(2 * x, 2 * x + 2, 2 * x + 1) for x in range(3)]
+        >>> SpellSplitGeometry.get_clusters(vertices, triangles, 10)
+        [[0, 1, 2]]
+        >>> SpellSplitGeometry.get_clusters(vertices, triangles, 1)
+        [[0], [1], [2]]
+        >>> SpellSplitGeometry.get_clusters(vertices, triangles, 10, 2)
+        [[0], [1, 2]]
+
+        :param vertices: The vertices, as tuples of coordinates.
+        :type vertices: ``list`` of ``tuple`` of ``float``
+        :param triangles: The triangles, as tuples of vertex indices.
+        :type triangles: ``list`` of ``tuple`` of ``int``
+        :param max_radius: Maximal radius of each cluster.
+        :type max_radius: ``float``
+        :param max_triangles: Maximal number of triangles of each
+            cluster, or ``None`` for no maximum.
+        :type max_triangles: ``int``
+        :return: The clusters, as sorted lists of triangle indices.
+        :rtype: ``list`` of ``list`` of ``int``
+        """
+        centroids = [
+            tuple((a + b + c) / 3.0
+                  for a, b, c in zip(vertices[v0], vertices[v1], vertices[v2]))
+            for v0, v1, v2 in triangles]
+        clusters = []
+        # stack of clusters still to check, first cluster on top
+        stack = [list(range(len(triangles)))]
+        while stack:
+            cluster = stack.pop()
+            if not cluster:
+                continue
+            # bounding box of the vertices of the cluster
+            cluster_vertices = [vertices[vi]
+                                for triangle in cluster
+                                for vi in triangles[triangle]]
+            radius = 0.5 * sum(
+                (max(coords) - min(coords)) ** 2
+                for coords in zip(*cluster_vertices)) ** 0.5
+            if radius <= max_radius and (max_triangles is None
+                                         or len(cluster) <= max_triangles):
+                clusters.append(sorted(cluster))
+                continue
+            # split along the longest axis of the centroids
+            extents = [max(coords) - min(coords) for coords in zip(
+                *(centroids[triangle] for triangle in cluster))]
+            axis = extents.index(max(extents))
+            if extents[axis] <= 0:
+                # cannot be split any further
+                clusters.append(sorted(cluster))
+                continue
+            cluster.sort(key=lambda triangle: centroids[triangle][axis])
+            middle = len(cluster) // 2
+            stack.append(cluster[middle:])
+            stack.append(cluster[:middle])
+        return clusters
 
     def __init__(self, *args, **kwargs):
         pyffi.spells.nif.NifSpell.__init__(self, *args, **kwargs)
-        # list of all optimized geometries so far
+        # all optimized geometries so far
         # (to avoid optimizing the same geometry twice)
-        self.optimized = []
+        self.optimized = set()
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiTriBasedGeom)
@@ -658,28 +534,182 @@ class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
         if branch in self.optimized:
             # already optimized
             return False
-    
-        # we found a geometry to optimize
-        # XXX todo
-        # get geometry data
-        geomdata = block.data
-        if not geomdata:
-            self.optimized.append(block)
+        self.optimized.add(branch)
+
+        data = branch.data
+        if not data or data.num_triangles == 0:
+            return False
+        if (data.radius <= self.THRESHOLD_RADIUS
+            and data.num_triangles <= self.MAX_TRIANGLES):
+            return False
+        if data.additional_data:
+            self.toaster.msg(
+                "mesh has additional geometry data"
+                " which is not well understood: not splitting")
             return False
-        # check radius
-        if geomdata.radius < self.THRESHOLD_RADIUS:
-            optimized_geometries.append(block)
+        if branch.get_controllers():
+            self.toaster.msg("mesh has controllers: not splitting")
+            return False
+        if isinstance(branch.skin_instance, NifFormat.BSDismemberSkinInstance):
+            self.toaster.msg("mesh has dismember skin: not splitting")
             return False
-        # radius is over the threshold, so re-organize the geometry
-        newblock = split(block, threshold_radius = THRESHOLD_RADIUS)
-        # replace block with newblock everywhere
-        data.replace_global_node(block, newblock)
 
-        self.optimized.append(block)
+        triangles = list(data.get_triangles())
+        vertices = StructBase.copy_basic_values(data.vertices)
+        clusters = self.get_clusters(
+            vertices, triangles,
+            max_radius=self.THRESHOLD_RADIUS,
+            max_triangles=self.MAX_TRIANGLES)
+        if len(clusters) < 2:
+            return False
+        self.toaster.msg("splitting geometry in %i pieces", len(clusters))
+        self.changed = True
+        node = self.split(branch, vertices, triangles, clusters)
+        # replace branch with the node everywhere
+        self.data.replace_global_node(branch, node)
 
         # stop recursing
         return False
 
+    @staticmethod
+    def split(geom, vertices, triangles, clusters):
+        """Create a :class:`NifFormat.NiNode` with one
+        :class:`NifFormat.NiTriShape` child for each cluster of triangles.
+        The node takes over the name, transform, extra data, and
+        collision object of the geometry, and the pieces take over its
+        properties, skin, and vertex data.
+
+        :param geom: The geometry to split.
+        :type geom: :class:`NifFormat.NiTriBasedGeom`
+        :param vertices: The vertices of the geometry.
+        :type vertices: ``list`` of ``tuple`` of ``float``
+        :param triangles: The triangles of the geometry.
+        :type triangles: ``list`` of ``tuple`` of ``int``
+        :param clusters: The triangle indices of each piece.
+        :type clusters: ``list`` of ``list`` of ``int``
+        :return: The node.
+        :rtype: :class:`NifFormat.NiNode`
+        """
+        data = geom.data
+        # copy old data
+        normals = StructBase.copy_basic_values(data.normals)
+        uv_sets = [StructBase.copy_basic_values(uvset, ("u", "v"))
+                   for uvset in data.uv_sets]
+        vertex_colors = StructBase.copy_basic_values(
+            data.vertex_colors, ("r", "g", "b", "a"))
+        if geom.skin_instance:
+            weights = geom.get_vertex_weights()
+            skinpart = geom.get_skin_partition()
+        else:
+            skinpart = None
+        # tangent space is recalculated on every piece
+        tangent_space_extra = None
+        for extra in geom.get_extra_datas():
+            if (isinstance(extra, NifFormat.NiBinaryExtraData)
+                and extra.name == b'Tangent space (binormal & tangent vectors)'):
+                tangent_space_extra = extra
+        has_tangent_space = (tangent_space_extra
+                             or (data.num_uv_sets & 61440)
+                             or (data.bs_num_uv_sets & 61440))
+        # data without vertices, to initialize the data of the pieces
+        template = NifFormat.NiTriBasedGeomData().deepcopy(data)
+        template.num_vertices = 0
+        for attr in template._get_filtered_attribute_list():
+            value = getattr(template, attr.name)
+            if isinstance(value, Array):
+                value.update_size()
+
+        # the node takes over everything that is not geometry
+        node = NifFormat.NiNode().deepcopy(
+            NifFormat.NiAVObject().deepcopy(geom))
+        node.set_properties([])
+        node.set_extra_datas(
+            [extra for extra in geom.get_extra_datas()
+             if extra is not tangent_space_extra])
+        if node.collision_object:
+            node.collision_object.target = node
+
+        for piece_index, cluster in enumerate(clusters):
+            # vertex map of the piece, and its inverse
+            v_map = {}
+            v_map_inverse = []
+            piece_triangles = []
+            for triangle in cluster:
+                piece_triangle = []
+                for vi in triangles[triangle]:
+                    if vi not in v_map:
+                        v_map[vi] = len(v_map_inverse)
+                        v_map_inverse.append(vi)
+                    piece_triangle.append(v_map[vi])
+                piece_triangles.append(piece_triangle)
+            # create the piece
+            piece = NifFormat.NiTriShape().deepcopy(
+                NifFormat.NiTriBasedGeom().deepcopy(geom))
+            piece.name = geom.name + (":%i" % piece_index).encode("ascii")
+            piece.scale = 1.0
+            piece.rotation.set_identity()
+            piece.translation.x = 0.0
+            piece.translation.y = 0.0
+            piece.translation.z = 0.0
+            piece.set_extra_datas([])
+            piece.collision_object = None
+            # set its data
+            piece.data = NifFormat.NiTriShapeData().deepcopy(template)
+            piecedata = piece.data
+            piecedata.num_vertices = len(v_map_inverse)
+            piecedata.vertices.update_size()
+            StructBase.gather_basic_values(
+                piecedata.vertices, vertices, v_map_inverse)
+            if data.has_normals:
+                piecedata.normals.update_size()
+                StructBase.gather_basic_values(
+                    piecedata.normals, normals, v_map_inverse)
+            piecedata.uv_sets.update_size()
+            for uvset, old_uvset in zip(piecedata.uv_sets, uv_sets):
+                StructBase.gather_basic_values(
+                    uvset, old_uvset, v_map_inverse, ("u", "v"))
+            if data.has_vertex_colors:
+                piecedata.vertex_colors.update_size()
+                StructBase.gather_basic_values(
+                    piecedata.vertex_colors, vertex_colors, v_map_inverse,
+                    ("r", "g", "b", "a"))
+            piecedata.set_triangles(piece_triangles)
+            piecedata.update_center_radius()
+            # set its skin
+            if geom.skin_instance:
+                skininst = NifFormat.NiSkinInstance().deepcopy(
+                    geom.skin_instance)
+                skininst.skin_partition = None
+                skininst.data = NifFormat.NiSkinData().deepcopy(
+                    geom.skin_instance.data)
+                skininst.data.skin_partition = None
+                piece.skin_instance = skininst
+                bone_weights = [[] for bonedata in skininst.data.bone_list]
+                for i, old_i in enumerate(v_map_inverse):
+                    for bonenum, weight in weights[old_i]:
+                        bone_weights[bonenum].append((i, weight))
+                for bonedata, w in zip(skininst.data.bone_list, bone_weights):
+                    bonedata.num_vertices = len(w)
+                    bonedata.vertex_weights.update_size()
+                    for vertex_weight, (i, weight) in zip(
+                        bonedata.vertex_weights, w):
+                        vertex_weight.index = i
+                        vertex_weight.weight = weight
+                if skinpart:
+                    # use the limits of the original skin partition
+                    blocks = skinpart.skin_partition_blocks
+                    piece.update_skin_partition(
+                        maxbonesperpartition=max(
+                            block.num_bones for block in blocks),
+                        maxbonespervertex=max(
+                            block.num_weights_per_vertex for block in blocks),
+                        stripify=any(block.num_strips for block in blocks))
+            if has_tangent_space:
+                piece.update_tangent_space(
+                    as_extra=True if tangent_space_extra else None)
+            node.add_child(piece)
+        return node
+
 class SpellDelUnusedBones(pyffi.spells.nif.NifSpell):
     """Remove nodes that are not used for anything."""
 
@@ -989,7 +1019,7 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
             full_v_map_inverse += [old_num_vertices + old_i
                                    for old_i in v_map_inverse]
         # copy old data
-        oldverts = [(v.x, v.y, v.z) for v in data.vertices]
+        oldverts = StructBase.copy_basic_values(data.vertices)
         # set new subshape counts
         for subshape_index, subshape_count in enumerate(subshape_counts):
             if shape.sub_shapes:
@@ -1001,16 +1031,14 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
         # set new data
         data.num_vertices = len(full_v_map_inverse)
         data.vertices.update_size()
-        for old_i, v in zip(full_v_map_inverse, data.vertices):
-            v.x = oldverts[old_i][0]
-            v.y = oldverts[old_i][1]
-            v.z = oldverts[old_i][2]
+        StructBase.gather_basic_values(
+            data.vertices, oldverts, full_v_map_inverse)
         del oldverts
         # update vertex indices in triangles
-        for tri in data.triangles:
-            tri.triangle.v_1 = full_v_map[tri.triangle.v_1]
-            tri.triangle.v_2 = full_v_map[tri.triangle.v_2]
-            tri.triangle.v_3 = full_v_map[tri.triangle.v_3]
+        for values in StructBase.get_basic_values(
+            [tri.triangle for tri in data.triangles], ("v_1", "v_2", "v_3")):
+            for value in values:
+                value.set_value(full_v_map[value.get_value()])
         # at the moment recreating the mopp will destroy multi material mopps
         # (this is a bug in the mopper, not sure what it is)
         # so for now, we keep the mopp intact
@@ -1026,23 +1054,21 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
         self.toaster.msg(_("(num triangles in collision shape was %i and is now %i)")
                          % (len(t_map), new_numtriangles))
         # copy old data
-        oldtris = [(tri.triangle.v_1, tri.triangle.v_2, tri.triangle.v_3,
-                    tri.normal.x, tri.normal.y, tri.normal.z)
-                   for tri in data.triangles]
+        oldtris = StructBase.copy_basic_values(
+            [tri.triangle for tri in data.triangles], ("v_1", "v_2", "v_3"))
+        oldnorms = StructBase.copy_basic_values(
+            [tri.normal for tri in data.triangles])
         # set new data
+        # note: welding updated later when calling the mopper
         data.num_triangles = new_numtriangles
         data.triangles.update_size()
-        for old_i, tri in zip(t_map_inverse, data.triangles):
-            if old_i is None:
-                continue
-            tri.triangle.v_1 = oldtris[old_i][0]
-            tri.triangle.v_2 = oldtris[old_i][1]
-            tri.triangle.v_3 = oldtris[old_i][2]
-            tri.normal.x = oldtris[old_i][3]
-            tri.normal.y = oldtris[old_i][4]
-            tri.normal.z = oldtris[old_i][5]
-            # note: welding updated later when calling the mopper
+        StructBase.gather_basic_values(
+            [tri.triangle for tri in data.triangles], oldtris,
+            t_map_inverse, ("v_1", "v_2", "v_3"))
+        StructBase.gather_basic_values(
+            [tri.normal for tri in data.triangles], oldnorms, t_map_inverse)
         del oldtris
+        del oldnorms
         # update mopp data and welding info
         mopp.update_mopp_welding()
         
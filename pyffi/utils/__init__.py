@@ -41,7 +41,10 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import io
 import os
+import shutil
+import tempfile
 
 def walk(top, topdown=True, onerror=None, re_filename=None):
     """A variant of os.walk() which also works if top is a file instead of a
@@ -74,6 +77,144 @@ def walk(top, topdown=True, onerror=None, re_filename=None):
                 else:
                     yield os.path.join(dirpath, filename)
 
+def buffer_stream(stream, max_size=0x10000000):
+    """Read a binary stream whole into memory, and return an in memory
+    stream with the same name, at the same position. Parsing from
+    memory is faster than doing many small reads from a file. Streams
+    larger than *max_size* bytes, and streams which cannot seek, are
+    returned as they are.
+
+    >>> from io import BytesIO
+    >>> stream = BytesIO(b"abcdef")
+    >>> stream.name = "test.bin"
+    >>> if stream.seek(2): pass
+    >>> buffered = buffer_stream(stream)
+    >>> buffered is stream
+    False
+    >>> buffered.name, buffered.read(2), stream.tell()
+    ('test.bin', b'cd', 2)
+    >>> buffer_stream(stream, max_size=4) is stream
+    True
+
+    :param stream: The stream.
+    :type stream: ``file``
+    :param max_size: The size of the largest stream to buffer.
+    :type max_size: ``int``
+    :return: The in memory stream, or *stream*.
+    """
+    try:
+        pos = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+    except (AttributeError, OSError):
+        # io.UnsupportedOperation derives from OSError
+        return stream
+    if size > max_size:
+        stream.seek(pos)
+        return stream
+    stream.seek(0)
+    buffered = io.BytesIO(stream.read())
+    buffered.name = getattr(stream, "name", None)
+    buffered.seek(pos)
+    stream.seek(pos)
+    return buffered
+
+class AtomicFile(io.FileIO):
+    """A binary file for writing, which replaces the file *name* only
+    once it is complete. Data goes to a temporary file in the same
+    directory, which on :meth:`close` is flushed to disk and renamed
+    over *name* in a single step, so *name* always holds either the
+    old or the new content, even if writing fails or is interrupted.
+    Call :meth:`discard` instead of :meth:`close` to drop the written
+    data.
+
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> name = os.path.join(folder, "test.bin")
+    >>> with open(name, "wb") as stream:
+    ...     stream.write(b"old")
+    3
+    >>> stream = AtomicFile(name)
+    >>> stream.write(b"new")
+    3
+    >>> open(name, "rb").read()
+    b'old'
+    >>> stream.close()
+    >>> open(name, "rb").read()
+    b'new'
+    >>> stream = AtomicFile(name)
+    >>> stream.write(b"partial")
+    7
+    >>> stream.discard()
+    >>> with AtomicFile(name) as stream:
+    ...     stream.write(b"par")
+    ...     raise ValueError("write failed")
+    Traceback (most recent call last):
+        ...
+    ValueError: write failed
+    >>> open(name, "rb").read()
+    b'new'
+    >>> stream = AtomicFile(name)
+    >>> stream.write(b"unclosed")
+    8
+    >>> del stream
+    >>> open(name, "rb").read()
+    b'new'
+    >>> os.listdir(folder)
+    ['test.bin']
+    >>> os.remove(name)
+    >>> os.rmdir(folder)
+    """
+
+    def __init__(self, name):
+        """Create the temporary file.
+
+        :param name: The name of the file to replace.
+        :type name: ``str``
+        """
+        head, tail = os.path.split(name)
+        fd, self.temp_name = tempfile.mkstemp(
+            dir=head or os.curdir, prefix="." + tail + ".", suffix=".tmp")
+        io.FileIO.__init__(self, fd, "wb")
+        self.name = name
+        # mkstemp creates files which only the owner can read, so
+        # take the permissions of the original file, or the default
+        if os.path.exists(name):
+            shutil.copymode(name, self.temp_name)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(self.temp_name, 0o666 & ~umask)
+
+    def close(self):
+        """Flush the data to disk, and replace the file with it."""
+        if self.closed:
+            return
+        try:
+            os.fsync(self.fileno())
+        finally:
+            io.FileIO.close(self)
+        os.replace(self.temp_name, self.name)
+
+    def discard(self):
+        """Close and remove the temporary file, leaving the file as it
+        was.
+        """
+        if self.closed:
+            return
+        io.FileIO.close(self)
+        os.remove(self.temp_name)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # replace the file only if the with block completed
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __del__(self):
+        # only an explicit close replaces the file
+        self.discard()
+
 #table = "."*32
 #for c in [chr(i) for i in range(32,128)]:
 #    table += c
@@ -0,0 +1,344 @@
+"""Tables of numbers, stored as typed arrays, for the bulk export of
+geometry and animation data. Tables are written in the ``.npy`` and
+``.npz`` formats of numpy, which numpy can load, and in the case of
+``.npy`` files memory map, directly. Numpy is not needed to write
+them.
+
+A :class:`Column` is a table with a fixed number of values per row:
+
+>>> vertices = Column("f", 3, [0, 0, 0, 1, 0, 0, 0, 1, 0])
+>>> vertices.shape
+(3, 3)
+>>> vertices.descr
+'<f4'
+>>> stream = io.BytesIO()
+>>> write_npy(stream, vertices)
+>>> len(stream.getvalue()) # header of 128 bytes, and 9 floats
+164
+>>> if stream.seek(0): pass
+>>> column = read_npy(stream)
+>>> column.shape, column.values.tolist()
+((3, 3), [0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0, 0.0])
+
+An archive holds a list of entries, each a dictionary with columns
+under the key ``"columns"``, and any other values that json can
+store. Column *name* of entry *i* is stored as ``<i>/<name>.npy``,
+and everything else in ``manifest.json``:
+
+>>> triangles = Column("I", 3, [0, 1, 2])
+>>> stream = io.BytesIO()
+>>> write_npz(stream, [dict(name="Plane", columns=dict(
+...     vertices=vertices, triangles=triangles))], file="plane.nif")
+>>> sorted(zipfile.ZipFile(stream).namelist())
+['0/triangles.npy', '0/vertices.npy', 'manifest.json']
+>>> entries, info = read_npz(stream)
+>>> info
+{'file': 'plane.nif'}
+>>> entries[0]["name"], sorted(entries[0]["columns"])
+('Plane', ['triangles', 'vertices'])
+>>> entries[0]["columns"]["triangles"].values.tolist()
+[0, 1, 2]
+
+Many archives are merged into a shard: one ``.npy`` file for every
+column name, with the rows of all entries one after the other, and a
+``manifest.json`` which gives the rows of every entry:
+
+>>> import shutil
+>>> import tempfile
+>>> folder = tempfile.mkdtemp()
+>>> archives = []
+>>> for num in range(2):
+...     archive = os.path.join(folder, "%i.npz" % num)
+...     with open(archive, "wb") as stream:
+...         write_npz(stream, [dict(columns=dict(
+...             vertices=Column("f", 3, range(3 * (num + 1)))))],
+...             file="%i.nif" % num)
+...     archives.append(archive)
+>>> write_shard(os.path.join(folder, "shard"), archives)
+>>> sorted(os.listdir(os.path.join(folder, "shard")))
+['manifest.json', 'vertices.npy']
+>>> with open(os.path.join(folder, "shard", "vertices.npy"), "rb") as stream:
+...     read_npy(stream).shape
+(3, 3)
+>>> with open(os.path.join(folder, "shard", "manifest.json")) as stream:
+...     manifest = json.load(stream)
+>>> manifest["columns"]
+{'vertices': {'descr': '<f4', 'shape': [3, 3]}}
+>>> for entry in manifest["entries"]:
+...     print(entry["file"], entry["rows"])
+0.nif {'vertices': [0, 1]}
+1.nif {'vertices': [1, 3]}
+>>> shutil.rmtree(folder)
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import array
+import ast
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import zipfile
+
+_KINDS = {"b": "i", "h": "i", "i": "i", "l": "i", "q": "i",
+          "B": "u", "H": "u", "I": "u", "L": "u", "Q": "u",
+          "f": "f", "d": "f"}
+"""Numpy kind of every array typecode."""
+
+class Column(object):
+    """A table of numbers with *width* values per row, stored row by
+    row in a typed array.
+
+    :param typecode: The type of the values, as for :mod:`array`.
+    :type typecode: ``str``
+    :param width: The number of values per row; tables of width 1 have
+        one dimension only.
+    :type width: ``int``
+    :param values: The values, row by row.
+    :type values: iterable of numbers
+    """
+
+    def __init__(self, typecode, width=1, values=()):
+        self.values = array.array(typecode, values)
+        self.width = width
+
+    @property
+    def rows(self):
+        """The number of rows."""
+        return len(self.values) // self.width
+
+    @property
+    def shape(self):
+        """The shape of the table, as numpy would give it."""
+        if self.width == 1:
+            return (self.rows,)
+        return (self.rows, self.width)
+
+    @property
+    def descr(self):
+        """The type of the values, as numpy describes it, in little
+        endian byte order."""
+        return "<%s%i" % (_KINDS[self.values.typecode],
+                          self.values.itemsize)
+
+    def tobytes(self):
+        """The values as little endian bytes."""
+        if sys.byteorder == "little":
+            return self.values.tobytes()
+        values = array.array(self.values.typecode, self.values)
+        values.byteswap()
+        return values.tobytes()
+
+def _get_typecode(descr):
+    """The array typecode for a type described by numpy."""
+    if descr[0] not in "<|":
+        raise ValueError("unsupported byte order in %r" % descr)
+    kind, itemsize = descr[1], int(descr[2:])
+    for typecode in "bhilqBHILQfd":
+        if (_KINDS[typecode] == kind
+            and array.array(typecode).itemsize == itemsize):
+            return typecode
+    raise ValueError("unsupported type %r" % descr)
+
+def _npy_header(descr, shape):
+    """The header of a ``.npy`` file, padded so the data is aligned
+    on 64 bytes."""
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+        descr, tuple(shape))
+    # magic, version, header length, header, and newline
+    size = 10 + len(header) + 1
+    header += " " * (-size % 64) + "\n"
+    return (b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header))
+            + header.encode("latin-1"))
+
+def write_npy(stream, column):
+    """Write a column as ``.npy`` file.
+
+    :param stream: The stream to write to.
+    :type stream: file
+    :param column: The column.
+    :type column: :class:`Column`
+    """
+    stream.write(_npy_header(column.descr, column.shape))
+    stream.write(column.tobytes())
+
+def read_npy_header(stream):
+    """Read the header of a ``.npy`` file, leaving the stream at the
+    start of the data.
+
+    :param stream: The stream to read from.
+    :type stream: file
+    :return: The type description, and the shape.
+    :rtype: ``tuple`` of ``str`` and ``tuple`` of ``int``
+    """
+    magic = stream.read(8)
+    if magic[:6] != b"\x93NUMPY":
+        raise ValueError("not a npy file")
+    if magic[6] == 1:
+        size, = struct.unpack("<H", stream.read(2))
+    else:
+        size, = struct.unpack("<I", stream.read(4))
+    header = ast.literal_eval(stream.read(size).decode("latin-1"))
+    if header["fortran_order"]:
+        raise ValueError("fortran order not supported")
+    return header["descr"], tuple(header["shape"])
+
+def read_npy(stream):
+    """Read a ``.npy`` file, of at most two dimensions, as column.
+
+    :param stream: The stream to read from.
+    :type stream: file
+    :return: The column.
+    :rtype: :class:`Column`
+    """
+    descr, shape = read_npy_header(stream)
+    if len(shape) > 2:
+        raise ValueError("cannot read array of shape %r" % (shape,))
+    column = Column(_get_typecode(descr), shape[1] if len(shape) > 1 else 1)
+    column.values.frombytes(stream.read(column.values.itemsize
+                                        * column.width * shape[0]))
+    if sys.byteorder != "little":
+        column.values.byteswap()
+    return column
+
+def write_npz(stream, entries, **info):
+    """Write entries as ``.npz`` archive, uncompressed, so its
+    members could be memory mapped.
+
+    :param stream: The stream to write to.
+    :type stream: file
+    :param entries: The entries, each a dictionary with columns by
+        name under ``"columns"``.
+    :type entries: ``list`` of ``dict``
+    :param info: Further values to store in the manifest.
+    """
+    manifest = dict(info, entries=[])
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for i, entry in enumerate(entries):
+            manifest["entries"].append(dict(
+                entry, columns=sorted(entry["columns"])))
+            for name, column in sorted(entry["columns"].items()):
+                data = column.tobytes()
+                with archive.open("%i/%s.npy" % (i, name), "w",
+                                  force_zip64=len(data) > 0x7fff0000
+                                  ) as member:
+                    member.write(_npy_header(column.descr, column.shape))
+                    member.write(data)
+        archive.writestr("manifest.json", json.dumps(manifest))
+
+def read_npz(stream):
+    """Read an archive written by :func:`write_npz`.
+
+    :param stream: The stream to read from.
+    :type stream: file
+    :return: The entries, and the further values of the manifest.
+    :rtype: ``tuple`` of ``list`` of ``dict``, and ``dict``
+    """
+    with zipfile.ZipFile(stream) as archive:
+        info = json.loads(archive.read("manifest.json").decode())
+        entries = info.pop("entries")
+        for i, entry in enumerate(entries):
+            columns = {}
+            for name in entry["columns"]:
+                with archive.open("%i/%s.npy" % (i, name)) as member:
+                    columns[name] = read_npy(member)
+            entry["columns"] = columns
+    return entries, info
+
+def write_shard(folder, archives):
+    """Merge the entries of archives written by :func:`write_npz`
+    into *folder*: one ``.npy`` file for every column name, holding
+    the rows of all entries one after the other, and a
+    ``manifest.json`` with the type and shape of every column, and
+    every entry, with the further values of its archive, and under
+    ``"rows"``, the first and last plus one row of each of its
+    columns. Data is copied in chunks, so shards can be larger than
+    memory.
+
+    :param folder: The folder to write the shard to.
+    :type folder: ``str``
+    :param archives: The file names of the archives.
+    :type archives: ``list`` of ``str``
+    """
+    # first pass: the type and the number of rows of every column
+    columns = {}
+    entries = []
+    for filename in archives:
+        with zipfile.ZipFile(filename) as archive:
+            info = json.loads(archive.read("manifest.json").decode())
+            for i, entry in enumerate(info.pop("entries")):
+                rows = {}
+                for name in entry.pop("columns"):
+                    with archive.open("%i/%s.npy" % (i, name)) as member:
+                        descr, shape = read_npy_header(member)
+                    column = columns.setdefault(
+                        name, dict(descr=descr, shape=[0] + list(shape[1:])))
+                    if (column["descr"], column["shape"][1:]) != (
+                        descr, list(shape[1:])):
+                        raise ValueError(
+                            "column %s of %s has type %s and shape %r,"
+                            " expected %s and %r"
+                            % (name, filename, descr, shape,
+                               column["descr"], column["shape"]))
+                    rows[name] = [column["shape"][0],
+                                  column["shape"][0] + shape[0]]
+                    column["shape"][0] += shape[0]
+                entries.append(dict(info, rows=rows, **entry))
+    # second pass: copy the data
+    os.makedirs(folder, exist_ok=True)
+    streams = {}
+    try:
+        for name, column in columns.items():
+            streams[name] = open(os.path.join(folder, name + ".npy"), "wb")
+            streams[name].write(_npy_header(column["descr"], column["shape"]))
+        for filename in archives:
+            with zipfile.ZipFile(filename) as archive:
+                manifest = json.loads(archive.read("manifest.json").decode())
+                for i, entry in enumerate(manifest["entries"]):
+                    for name in entry["columns"]:
+                        with archive.open("%i/%s.npy" % (i, name)) as member:
+                            read_npy_header(member)
+                            shutil.copyfileobj(member, streams[name])
+    finally:
+        for stream in streams.values():
+            stream.close()
+    with open(os.path.join(folder, "manifest.json"), "w") as stream:
+        json.dump(dict(columns=columns, entries=entries), stream, indent=1)
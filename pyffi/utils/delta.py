@@ -0,0 +1,251 @@
+"""A binary delta format, to store the changes between two versions of
+a file compactly, and to create and apply such patches in process.
+
+The new file is matched against the old one with fixed size blocks:
+every aligned block of the old file is indexed, every offset of the new
+file is looked up in this index, and each hit is extended forwards and
+backwards as far as both files agree. The patch is then a sequence of
+two operations: copy bytes from the old file, or add literal bytes.
+Copies refer to the old file in any order, with their offset stored
+relative to the end of the previous copy, so blocks which move around
+as a whole, as nif blocks do when a spell reorders them, cost only a
+few bytes each. The operations are compressed with zlib, which also
+squeezes the literal data, and checksums of both files guard against
+applying a patch to the wrong file.
+
+>>> old = b"".join(b"block %03i " % i * 4 for i in range(100))
+>>> new = old[2000:] + b"something new" + old[:2000]
+>>> patch = make_patch(old, new)
+>>> len(patch) < 100
+True
+>>> apply_patch(old, patch) == new
+True
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import struct
+import zlib
+
+MAGIC = b"PYFFIPATCH1\n"
+"""First bytes of every patch."""
+
+BLOCK_SIZE = 16
+"""Size of the blocks which are indexed, which is also the length of
+the shortest match which is guaranteed to be found (matches shorter
+than twice this size may be missed).
+"""
+
+def _write_varint(output, value):
+    """Append an unsigned integer to *output*, seven bits per byte."""
+    while value > 0x7f:
+        output.append((value & 0x7f) | 0x80)
+        value >>= 7
+    output.append(value)
+
+def _read_varint(data, pos):
+    """Read an unsigned integer written by :func:`_write_varint`.
+
+    :return: The integer, and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _match_forward(old, old_pos, new, new_pos, limit):
+    """Number of bytes, at most *limit*, for which *old* from *old_pos*
+    and *new* from *new_pos* agree. Runs of bytes are compared at once,
+    doubling the run length on a match and halving it on a mismatch.
+
+    >>> _match_forward(b"xabcdef", 1, b"abcdxx", 0, 6)
+    4
+    """
+    length = 0
+    step = 64
+    while length < limit:
+        step = min(step, limit - length)
+        if (old[old_pos + length:old_pos + length + step]
+            == new[new_pos + length:new_pos + length + step]):
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return length
+
+def _match_backward(old, old_pos, new, new_pos, limit):
+    """Number of bytes, at most *limit*, for which *old* before
+    *old_pos* and *new* before *new_pos* agree.
+
+    >>> _match_backward(b"xabcdef", 4, b"zzabc", 5, 5)
+    3
+    """
+    length = 0
+    step = 64
+    while length < limit:
+        step = min(step, limit - length)
+        if (old[old_pos - length - step:old_pos - length]
+            == new[new_pos - length - step:new_pos - length]):
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return length
+
+def make_patch(old, new, block_size=BLOCK_SIZE):
+    """Create a patch which turns *old* into *new*.
+
+    >>> make_patch(b"", b"abc") == make_patch(b"xyz", b"abc")
+    False
+    >>> apply_patch(b"", make_patch(b"", b""))
+    b''
+
+    :param old: The old file content.
+    :type old: ``bytes``
+    :param new: The new file content.
+    :type new: ``bytes``
+    :param block_size: Size of the indexed blocks.
+    :type block_size: ``int``
+    :return: The patch.
+    :rtype: ``bytes``
+    """
+    # index the aligned blocks of the old file, keeping the first
+    # occurrence of duplicate blocks
+    index = {}
+    for offset in range(len(old) - len(old) % block_size - block_size,
+                        -1, -block_size):
+        index[old[offset:offset + block_size]] = offset
+    get_offset = index.get
+
+    body = bytearray()
+    _write_varint(body, len(old))
+    _write_varint(body, len(new))
+    body += struct.pack("<II", zlib.adler32(old), zlib.adler32(new))
+
+    pos = 0 # current position in the new file
+    literal_start = 0 # start of the bytes not yet written to the patch
+    copy_end = 0 # end of the previous copy in the old file
+    last_pos = len(new) - block_size
+    while pos <= last_pos:
+        offset = get_offset(new[pos:pos + block_size])
+        if offset is None:
+            pos += 1
+            continue
+        # extend the match in both directions
+        back = _match_backward(old, offset, new, pos,
+                               min(offset, pos - literal_start))
+        length = back + block_size + _match_forward(
+            old, offset + block_size, new, pos + block_size,
+            min(len(old) - offset, len(new) - pos) - block_size)
+        pos -= back
+        offset -= back
+        # add the literal bytes before the match
+        if literal_start < pos:
+            _write_varint(body, (pos - literal_start) << 1)
+            body += new[literal_start:pos]
+        # copy the match, offset is zigzag encoded so it is unsigned
+        _write_varint(body, (length << 1) | 1)
+        delta = offset - copy_end
+        _write_varint(body, (delta << 1) if delta >= 0 else (~delta << 1) | 1)
+        copy_end = offset + length
+        pos += length
+        literal_start = pos
+    if literal_start < len(new):
+        _write_varint(body, (len(new) - literal_start) << 1)
+        body += new[literal_start:]
+    return MAGIC + zlib.compress(bytes(body), 9)
+
+def apply_patch(old, patch):
+    """Apply a patch created by :func:`make_patch` to *old*.
+
+    >>> apply_patch(b"xyz", make_patch(b"abc", b"abcd"))
+    Traceback (most recent call last):
+        ...
+    ValueError: patch does not apply: old file differs
+    >>> apply_patch(b"abc", b"garbage")
+    Traceback (most recent call last):
+        ...
+    ValueError: not a patch
+
+    :param old: The old file content.
+    :type old: ``bytes``
+    :param patch: The patch.
+    :type patch: ``bytes``
+    :return: The new file content.
+    :rtype: ``bytes``
+    """
+    if not patch.startswith(MAGIC):
+        raise ValueError("not a patch")
+    body = zlib.decompress(patch[len(MAGIC):])
+    old_size, pos = _read_varint(body, 0)
+    new_size, pos = _read_varint(body, pos)
+    old_checksum, new_checksum = struct.unpack_from("<II", body, pos)
+    pos += 8
+    if old_size != len(old) or old_checksum != zlib.adler32(old):
+        raise ValueError("patch does not apply: old file differs")
+    old = memoryview(old)
+    new = bytearray()
+    copy_end = 0
+    while pos < len(body):
+        length, pos = _read_varint(body, pos)
+        if length & 1:
+            length >>= 1
+            delta, pos = _read_varint(body, pos)
+            offset = copy_end + (~(delta >> 1) if delta & 1 else delta >> 1)
+            new += old[offset:offset + length]
+            copy_end = offset + length
+        else:
+            length >>= 1
+            new += body[pos:pos + length]
+            pos += length
+    if len(new) != new_size or zlib.adler32(new) != new_checksum:
+        raise ValueError("corrupt patch")
+    return bytes(new)
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -112,6 +112,7 @@ class DetailNode(object):
     and make sure that the get_value and set_value functions are
     implemented.
     """
+    __slots__ = ()
 
     def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
         """Generator which yields all children of this item in the
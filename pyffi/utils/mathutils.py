@@ -226,6 +226,55 @@ def matvecMul(mat, vec):
     return tuple( sum( mat[i][j] * vec[j] for j in range(dim) )
                   for i in range(dim) )
 
+def vecListTransformed(veclist, mat):
+    """Return list of vectors transformed by a matrix, with vectors as
+    rows, that is, ``vec * mat``. The last row of a 4x4 (affine) matrix
+    is the translation; a 3x3 matrix has no translation.
+
+    >>> vecListTransformed([(1, 2, 3)],
+    ...                    ((1, 0, 0, 0), (0, 2, 0, 0), (0, 0, 3, 0),
+    ...                     (1, 1, 1, 1)))
+    [(2, 5, 10)]
+    >>> vecListTransformed([(1, 2, 3), (4, 5, 6)],
+    ...                    ((0, 1, 0), (1, 0, 0), (0, 0, 1)))
+    [(2, 1, 3), (5, 4, 6)]
+    """
+    (m11, m12, m13), (m21, m22, m23), (m31, m32, m33) = (
+        row[:3] for row in mat[:3])
+    t1, t2, t3 = mat[3][:3] if len(mat) > 3 else (0, 0, 0)
+    return [(x * m11 + y * m21 + z * m31 + t1,
+             x * m12 + y * m22 + z * m32 + t2,
+             x * m13 + y * m23 + z * m33 + t3)
+            for x, y, z in veclist]
+
+def vecListSkinned(veclist, matlist, weightlist):
+    """Return list of vectors after linear blend skinning: each vector
+    is the sum, over all bones, of its weight times the vector
+    transformed by the bone matrix (as in :func:`vecListTransformed`).
+    The weights are sparse: for each bone, a list of (vector index,
+    weight) pairs. Vectors without weights are zero.
+
+    >>> vecListSkinned([(1, 0, 0), (0, 1, 0), (0, 0, 1)],
+    ...                [((1, 0, 0), (0, 1, 0), (0, 0, 1)),
+    ...                 ((2, 0, 0), (0, 2, 0), (0, 0, 2), (0, 0, 1))],
+    ...                [[(0, 0.5), (1, 1.0)], [(0, 0.5)]])
+    [(1.5, 0.0, 0.5), (0.0, 1.0, 0.0), (0.0, 0.0, 0.0)]
+    """
+    num_vecs = len(veclist)
+    xs = [0.0] * num_vecs
+    ys = [0.0] * num_vecs
+    zs = [0.0] * num_vecs
+    for mat, weights in zip(matlist, weightlist):
+        (m11, m12, m13), (m21, m22, m23), (m31, m32, m33) = (
+            row[:3] for row in mat[:3])
+        t1, t2, t3 = mat[3][:3] if len(mat) > 3 else (0, 0, 0)
+        for index, weight in weights:
+            x, y, z = veclist[index]
+            xs[index] += weight * (x * m11 + y * m21 + z * m31 + t1)
+            ys[index] += weight * (x * m12 + y * m22 + z * m32 + t2)
+            zs[index] += weight * (x * m13 + y * m23 + z * m33 + t3)
+    return list(zip(xs, ys, zs))
+
 def matMul(mat1, mat2):
     """Return matrix * matrix."""
     dim = len(mat1)
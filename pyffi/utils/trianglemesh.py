@@ -61,299 +61,47 @@
 ##~
 ##~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 #~ Imports
 #~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-import operator # itemgetter
-
-
-try:
-    from weakref import WeakSet
-except ImportError:
-    # for py2k
-    from weakref import ref
-    class WeakSet(object):
-        """Simple weak set implementation.
-
-        >>> import gc
-        >>> ws = WeakSet()
-        >>> class Test(object):
-        ...     pass
-        >>> x = Test()
-        >>> y = Test()
-        >>> ws.add(x)
-        >>> list(ws)[0] is x
-        True
-        >>> ws.add(y)
-        >>> len(list(ws)) == 2
-        True
-        >>> del x
-        >>> tmp = gc.collect()
-        >>> list(ws)[0] is y
-        True
-        >>> del y
-        >>> tmp = gc.collect()
-        >>> list(ws)
-        []
-        """
-        def __init__(self, data=None):
-            self.data = set()
-            def _remove(item, selfref=ref(self)):
-                self = selfref()
-                if self is not None:
-                    self.data.discard(item)
-            self._remove = _remove
-            if data is not None:
-                self.update(data)
-
-        def __iter__(self):
-            for itemref in self.data:
-                item = itemref()
-                if item is not None:
-                    yield item
-
-        def __len__(self):
-            return sum(x() is not None for x in self.data)
-
-        def __contains__(self, item):
-            return ref(item) in self.data
-
-        def __reduce__(self):
-            return (self.__class__, (list(self),),
-                    getattr(self, '__dict__', None))
-
-        def add(self, item):
-            self.data.add(ref(item, self._remove))
-
-        def clear(self):
-            self.data.clear()
-
-        def copy(self):
-            return self.__class__(self)
-
-        def pop(self):
-            while True:
-                try:
-                    itemref = self.data.pop()
-                except KeyError:
-                    raise KeyError('pop from empty WeakSet')
-                item = itemref()
-                if item is not None:
-                    return item
-
-        def remove(self, item):
-            self.data.remove(ref(item))
-
-        def discard(self, item):
-            self.data.discard(ref(item))
-
-        def update(self, other):
-            if isinstance(other, self.__class__):
-                self.data.update(other.data)
-            else:
-                for element in other:
-                    self.add(element)
-        def __ior__(self, other):
-            self.update(other)
-            return self
-
-        # Helper functions for simple delegating methods.
-        def _apply(self, other, method):
-            if not isinstance(other, self.__class__):
-                other = self.__class__(other)
-            newdata = method(other.data)
-            newset = self.__class__()
-            newset.data = newdata
-            return newset
-
-        def difference(self, other):
-            return self._apply(other, self.data.difference)
-        __sub__ = difference
-
-        def difference_update(self, other):
-            if self is other:
-                self.data.clear()
-            else:
-                self.data.difference_update(ref(item) for item in other)
-        def __isub__(self, other):
-            if self is other:
-                self.data.clear()
-            else:
-                self.data.difference_update(ref(item) for item in other)
-            return self
-
-        def intersection(self, other):
-            return self._apply(other, self.data.intersection)
-        __and__ = intersection
-
-        def intersection_update(self, other):
-            self.data.intersection_update(ref(item) for item in other)
-        def __iand__(self, other):
-            self.data.intersection_update(ref(item) for item in other)
-            return self
-
-        def issubset(self, other):
-            return self.data.issubset(ref(item) for item in other)
-        __lt__ = issubset
-
-        def __le__(self, other):
-            return self.data <= set(ref(item) for item in other)
-
-        def issuperset(self, other):
-            return self.data.issuperset(ref(item) for item in other)
-        __gt__ = issuperset
-
-        def __ge__(self, other):
-            return self.data >= set(ref(item) for item in other)
-
-        def __eq__(self, other):
-            if not isinstance(other, self.__class__):
-                return NotImplemented
-            return self.data == set(ref(item) for item in other)
-
-        def symmetric_difference(self, other):
-            return self._apply(other, self.data.symmetric_difference)
-        __xor__ = symmetric_difference
-
-        def symmetric_difference_update(self, other):
-            if self is other:
-                self.data.clear()
-            else:
-                self.data.symmetric_difference_update(ref(item) for item in other)
-        def __ixor__(self, other):
-            if self is other:
-                self.data.clear()
-            else:
-                self.data.symmetric_difference_update(ref(item) for item in other)
-            return self
-
-        def union(self, other):
-            return self._apply(other, self.data.union)
-        __or__ = union
-
-        def isdisjoint(self, other):
-            return len(self.intersection(other)) == 0
-
-class Edge:
-    """A directed edge which keeps track of its faces."""
-
-    def __init__(self, ev0, ev1):
-        """Edge constructor.
-
-        >>> edge = Edge(6, 9)
-        >>> edge.verts
-        (6, 9)
-        >>> edge = Edge(8, 5)
-        >>> edge.verts
-        (8, 5)
-        >>> edge = Edge(3, 3) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        """
-        
-        if ev0 == ev1:
-            raise ValueError("Degenerate edge.")
-
-        self.verts = (ev0, ev1)
-        """Vertices of the edge."""
-
-        self.faces = WeakSet()
-        """Weak set of faces that have this edge."""
-
-    def __repr__(self):
-        """String representation.
-
-        >>> Edge(1, 2)
-        Edge(1, 2)
-        """
-        return "Edge(%s, %s)" % self.verts
-
-class Face:
-    """An oriented face which keeps track its adjacent faces."""
+from array import array
 
-    def __init__(self, v0, v1, v2):
-        """Construct face from vertices.
+def _face_key(v0, v1, v2):
+    """Integer key of a face, which sorts as the tuple of its
+    vertices (vertex indices must be less than 2 ** 32).
 
-        >>> face = Face(3, 7, 5)
-        >>> face.verts
-        (3, 7, 5)
-        >>> face = Face(9, 8, 2)
-        >>> face.verts
-        (2, 9, 8)
-        >>> face = Face(6, 1, 4)
-        >>> face.verts
-        (1, 4, 6)
-        >>> Face(30, 0, 30) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        >>> Face(0, 40, 40) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        >>> Face(50, 50, 0) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        >>> Face(7, 7, 7) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        """
-        if v0 == v1 or v1 == v2 or v2 == v0:
-            raise ValueError("Degenerate face.")
-        if v0 < v1 and v0 < v2:
-            self.verts = (v0, v1, v2)
-        if v1 < v0 and v1 < v2:
-            self.verts = (v1, v2, v0)
-        if v2 < v0 and v2 < v1:
-            self.verts = (v2, v0, v1)
-        # no index yet
-        self.index = None
-
-        self.adjacent_faces = (WeakSet(), WeakSet(), WeakSet())
-        """Weak sets of adjacent faces along edge opposite each vertex."""
+    >>> _face_key(0, 1, 2) < _face_key(0, 2, 1) < _face_key(1, 0, 0)
+    True
+    """
+    return (v0 << 64) | (v1 << 32) | v2
 
-    def __repr__(self):
-        """String representation.
-
-        >>> Face(3, 1, 2)
-        Face(1, 2, 3)
-        """
-        return "Face(%s, %s, %s)" % self.verts
-
-    def get_next_vertex(self, vi):
-        """Get next vertex of face.
-
-        >>> face = Face(8, 7, 5)
-        >>> face.get_next_vertex(8)
-        7
-        >>> face.get_next_vertex(7)
-        5
-        >>> face.get_next_vertex(5)
-        8
-        >>> face.get_next_vertex(10) # doctest: +ELLIPSIS
-        Traceback (most recent call last):
-            ...
-        ValueError: ...
-        """
-        # XXX using list(self.verts) instead of self.verts
-        # XXX for Python 2.5 compatibility
-        return self.verts[(1, 2, 0)[list(self.verts).index(vi)]]
+def _face_key_verts(key):
+    """Inverse of :func:`_face_key`.
 
-    def get_adjacent_faces(self, vi):
-        """Get adjacent faces associated with the edge opposite a vertex."""
-        # XXX using list(self.verts) instead of self.verts
-        # XXX for Python 2.5 compatibility
-        return self.adjacent_faces[list(self.verts).index(vi)]
+    >>> _face_key_verts(_face_key(3, 70000, 5))
+    (3, 70000, 5)
+    """
+    return (key >> 64, (key >> 32) & 0xffffffff, key & 0xffffffff)
 
 class Mesh:
-    """A mesh of interconnected faces.
-
-    :ivar faces: List of faces of the mesh.
-    :type faces: ``list`` of :class:`Face`"""
+    """A mesh of interconnected oriented faces, stored in integer arrays.
+
+    Faces are numbered from zero. The vertices of face ``f`` are
+    stored at ``3 * f``, ``3 * f + 1``, and ``3 * f + 2``, rotated so
+    the lowest vertex comes first. Half-edge ``3 * f + i`` runs from
+    vertex ``i`` to vertex ``i + 1`` (modulo 3) of face ``f``, so it is
+    the edge opposite vertex ``i + 2``. All half-edges with the same
+    start and end vertex form a directed edge, which keeps a doubly
+    linked list of its half-edges, and its reverse (twin) directed
+    edge. The faces adjacent to a half-edge are the faces of the
+    half-edges of the twin of its directed edge.
+
+    :ivar num_faces: Number of faces of the mesh, including discarded
+        ones (only available once the mesh is locked).
+    :type num_faces: ``int``
+    """
     def __init__(self, faces=None, lock=True):
         """Initialize a mesh, and optionally assign its faces and lock.
 
@@ -365,10 +113,34 @@ class Mesh:
         :type lock: ``bool``
         """
         self._faces = {}
-        """Dictionary of all faces."""
+        """Maps face key (see :func:`_face_key`) to face index. Only
+        used while building the mesh."""
 
         self._edges = {}
-        """Dictionary of all edges."""
+        """Maps directed edge key to directed edge index. Only used
+        while building the mesh."""
+
+        self._face_verts = array('i')
+        """Vertices of each face."""
+
+        self._halfedge_edge = array('i')
+        """Directed edge of each half-edge."""
+
+        self._halfedge_next = array('i')
+        """Next half-edge of the same directed edge, or -1."""
+
+        self._halfedge_prev = array('i')
+        """Previous half-edge of the same directed edge, or -1."""
+
+        self._edge_twin = array('i')
+        """Reverse directed edge of each directed edge, or -1."""
+
+        self._edge_first = array('i')
+        """First half-edge of each directed edge, or -1."""
+
+        self._edge_last = array('i')
+        """Last half-edge of each directed edge. Only used while
+        building the mesh."""
 
         if faces is not None:
             for v0, v1, v2 in faces:
@@ -393,50 +165,53 @@ class Mesh:
         Mesh(faces=[(1, 2, 3), (2, 4, 3)])
         """
         try:
-            self.faces
+            faces = self._faces
         except AttributeError:
+            # locked
+            return ("Mesh(faces=[%s])"
+                    % ', '.join(repr(verts) for verts in sorted(
+                        self.get_face_verts(face)
+                        for face in range(self.num_faces)
+                        if not self._face_discarded[face])))
+        else:
             # unlocked
-            if not self._faces:
+            if not faces:
                 # special case
                 return "Mesh()"
             return ("Mesh(faces=[%s], lock=False)"
-                    % ', '.join(repr(faceverts)
-                                for faceverts in sorted(self._faces)))
-        else:
-            # locked
-            return ("Mesh(faces=[%s])"
-                    % ', '.join(repr(face.verts)
-                                for face in self.faces))
-
-    def _add_edge(self, face, pv0, pv1):
-        """Create new edge for mesh for given face, or return existing
-        edge. Lists of faces of the new/existing edge is also updated,
-        as well as lists of adjacent faces. For internal use only,
-        called on each edge of the face in add_face.
-        """
-        # create edge if not found
-        try:
-            edge = self._edges[(pv0, pv1)]
-        except KeyError:
-            # create edge
-            edge = Edge(pv0, pv1)
-            self._edges[(pv0, pv1)] = edge
+                    % ', '.join(repr(_face_key_verts(key))
+                                for key in sorted(faces)))
 
-        # update edge's faces
-        edge.faces.add(face)
-
-        # find reverse edge in mesh
+    def _add_halfedge(self, pv0, pv1):
+        """Add half-edge from pv0 to pv1 to its directed edge, creating
+        the directed edge if needed, and linking it to its twin. For
+        internal use only, called on each edge of the face in add_face.
+        """
+        halfedge = len(self._halfedge_edge)
+        key = (pv0 << 32) | pv1
         try:
-            otheredge = self._edges[(pv1, pv0)]
+            edge = self._edges[key]
         except KeyError:
-            pass
+            # create directed edge, and link it with its twin
+            edge = len(self._edge_first)
+            self._edges[key] = edge
+            twin = self._edges.get((pv1 << 32) | pv0, -1)
+            if twin != -1:
+                self._edge_twin[twin] = edge
+            self._edge_twin.append(twin)
+            self._edge_first.append(halfedge)
+            self._halfedge_prev.append(-1)
+        else:
+            # append half-edge to the list of the directed edge
+            last = self._edge_last[edge]
+            self._halfedge_next[last] = halfedge
+            self._halfedge_prev.append(last)
+        if edge == len(self._edge_last):
+            self._edge_last.append(halfedge)
         else:
-            # update adjacent faces
-            pv2 = face.get_next_vertex(pv1)
-            for otherface in otheredge.faces:
-                otherpv2 = otherface.get_next_vertex(pv0)
-                face.get_adjacent_faces(pv2).add(otherface)
-                otherface.get_adjacent_faces(otherpv2).add(face)
+            self._edge_last[edge] = halfedge
+        self._halfedge_edge.append(edge)
+        self._halfedge_next.append(-1)
 
     def add_face(self, v0, v1, v2):
         """Create new face for mesh, or return existing face. List of
@@ -444,9 +219,34 @@ class Mesh:
 
         >>> m = Mesh()
         >>> f0 = m.add_face(0, 1, 2)
-        >>> [list(faces) for faces in f0.adjacent_faces]
+        >>> [m.get_adjacent_faces(f0, vi) for vi in (0, 1, 2)]
         [[], [], []]
 
+        The vertices of the face are rotated so the lowest comes first:
+
+        >>> m.get_face_verts(m.add_face(3, 7, 5))
+        (3, 7, 5)
+        >>> m.get_face_verts(m.add_face(9, 8, 2))
+        (2, 9, 8)
+        >>> m.get_face_verts(m.add_face(6, 1, 4))
+        (1, 4, 6)
+        >>> m.add_face(30, 0, 30) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+            ...
+        ValueError: ...
+        >>> m.add_face(0, 40, 40) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+            ...
+        ValueError: ...
+        >>> m.add_face(50, 50, 0) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+            ...
+        ValueError: ...
+        >>> m.add_face(7, 7, 7) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+            ...
+        ValueError: ...
+
         >>> m = Mesh()
         >>> f0 = m.add_face(0, 1, 2)
         >>> f1 = m.add_face(2, 1, 3)
@@ -456,14 +256,14 @@ class Mesh:
         >>> len(m._edges)
         9
         >>> f3 = m.add_face(2, 3, 4)
-        >>> f3 is f2
+        >>> f3 == f2
         True
         >>> f4 = m.add_face(10, 11, 12)
         >>> f5 = m.add_face(12, 10, 11)
         >>> f6 = m.add_face(11, 12, 10)
-        >>> f4 is f5
+        >>> f4 == f5
         True
-        >>> f4 is f6
+        >>> f4 == f6
         True
         >>> len(m._faces)
         4
@@ -483,81 +283,89 @@ class Mesh:
         >>> f0 = m.add_face(0, 1, 2)
         >>> f1 = m.add_face(1, 3, 2)
         >>> f2 = m.add_face(2, 3, 4)
-        >>> list(f0.get_adjacent_faces(0))
-        [Face(1, 3, 2)]
-        >>> list(f0.get_adjacent_faces(1))
+        >>> m.get_adjacent_faces(f0, 0) == [f1]
+        True
+        >>> m.get_adjacent_faces(f0, 1)
         []
-        >>> list(f0.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f0, 2)
         []
-        >>> list(f1.get_adjacent_faces(1))
-        [Face(2, 3, 4)]
-        >>> list(f1.get_adjacent_faces(3))
-        [Face(0, 1, 2)]
-        >>> list(f1.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f1, 1) == [f2]
+        True
+        >>> m.get_adjacent_faces(f1, 3) == [f0]
+        True
+        >>> m.get_adjacent_faces(f1, 2)
         []
-        >>> list(f2.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f2, 2)
         []
-        >>> list(f2.get_adjacent_faces(3))
+        >>> m.get_adjacent_faces(f2, 3)
         []
-        >>> list(f2.get_adjacent_faces(4))
-        [Face(1, 3, 2)]
+        >>> m.get_adjacent_faces(f2, 4) == [f1]
+        True
         >>> # add an extra face, and check changes
         >>> f3 = m.add_face(2, 3, 5)
-        >>> list(f0.get_adjacent_faces(0))
-        [Face(1, 3, 2)]
-        >>> list(f0.get_adjacent_faces(1))
+        >>> m.get_adjacent_faces(f0, 0) == [f1]
+        True
+        >>> m.get_adjacent_faces(f0, 1)
         []
-        >>> list(f0.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f0, 2)
         []
-        >>> list(f1.get_adjacent_faces(1)) # extra face here!
-        [Face(2, 3, 4), Face(2, 3, 5)]
-        >>> list(f1.get_adjacent_faces(3))
-        [Face(0, 1, 2)]
-        >>> list(f1.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f1, 1) == [f2, f3] # extra face here!
+        True
+        >>> m.get_adjacent_faces(f1, 3) == [f0]
+        True
+        >>> m.get_adjacent_faces(f1, 2)
         []
-        >>> list(f2.get_adjacent_faces(2))
+        >>> m.get_adjacent_faces(f2, 2)
         []
-        >>> list(f2.get_adjacent_faces(3))
+        >>> m.get_adjacent_faces(f2, 3)
         []
-        >>> list(f2.get_adjacent_faces(4))
-        [Face(1, 3, 2)]
+        >>> m.get_adjacent_faces(f2, 4) == [f1]
+        True
+
+        :return: The index of the face.
+        :rtype: ``int``
         """
-        face = Face(v0, v1, v2)
+        if v0 == v1 or v1 == v2 or v2 == v0:
+            raise ValueError("Degenerate face.")
+        if v0 < v1 and v0 < v2:
+            verts = (v0, v1, v2)
+        elif v1 < v0 and v1 < v2:
+            verts = (v1, v2, v0)
+        else:
+            verts = (v2, v0, v1)
+        key = _face_key(*verts)
         try:
-            face = self._faces[face.verts]
+            return self._faces[key]
         except KeyError:
-            # create edges and update links between faces
-            self._add_edge(face, v0, v1)
-            self._add_edge(face, v1, v2)
-            self._add_edge(face, v2, v0)
-            # register face in mesh
-            self._faces[face.verts] = face
-
+            pass
+        # register face in mesh
+        face = len(self._faces)
+        self._faces[key] = face
+        self._face_verts.extend(verts)
+        # create edges and update links between faces
+        pv0, pv1, pv2 = verts
+        self._add_halfedge(pv0, pv1)
+        self._add_halfedge(pv1, pv2)
+        self._add_halfedge(pv2, pv0)
         return face
 
     def lock(self):
         """Lock the mesh. Frees memory by clearing the structures
-        which are only used to update the face adjacency lists. Sets
-        the faces attribute to the sorted list of all faces (sorting helps
-        with ensuring that the strips in faces are close together).
+        which are only used to add faces. Face indices remain valid.
 
         >>> m = Mesh()
         >>> f0 = m.add_face(3, 1, 2)
         >>> f1 = m.add_face(0, 1, 2)
         >>> f2 = m.add_face(5, 6, 2)
-        >>> m.faces # doctest: +ELLIPSIS
+        >>> m.num_faces # doctest: +ELLIPSIS
         Traceback (most recent call last):
             ...
         AttributeError: ...
         >>> m.lock()
-        >>> m.faces # should be sorted
-        [Face(0, 1, 2), Face(1, 2, 3), Face(2, 5, 6)]
-        >>> m.faces[0].index
-        0
-        >>> m.faces[1].index
-        1
-        >>> m.faces[2].index
-        2
+        >>> m.num_faces
+        3
+        >>> m.get_face_verts(f0)
+        (1, 2, 3)
         >>> m._faces # doctest: +ELLIPSIS
         Traceback (most recent call last):
             ...
@@ -571,40 +379,118 @@ class Mesh:
             ...
         AttributeError: ...
         """
-        # store faces and set their index
-        self.faces = []
-        for i, (verts, face) in enumerate(sorted(iter(self._faces.items()),
-                                          key=operator.itemgetter(0))):
-            face.index = i
-            self.faces.append(face)
+        self.num_faces = len(self._faces)
+        self._face_discarded = bytearray(self.num_faces)
         # remove helper structures
         del self._faces
         del self._edges
+        del self._edge_last
+
+    def get_face_verts(self, face):
+        """Get the vertices of a face.
+
+        >>> m = Mesh()
+        >>> m.get_face_verts(m.add_face(8, 7, 5))
+        (5, 8, 7)
+
+        :param face: The index of the face.
+        :type face: ``int``
+        :return: The vertices, lowest first.
+        :rtype: ``tuple`` of ``int``
+        """
+        start = 3 * face
+        return tuple(self._face_verts[start:start + 3])
+
+    def get_next_vertex(self, face, vi):
+        """Get next vertex of face.
+
+        >>> m = Mesh()
+        >>> face = m.add_face(8, 7, 5)
+        >>> m.get_next_vertex(face, 8)
+        7
+        >>> m.get_next_vertex(face, 7)
+        5
+        >>> m.get_next_vertex(face, 5)
+        8
+        >>> m.get_next_vertex(face, 10) # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+            ...
+        ValueError: ...
+        """
+        verts = self._face_verts
+        start = 3 * face
+        if verts[start] == vi:
+            return verts[start + 1]
+        elif verts[start + 1] == vi:
+            return verts[start + 2]
+        elif verts[start + 2] == vi:
+            return verts[start]
+        raise ValueError("%s is not a vertex of face %i" % (vi, face))
+
+    def get_adjacent_faces(self, face, vi):
+        """Get adjacent faces associated with the edge opposite a vertex.
+
+        :param face: The index of the face.
+        :type face: ``int``
+        :param vi: A vertex of the face.
+        :type vi: ``int``
+        :return: The indices of the adjacent faces.
+        :rtype: ``list`` of ``int``
+        """
+        verts = self._face_verts
+        start = 3 * face
+        # the edge opposite vertex i is half-edge i + 1
+        if verts[start] == vi:
+            halfedge = start + 1
+        elif verts[start + 1] == vi:
+            halfedge = start + 2
+        elif verts[start + 2] == vi:
+            halfedge = start
+        else:
+            raise ValueError("%s is not a vertex of face %i" % (vi, face))
+        faces = []
+        twin = self._edge_twin[self._halfedge_edge[halfedge]]
+        if twin != -1:
+            halfedge_next = self._halfedge_next
+            halfedge = self._edge_first[twin]
+            while halfedge != -1:
+                faces.append(halfedge // 3)
+                halfedge = halfedge_next[halfedge]
+        return faces
 
     def discard_face(self, face):
-        """Remove the face from the mesh.
+        """Remove the face from the mesh. Face indices of other faces
+        remain valid.
 
         >>> m = Mesh()
         >>> f0 = m.add_face(0, 1, 2)
         >>> f1 = m.add_face(1, 3, 2)
         >>> f2 = m.add_face(2, 3, 4)
         >>> m.lock()
-        >>> list(f0.get_adjacent_faces(0))
-        [Face(1, 3, 2)]
-        >>> m.discard_face(f1)
-        >>> list(f0.get_adjacent_faces(0))
+        >>> m.get_adjacent_faces(0, 0)
+        [1]
+        >>> m.discard_face(1)
+        >>> m.get_adjacent_faces(0, 0)
+        []
+        >>> m.get_adjacent_faces(2, 4)
         []
+        >>> m
+        Mesh(faces=[(0, 1, 2), (2, 3, 4)])
         """
-        # note: don't delete, but set to None, to ensure that other
-        # face indices remain valid
-        self.faces[face.index] = None
-        for adj_faces in face.adjacent_faces:
-            for adj_face in adj_faces:
-                for adj_adj_faces in adj_face.adjacent_faces:
-                    adj_adj_faces.discard(face)
-                    # faster (but breaks py3k!!):
-                    #if id(face) in adj_adj_faces.data:
-                    #    del adj_adj_faces.data[id(face)]
+        if self._face_discarded[face]:
+            return
+        self._face_discarded[face] = 1
+        halfedge_next = self._halfedge_next
+        halfedge_prev = self._halfedge_prev
+        for halfedge in range(3 * face, 3 * face + 3):
+            next_ = halfedge_next[halfedge]
+            prev = halfedge_prev[halfedge]
+            if prev == -1:
+                self._edge_first[self._halfedge_edge[halfedge]] = next_
+            else:
+                halfedge_next[prev] = next_
+            if next_ != -1:
+                halfedge_prev[next_] = prev
 
 if __name__=='__main__':
     import doctest
@@ -50,7 +50,7 @@ output in all circumstances.
 import itertools
 import random # choice
 
-from pyffi.utils.trianglemesh import Face, Mesh
+from pyffi.utils.trianglemesh import Mesh
 
 class TriangleStrip(object):
     """A heavily specialized oriented strip of faces.
@@ -61,9 +61,10 @@ class TriangleStrip(object):
     http://techgame.net/projects/Runeblade/browser/trunk/RBRapier/RBRapier/Tools/Geometry/Analysis/TriangleStripifier.py?rev=760
     """
 
-    def __init__(self, stripped_faces=None,
+    def __init__(self, mesh, stripped_faces=None,
                  faces=None, vertices=None, reversed_=False):
         """Initialise the triangle strip."""
+        self.mesh = mesh
         self.faces = faces if faces is not None else []
         self.vertices = vertices if vertices is not None else []
         self.reversed_ = reversed_
@@ -79,8 +80,8 @@ class TriangleStrip(object):
 
     def get_unstripped_adjacent_face(self, face, vi):
         """Get adjacent face which is not yet stripped."""
-        for otherface in face.get_adjacent_faces(vi):
-            if otherface.index not in self.stripped_faces:
+        for otherface in self.mesh.get_adjacent_faces(face, vi):
+            if otherface not in self.stripped_faces:
                 return otherface
 
     def traverse_faces(self, start_vertex, start_face, forward):
@@ -90,37 +91,38 @@ class TriangleStrip(object):
         """
         count = 0
         pv0 = start_vertex
-        pv1 = start_face.get_next_vertex(pv0)
-        pv2 = start_face.get_next_vertex(pv1)
+        get_next_vertex = self.mesh.get_next_vertex
+        pv1 = get_next_vertex(start_face, pv0)
+        pv2 = get_next_vertex(start_face, pv1)
+        if forward:
+            faces = self.faces
+            vertices = self.vertices
+        else:
+            # collect in reverse order, and prepend at the end, as
+            # inserting at the front of a list is slow
+            faces = []
+            vertices = []
         next_face = self.get_unstripped_adjacent_face(start_face, pv0)
-        while next_face:
-            self.stripped_faces.add(next_face.index)
+        while next_face is not None:
+            self.stripped_faces.add(next_face)
             count += 1
-            if count & 1:
-                if forward:
-                    pv0 = pv1
-                    pv1 = next_face.get_next_vertex(pv0)
-                    self.vertices.append(pv1)
-                    self.faces.append(next_face)
-                else:
-                    pv0 = pv2
-                    pv2 = next_face.get_next_vertex(pv1)
-                    self.vertices.insert(0, pv2)
-                    self.faces.insert(0, next_face)
-                    self.reversed_ = not self.reversed_
+            if (count & 1) == forward:
+                pv0 = pv1
+                pv1 = get_next_vertex(next_face, pv0)
+                vertices.append(pv1)
             else:
-                if forward:
-                    pv0 = pv2
-                    pv2 = next_face.get_next_vertex(pv1)
-                    self.vertices.append(pv2)
-                    self.faces.append(next_face)
-                else:
-                    pv0 = pv1
-                    pv1 = next_face.get_next_vertex(pv0)
-                    self.vertices.insert(0, pv1)
-                    self.faces.insert(0, next_face)
-                    self.reversed_ = not self.reversed_
+                pv0 = pv2
+                pv2 = get_next_vertex(next_face, pv1)
+                vertices.append(pv2)
+            faces.append(next_face)
             next_face = self.get_unstripped_adjacent_face(next_face, pv0)
+        if not forward:
+            faces.reverse()
+            vertices.reverse()
+            self.faces[:0] = faces
+            self.vertices[:0] = vertices
+            if count & 1:
+                self.reversed_ = not self.reversed_
         return count
 
     def build(self, start_vertex, start_face):
@@ -133,25 +135,25 @@ class TriangleStrip(object):
         >>> m = Mesh()
         >>> face = m.add_face(0, 1, 2)
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(0, face)
         0
         >>> t
-        TriangleStrip(stripped_faces={0}, faces=[Face(0, 1, 2)], vertices=[0, 1, 2], reversed_=False)
+        TriangleStrip(stripped_faces={0}, faces=[0], vertices=[0, 1, 2], reversed_=False)
         >>> t.get_strip()
         [0, 1, 2]
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(1, face)
         0
         >>> t
-        TriangleStrip(stripped_faces={0}, faces=[Face(0, 1, 2)], vertices=[1, 2, 0], reversed_=False)
+        TriangleStrip(stripped_faces={0}, faces=[0], vertices=[1, 2, 0], reversed_=False)
         >>> t.get_strip()
         [1, 2, 0]
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(2, face)
         0
         >>> t
-        TriangleStrip(stripped_faces={0}, faces=[Face(0, 1, 2)], vertices=[2, 0, 1], reversed_=False)
+        TriangleStrip(stripped_faces={0}, faces=[0], vertices=[2, 0, 1], reversed_=False)
         >>> t.get_strip()
         [2, 0, 1]
 
@@ -162,32 +164,32 @@ class TriangleStrip(object):
         >>> face0 = m.add_face(0, 1, 2)
         >>> face1 = m.add_face(2, 1, 3)
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(0, face0)
         0
         >>> t
-        TriangleStrip(stripped_faces={0, 1}, faces=[Face(0, 1, 2), Face(1, 3, 2)], vertices=[0, 1, 2, 3], reversed_=False)
+        TriangleStrip(stripped_faces={0, 1}, faces=[0, 1], vertices=[0, 1, 2, 3], reversed_=False)
         >>> t.get_strip()
         [0, 1, 2, 3]
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(1, face0)
         1
         >>> t
-        TriangleStrip(stripped_faces={0, 1}, faces=[Face(1, 3, 2), Face(0, 1, 2)], vertices=[3, 1, 2, 0], reversed_=True)
+        TriangleStrip(stripped_faces={0, 1}, faces=[1, 0], vertices=[3, 1, 2, 0], reversed_=True)
         >>> t.get_strip()
         [3, 2, 1, 0]
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(2, face1)
         1
         >>> t
-        TriangleStrip(stripped_faces={0, 1}, faces=[Face(0, 1, 2), Face(1, 3, 2)], vertices=[0, 2, 1, 3], reversed_=True)
+        TriangleStrip(stripped_faces={0, 1}, faces=[0, 1], vertices=[0, 2, 1, 3], reversed_=True)
         >>> t.get_strip()
         [0, 1, 2, 3]
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(3, face1)
         0
         >>> t
-        TriangleStrip(stripped_faces={0, 1}, faces=[Face(1, 3, 2), Face(0, 1, 2)], vertices=[3, 2, 1, 0], reversed_=False)
+        TriangleStrip(stripped_faces={0, 1}, faces=[1, 0], vertices=[3, 2, 1, 0], reversed_=False)
         >>> t.get_strip()
         [3, 2, 1, 0]
 
@@ -200,11 +202,11 @@ class TriangleStrip(object):
         >>> face2 = m.add_face(4, 3, 5)
         >>> face3 = m.add_face(4, 5, 6)
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(2, face1)
         1
         >>> t
-        TriangleStrip(stripped_faces={0, 1, 2, 3}, faces=[Face(1, 3, 2), Face(2, 3, 4), Face(3, 5, 4), Face(4, 5, 6)], vertices=[1, 2, 3, 4, 5, 6], reversed_=True)
+        TriangleStrip(stripped_faces={0, 1, 2, 3}, faces=[0, 1, 2, 3], vertices=[1, 2, 3, 4, 5, 6], reversed_=True)
         >>> t.get_strip()
         [1, 1, 2, 3, 4, 5, 6]
 
@@ -216,11 +218,11 @@ class TriangleStrip(object):
         >>> face1 = m.add_face(2, 3, 4)
         >>> face2 = m.add_face(4, 3, 5)
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(2, face1)
         1
         >>> t
-        TriangleStrip(stripped_faces={0, 1, 2}, faces=[Face(1, 3, 2), Face(2, 3, 4), Face(3, 5, 4)], vertices=[1, 2, 3, 4, 5], reversed_=True)
+        TriangleStrip(stripped_faces={0, 1, 2}, faces=[0, 1, 2], vertices=[1, 2, 3, 4, 5], reversed_=True)
         >>> t.get_strip()
         [5, 4, 3, 2, 1]
 
@@ -238,7 +240,7 @@ class TriangleStrip(object):
         >>> face7 = m.add_face(11, 10, 12)
         >>> face8 = m.add_face(1, 0, 13)
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(7, face1)
         4
         >>> t.faces[4] == face1 # check result from build
@@ -246,7 +248,7 @@ class TriangleStrip(object):
         >>> t.stripped_faces
         {0, 1, 2, 5, 6, 7, 8}
         >>> t.faces
-        [Face(10, 12, 11), Face(4, 10, 11), Face(4, 7, 10), Face(2, 7, 4), Face(1, 7, 2), Face(0, 1, 2), Face(0, 13, 1)]
+        [7, 6, 5, 2, 1, 0, 8]
         >>> t.vertices
         [12, 11, 10, 4, 7, 2, 1, 0, 13]
         >>> t.reversed_
@@ -267,7 +269,7 @@ class TriangleStrip(object):
         >>> tmp = m.add_face(0, 8, 9) # bad orientation!
         >>> tmp = m.add_face(8, 0, 10) # in strip
         >>> m.lock()
-        >>> t = TriangleStrip()
+        >>> t = TriangleStrip(m)
         >>> t.build(0, start_face)
         2
         >>> t.vertices
@@ -279,9 +281,9 @@ class TriangleStrip(object):
         del self.vertices[:]
         self.reversed_ = False
         v0 = start_vertex
-        v1 = start_face.get_next_vertex(v0)
-        v2 = start_face.get_next_vertex(v1)
-        self.stripped_faces.add(start_face.index)
+        v1 = self.mesh.get_next_vertex(start_face, v0)
+        v2 = self.mesh.get_next_vertex(start_face, v1)
+        self.stripped_faces.add(start_face)
         self.faces.append(start_face)
         self.vertices.append(v0)
         self.vertices.append(v1)
@@ -309,14 +311,21 @@ class Experiment(object):
     adjacent strips.
     """
 
-    def __init__(self, start_vertex, start_face):
+    def __init__(self, mesh, start_vertex, start_face):
+        self.mesh = mesh
         self.stripped_faces = set()
         self.start_vertex = start_vertex
         self.start_face = start_face
         self.strips = []
+        # stack of adjacent strips still to build, as tuples
+        # (strip, face_index, fallback_face_index)
+        self.pending = []
 
-    def build(self):
-        """Build strips, starting from start_vertex and start_face.
+    def build(self, max_strips=None):
+        """Build strips, starting from start_vertex and start_face. If
+        max_strips is given, then stop building once the experiment has
+        that many strips; calling build again continues where it
+        stopped.
 
         >>> m = Mesh()
         >>> tmp = m.add_face(2, 1, 7)
@@ -340,7 +349,7 @@ class Experiment(object):
         >>> tmp = m.add_face(31, 11, 33) # in strip
         >>> m.lock()
         >>> # build experiment
-        >>> exp = Experiment(0, s1_face)
+        >>> exp = Experiment(m, 0, s1_face)
         >>> exp.build()
         >>> len(exp.strips)
         2
@@ -349,39 +358,56 @@ class Experiment(object):
         >>> exp.strips[1].get_strip()
         [4, 22, 2, 21, 0, 24, 9]
         >>> # note: with current algorithm [32, 8, 31, 11, 33] is not found
+        >>> exp = Experiment(m, 0, s1_face)
+        >>> exp.build(max_strips=1)
+        >>> len(exp.strips)
+        1
+        >>> exp.build()
+        >>> [strip.get_strip() for strip in exp.strips]
+        [[11, 4, 7, 2, 1, 0, 8, 10, 11], [4, 22, 2, 21, 0, 24, 9]]
         """
-        # build initial strip
-        strip = TriangleStrip(stripped_faces=self.stripped_faces)
-        strip.build(self.start_vertex, self.start_face)
-        self.strips.append(strip)
+        if not self.strips:
+            # build initial strip
+            strip = TriangleStrip(self.mesh,
+                                  stripped_faces=self.stripped_faces)
+            strip.build(self.start_vertex, self.start_face)
+            self.strips.append(strip)
+            # schedule adjacent strips (last in, first out)
+            num_faces = len(strip.faces)
+            if num_faces >= 4:
+                face_index = num_faces >> 1 # quick / 2
+                self.pending.append((strip, face_index + 1, None))
+                self.pending.append((strip, face_index, None))
+            elif num_faces == 3:
+                self.pending.append((strip, 1, None))
+                self.pending.append((strip, 0, 2))
+            elif num_faces == 2:
+                self.pending.append((strip, 1, None))
+                self.pending.append((strip, 0, None))
+            elif num_faces == 1:
+                self.pending.append((strip, 0, None))
         # build adjacent strips
-        num_faces = len(strip.faces)
-        if num_faces >= 4:
-            face_index = num_faces >> 1 # quick / 2
-            self.build_adjacent(strip, face_index)
-            self.build_adjacent(strip, face_index + 1)
-        elif num_faces == 3:
-            if not self.build_adjacent(strip, 0):
-                self.build_adjacent(strip, 2)
-            self.build_adjacent(strip, 1)
-        elif num_faces == 2:
-            self.build_adjacent(strip, 0)
-            self.build_adjacent(strip, 1)
-        elif num_faces == 1:
-            self.build_adjacent(strip, 0)
+        while self.pending and (max_strips is None
+                                or len(self.strips) < max_strips):
+            strip, face_index, fallback_face_index = self.pending.pop()
+            if (not self.build_adjacent(strip, face_index)
+                and fallback_face_index is not None):
+                self.pending.append((strip, fallback_face_index, None))
 
     def build_adjacent(self, strip, face_index):
-        """Build strips adjacent to given strip, and add them to the
-        experiment. This is a helper function used by build.
+        """Build strip adjacent to given strip, add it to the
+        experiment, and schedule the next adjacent strip. This is a
+        helper function used by build.
         """
         opposite_vertex = strip.vertices[face_index + 1]
         face = strip.faces[face_index]
         other_face = strip.get_unstripped_adjacent_face(face, opposite_vertex)
-        if other_face:
+        if other_face is not None:
             winding = strip.reversed_
             if face_index & 1:
                 winding = not winding
-            other_strip = TriangleStrip(stripped_faces=self.stripped_faces)
+            other_strip = TriangleStrip(self.mesh,
+                                        stripped_faces=self.stripped_faces)
             if winding:
                 other_vertex = strip.vertices[face_index]
                 face_index = other_strip.build(other_vertex, other_face)
@@ -390,9 +416,9 @@ class Experiment(object):
                 face_index = other_strip.build(other_vertex, other_face)
             self.strips.append(other_strip)
             if face_index > (len(other_strip.faces) >> 1): # quick / 2
-                self.build_adjacent(other_strip, face_index - 1)
+                self.pending.append((other_strip, face_index - 1, None))
             elif face_index < len(other_strip.faces) - 1:
-                self.build_adjacent(other_strip, face_index + 1)
+                self.pending.append((other_strip, face_index + 1, None))
             return True
         return False
 
@@ -428,6 +454,7 @@ class TriangleStripifier(object):
 
     def __init__(self, mesh):
         self.num_samples = 10
+        self.max_experiment_strips = 4
         self.mesh = mesh
 
     @staticmethod
@@ -509,39 +536,73 @@ class TriangleStripifier(object):
         """
         all_strips = []
         selector = ExperimentSelector()
-        unstripped_faces = set(range(len(self.mesh.faces)))
-        while True:
-            experiments = []
-            # note: using deterministic self.sample
-            # instead of existing random.sample in python
-            # because deterministic version is easier to test
-            for sample in self.sample(list(unstripped_faces),
-                                      min(self.num_samples,
-                                          len(unstripped_faces))):
-                exp_face = self.mesh.faces[sample]
-                for exp_vertex in exp_face.verts:
-                    experiments.append(
-                        Experiment(start_vertex=exp_vertex,
-                                   start_face=exp_face))
-            if not experiments:
-                # done!
-                return all_strips
-            # note: use while loop so we only need to keep at most two
-            # built experiments at the same time in memory
-            while experiments:
-                experiment = experiments.pop()
-                experiment.build()
-                selector.update(experiment)
-            unstripped_faces -= selector.best_experiment.stripped_faces
-            # remove stripped faces from mesh
-            for strip in selector.best_experiment.strips:
-                for face in strip.faces:
-                    self.mesh.discard_face(face)
+        mesh = self.mesh
+        num_faces = mesh.num_faces
+        # the unstripped faces are counted in a binary indexed tree, so
+        # the samples can be taken at evenly spaced ranks among them
+        # without listing them on every iteration
+        tree = [0] * (num_faces + 1)
+        for i in range(1, num_faces + 1):
+            tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= num_faces:
+                tree[parent] += tree[i]
+        top_bit = 1
+        while top_bit * 2 <= num_faces:
+            top_bit *= 2
+        def select(rank):
+            """The unstripped face with the given rank."""
+            face = 0
+            bit = top_bit
+            while bit:
+                if face + bit <= num_faces and tree[face + bit] <= rank:
+                    face += bit
+                    rank -= tree[face]
+                bit >>= 1
+            return face
+        num_unstripped = num_faces
+        # experiments of the previous iteration, which are reused if
+        # none of their faces got stripped
+        old_experiments = {}
+        while num_unstripped:
+            samples = [
+                select(rank) for rank in self.sample(
+                    range(num_unstripped),
+                    min(self.num_samples, num_unstripped))]
+            # experiments are scored on their first few strips only,
+            # and only the best one is built further; they are tried
+            # in reverse order, so on equal scores, the last one wins
+            experiments = {}
+            for face in reversed(samples):
+                for vertex in reversed(mesh.get_face_verts(face)):
+                    experiment = old_experiments.get((face, vertex))
+                    if experiment is None:
+                        experiment = Experiment(
+                            mesh, start_vertex=vertex, start_face=face)
+                        experiment.build(
+                            max_strips=self.max_experiment_strips)
+                    experiments[(face, vertex)] = experiment
+                    selector.update(experiment)
+            selector.best_experiment.build()
+            stripped_faces = selector.best_experiment.stripped_faces
+            num_unstripped -= len(stripped_faces)
+            # remove stripped faces from the mesh, and from the tree
+            for face in stripped_faces:
+                mesh.discard_face(face)
+                i = face + 1
+                while i <= num_faces:
+                    tree[i] -= 1
+                    i += i & -i
             # calculate actual strips for experiment
             all_strips.extend(
                 (strip.get_strip()
                  for strip in selector.best_experiment.strips))
             selector.clear()
+            old_experiments = dict(
+                (key, experiment)
+                for key, experiment in experiments.items()
+                if experiment.stripped_faces.isdisjoint(stripped_faces))
+        return all_strips
 
 if __name__=='__main__':
     import doctest
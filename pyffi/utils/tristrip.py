@@ -428,23 +428,6 @@ def stitch_strips(strips):
     [0, 1, 2, 2, 9, 9, 8, 7]
     """
 
-    class ExperimentSelector:
-        """Helper class to select best experiment."""
-        def __init__(self):
-            self.best_ostrip1 = None
-            self.best_ostrip2 = None
-            self.best_num_stitches = None
-            self.best_ostrip_index = None
-
-        def update(self, ostrip_index, ostrip1, ostrip2):
-            num_stitches = ostrip1.get_num_stitches(ostrip2)
-            if ((self.best_num_stitches is None)
-                or (num_stitches < self.best_num_stitches)):
-                self.best_ostrip1 = ostrip1
-                self.best_ostrip2 = ostrip2
-                self.best_ostrip_index = ostrip_index
-                self.best_num_stitches = num_stitches
-
     # get all strips and their orientation, and their reverse
     ostrips = [(OrientedStrip(strip), OrientedStrip(strip))
                for strip in strips if len(strip) >= 3]
@@ -455,23 +438,51 @@ def stitch_strips(strips):
         # no strips!
         return []
     result = ostrips.pop()[0]
+    # remaining strips, by their index in ostrips
+    remaining = dict(enumerate(ostrips))
+    # map each vertex to the indices of the remaining strips which
+    # start or end with it: only these can be stitched to the result
+    # with less than two stitches
+    endpoints = {}
+    for ostrip_index, (ostrip, reversed_ostrip) in remaining.items():
+        for vertex in (ostrip.vertices[0], ostrip.vertices[-1]):
+            endpoints.setdefault(vertex, set()).add(ostrip_index)
     # go on as long as there are strips left to process
-    while ostrips:
-        selector = ExperimentSelector()
-
-        for ostrip_index, (ostrip, reversed_ostrip) in enumerate(ostrips):
-            # try various ways of stitching strips
-            selector.update(ostrip_index, result, ostrip)
-            selector.update(ostrip_index, ostrip, result)
-            selector.update(ostrip_index, result, reversed_ostrip)
-            selector.update(ostrip_index, reversed_ostrip, result)
-            # break early if global optimum is already reached
-            if selector.best_num_stitches == 0:
-                break
-        # get best result, perform the actual stitching, and remove
-        # strip from ostrips
-        result = selector.best_ostrip1 + selector.best_ostrip2
-        ostrips.pop(selector.best_ostrip_index)
+    while remaining:
+        # try various ways of stitching strips; among equally good
+        # ways, pick the first strip, as if all were tried in order
+        best = None
+        candidates = (
+            endpoints.get(result.vertices[0], set())
+            | endpoints.get(result.vertices[-1], set()))
+        for ostrip_index in sorted(candidates):
+            ostrip, reversed_ostrip = remaining[ostrip_index]
+            for ostrip1, ostrip2 in ((result, ostrip), (ostrip, result),
+                                     (result, reversed_ostrip),
+                                     (reversed_ostrip, result)):
+                num_stitches = ostrip1.get_num_stitches(ostrip2)
+                if best is None or num_stitches < best[0]:
+                    best = num_stitches, ostrip_index, ostrip1, ostrip2
+        if best is None or best[0] >= 2:
+            # no common vertex: find the first strip which needs only
+            # two stitches, or else three
+            best = None
+            for ostrip_index, (ostrip, reversed_ostrip) in remaining.items():
+                for ostrip1, ostrip2 in ((result, ostrip), (ostrip, result),
+                                         (result, reversed_ostrip),
+                                         (reversed_ostrip, result)):
+                    num_stitches = ostrip1.get_num_stitches(ostrip2)
+                    if best is None or num_stitches < best[0]:
+                        best = num_stitches, ostrip_index, ostrip1, ostrip2
+                if best[0] <= 2:
+                    break
+        # perform the actual stitching, and remove strip from the
+        # remaining strips
+        num_stitches, ostrip_index, ostrip1, ostrip2 = best
+        result = ostrip1 + ostrip2
+        ostrip, reversed_ostrip = remaining.pop(ostrip_index)
+        for vertex in (ostrip.vertices[0], ostrip.vertices[-1]):
+            endpoints[vertex].discard(ostrip_index)
     # get strip
     strip = list(result)
     # check if we can remove first vertex by reversing strip
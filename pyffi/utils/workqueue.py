@@ -0,0 +1,425 @@
+"""A queue of files to process, shared by workers on several hosts
+through a folder on a shared file system, without any server.
+
+The list of files, the manifest, is written once by whichever worker
+comes first. Workers then claim files by creating lease files, which
+only one of them can succeed in, and touch their leases while they
+work. A lease which is not touched for a while belongs to a worker
+which died, and is taken over by the others. For every finished file,
+a result record is written, and once all files have their record,
+exactly one worker gets to merge them.
+
+The folder holds::
+
+    manifest          the list of files, as json
+    leases/<i>.lease  the worker processing file i
+    results/<i>.json  the result record of file i
+    clocks/<worker>   files whose time stamps give the time of the
+                      file system, so clocks of hosts need not agree
+    merged            created by the worker which merges the results
+
+>>> import tempfile
+>>> folder = tempfile.mkdtemp()
+>>> queue = WorkQueue(folder, host="alpha")
+>>> queue.open(["a.cgf", "b.cgf"])
+['a.cgf', 'b.cgf']
+>>> other = WorkQueue(folder, host="beta")
+>>> other.open(["ignored.cgf"])
+['a.cgf', 'b.cgf']
+>>> for index, filename in queue.claims():
+...     queue.finish(index, "done", ["report on %s" % filename])
+>>> list(other.claims())
+[]
+>>> queue.claim_merge(), other.claim_merge()
+(True, False)
+>>> for record in queue.results():
+...     print(record["filename"], record["status"], record["data"])
+a.cgf done ['report on a.cgf']
+b.cgf done ['report on b.cgf']
+>>> queue.close()
+>>> other.close()
+>>> import shutil
+>>> shutil.rmtree(folder)
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+
+import pyffi.utils # AtomicFile
+
+LEASE_TIME = 60.0
+"""Number of seconds after which a lease which was not renewed
+expires, and the file is given to another worker."""
+
+_serials = itertools.count()
+
+class WorkQueue(object):
+    """A queue of files, shared through *folder* by workers on any
+    number of hosts. Call :meth:`open` to get the list of files,
+    process the files yielded by :meth:`claims` and call
+    :meth:`finish` for each of them, and check :meth:`claim_merge` at
+    the end to find out whether this worker should merge the
+    :meth:`results`. Workers must refer to files by the same names,
+    so give all hosts the same mount point or the same relative path.
+
+    :param folder: The shared folder.
+    :type folder: ``str``
+    :param host: The name of this host, for messages and for the names
+        of the workers.
+    :type host: ``str``
+    :param lease_time: Number of seconds after which leases expire.
+    :type lease_time: ``float``
+    """
+
+    logger = logging.getLogger("pyffi.utils.workqueue")
+
+    def __init__(self, folder, host=None, lease_time=LEASE_TIME):
+        self.folder = folder
+        self.host = host or socket.gethostname()
+        self.worker = "%s.%i.%i" % (self.host, os.getpid(), next(_serials))
+        self.lease_time = lease_time
+        self.poll_time = min(1.0, lease_time / 4.0)
+        self.filenames = None
+        self._held = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._renewer = None
+        self._clock = os.path.join(folder, "clocks", self.worker)
+
+    def _lease_name(self, index):
+        return os.path.join(self.folder, "leases", "%i.lease" % index)
+
+    def _result_name(self, index):
+        return os.path.join(self.folder, "results", "%i.json" % index)
+
+    def open(self, filenames):
+        """Publish the list of files, or read it if another worker
+        published it first.
+
+        :param filenames: The names of the files to process, only
+            consumed if there is no list yet.
+        :type filenames: iterable of ``str``
+        :return: The names of the files in the queue.
+        :rtype: ``list`` of ``str``
+
+        On file systems without hard links, such as some network
+        shares, the list is created in place instead, and workers wait
+        until it is complete:
+
+        >>> import os, shutil, tempfile
+        >>> def link(source, link_name):
+        ...     raise PermissionError(1, "Operation not permitted")
+        >>> os_link, os.link = os.link, link
+        >>> folder = tempfile.mkdtemp()
+        >>> WorkQueue(folder, host="alpha").open(["a.cgf"])
+        ['a.cgf']
+        >>> WorkQueue(folder, host="beta").open(["ignored.cgf"])
+        ['a.cgf']
+        >>> os.link = os_link
+        >>> sorted(os.listdir(folder))
+        ['clocks', 'leases', 'manifest', 'results']
+        >>> shutil.rmtree(folder)
+        """
+        for name in ("leases", "results", "clocks"):
+            os.makedirs(os.path.join(self.folder, name), exist_ok=True)
+        manifest = os.path.join(self.folder, "manifest")
+        if not os.path.exists(manifest):
+            # write the list completely, and then link it into place,
+            # so other workers never see a partial list, and only the
+            # first worker to finish its list wins
+            content = json.dumps(list(filenames), indent=0).encode()
+            stream = pyffi.utils.AtomicFile(
+                os.path.join(self.folder, "manifest.%s" % self.worker))
+            try:
+                stream.write(content)
+            except:
+                stream.discard()
+                raise
+            stream.close()
+            try:
+                os.link(stream.name, manifest)
+            except FileExistsError:
+                pass
+            except OSError:
+                # no hard links on this file system
+                self._create_manifest(manifest, content)
+            finally:
+                os.remove(stream.name)
+        self.filenames = self._read_manifest(manifest)
+        return self.filenames
+
+    def _create_manifest(self, manifest, content):
+        """Create the list of files in place, unless another worker
+        created it first. Other workers can see the list before it is
+        complete (see :meth:`_read_manifest`).
+        """
+        try:
+            fd = os.open(manifest, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(content)
+
+    def _read_manifest(self, manifest):
+        """Read the list of files, waiting for at most the lease time
+        until it is complete.
+        """
+        deadline = time.time() + self.lease_time
+        while True:
+            with open(manifest, "rb") as stream:
+                content = stream.read()
+            try:
+                return json.loads(content.decode())
+            except ValueError:
+                if time.time() > deadline:
+                    raise ValueError(
+                        "%s is incomplete: the worker which created it"
+                        " may have died; remove it and try again"
+                        % manifest)
+                time.sleep(self.poll_time)
+
+    def done(self):
+        """Indices of the files which have a result record."""
+        return set(
+            int(name[:-5])
+            for name in os.listdir(os.path.join(self.folder, "results"))
+            if name.endswith(".json"))
+
+    def claims(self):
+        """Claim files, one at a time, until every file has a result
+        record. While files are leased by others, wait, because their
+        workers may die. Call :meth:`finish` on each claimed file
+        before asking for the next one.
+
+        :return: Generator for ``(index, filename)`` of claimed files.
+        """
+        num_files = len(self.filenames)
+        # start at different places in the list, to avoid contention
+        start = zlib.crc32(self.worker.encode()) % max(num_files, 1)
+        order = list(range(start, num_files)) + list(range(start))
+        while order:
+            done = self.done()
+            order = [index for index in order if index not in done]
+            waiting = False
+            for index in order:
+                if not self._claim(index):
+                    waiting = True
+                    continue
+                if os.path.exists(self._result_name(index)):
+                    # finished by another worker since we listed them
+                    self._release(index)
+                    continue
+                yield index, self.filenames[index]
+                if index in self._held:
+                    raise RuntimeError(
+                        "%s was claimed but not finished"
+                        % self.filenames[index])
+            if waiting:
+                time.sleep(self.poll_time)
+
+    def now(self):
+        """The current time of the shared file system, from the time
+        stamp of a file which is touched for the purpose.
+        """
+        try:
+            os.utime(self._clock)
+        except FileNotFoundError:
+            open(self._clock, "wb").close()
+        return os.stat(self._clock).st_mtime
+
+    def _claim(self, index):
+        """Create the lease for a file, taking it over if it expired.
+
+        :return: ``True`` if the file was claimed.
+        """
+        name = self._lease_name(index)
+        for attempt in range(2):
+            try:
+                fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                if attempt or not self._expire(name):
+                    return False
+            else:
+                break
+        with os.fdopen(fd, "w") as stream:
+            stream.write(self.worker)
+        with self._lock:
+            self._held[index] = name
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew)
+                self._renewer.daemon = True
+                self._renewer.start()
+        return True
+
+    def _expire(self, name):
+        """Remove a lease if it was not renewed for too long.
+
+        :return: ``True`` if the lease was removed.
+        """
+        # a lease which disappears is being released or taken over by
+        # another worker: look again on the next pass
+        try:
+            mtime = os.stat(name).st_mtime
+        except FileNotFoundError:
+            return False
+        now = self.now()
+        if now - mtime < self.lease_time:
+            return False
+        # only one worker at a time may take over a lease, so a fresh
+        # lease of another worker is never removed by mistake
+        lock = name + ".lock"
+        try:
+            os.close(os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            try:
+                if now - os.stat(lock).st_mtime >= self.lease_time:
+                    # left by a worker which died while taking over
+                    os.remove(lock)
+            except FileNotFoundError:
+                pass
+            return False
+        try:
+            # check again, now that no other worker can take it over
+            try:
+                with open(name) as stream:
+                    owner = stream.read()
+                mtime = os.stat(name).st_mtime
+            except FileNotFoundError:
+                return False
+            if self.now() - mtime < self.lease_time:
+                return False
+            os.remove(name)
+        finally:
+            os.remove(lock)
+        self.logger.warning("lease on %s of %s expired" % (name, owner))
+        return True
+
+    def _renew(self):
+        """Touch all leases which are held, until :meth:`close`."""
+        while not self._stop.wait(self.lease_time / 3.0):
+            with self._lock:
+                held = list(self._held.items())
+            for index, name in held:
+                try:
+                    os.utime(name)
+                except FileNotFoundError:
+                    # another worker took it over and will process it
+                    # as well, which is harmless, as all files are
+                    # written atomically
+                    self.logger.warning(
+                        "lost lease on %s" % self.filenames[index])
+                    with self._lock:
+                        self._held.pop(index, None)
+
+    def _release(self, index):
+        """Remove the lease of a file, if it is still ours."""
+        with self._lock:
+            name = self._held.pop(index, None)
+        if name is None:
+            return
+        try:
+            with open(name) as stream:
+                owner = stream.read()
+            if owner == self.worker:
+                os.remove(name)
+        except FileNotFoundError:
+            pass
+
+    def finish(self, index, status, data=None):
+        """Write the result record of a claimed file, and release it.
+
+        :param index: The index of the file.
+        :type index: ``int``
+        :param status: The status, for instance ``"done"``.
+        :type status: ``str``
+        :param data: Further results; anything that json cannot store
+            is stored as its ``repr``.
+        """
+        record = dict(
+            filename=self.filenames[index], status=status,
+            worker=self.worker, data=data)
+        with pyffi.utils.AtomicFile(self._result_name(index)) as stream:
+            stream.write(json.dumps(record, default=repr).encode())
+        self._release(index)
+
+    def claim_merge(self):
+        """Check that all files have a result record, and claim the
+        merge. Only one worker succeeds.
+
+        :return: ``True`` if this worker should merge the results.
+        """
+        if len(self.done()) < len(self.filenames):
+            return False
+        try:
+            fd = os.open(os.path.join(self.folder, "merged"),
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as stream:
+            stream.write(self.worker)
+        return True
+
+    def results(self):
+        """The result records of all files with a result record, in the
+        order of the list of files.
+
+        :return: Generator for records, as ``dict`` with keys
+            ``filename``, ``status``, ``worker``, and ``data``.
+        """
+        for index in sorted(self.done()):
+            with open(self._result_name(index), "rb") as stream:
+                yield json.loads(stream.read().decode())
+
+    def close(self):
+        """Stop renewing leases, and clean up."""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        try:
+            os.remove(self._clock)
+        except FileNotFoundError:
+            pass
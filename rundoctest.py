@@ -25,6 +25,7 @@ import pyffi.utils.quickhull
 import pyffi.utils.inertia
 import pyffi.utils.tangentspace
 import pyffi.utils.mopp
+import pyffi.utils.columns
 import pyffi.formats.nif
 import pyffi.formats.cgf
 import pyffi.formats.kfm
@@ -87,6 +88,7 @@ suite.addTest(doctest.DocFileSuite('tests/nif/opt_delzeroscale.txt'))
 suite.addTest(doctest.DocFileSuite('tests/nif/opt_collisiongeometry.txt'))
 suite.addTest(doctest.DocFileSuite('tests/nif/opt_collision_to_box_shape.txt'))
 suite.addTest(doctest.DocFileSuite('tests/nif/opt_vertex_cache.txt'))
+suite.addTest(doctest.DocFileSuite('tests/nif/opt_split.txt'))
 suite.addTest(doctest.DocFileSuite('tests/cgf/cgftoaster.txt'))
 suite.addTest(doctest.DocFileSuite('tests/kfm/kfmtoaster.txt'))
 suite.addTest(doctest.DocFileSuite('docs-sphinx/intro.rst'))
@@ -77,6 +77,7 @@ class NifToaster(pyffi.spells.nif.NifToaster):
         pyffi.spells.nif.dump.SpellHtmlReport,
         pyffi.spells.nif.dump.SpellExportPixelData,
         pyffi.spells.nif.dump.SpellDumpPython,
+        pyffi.spells.nif.dump.SpellDumpColumns,
         pyffi.spells.nif.fix.SpellAddTangentSpace,
         pyffi.spells.nif.fix.SpellClampMaterialAlpha,
         pyffi.spells.nif.fix.SpellDelTangentSpace,
@@ -100,7 +101,7 @@ class NifToaster(pyffi.spells.nif.NifToaster):
         pyffi.spells.nif.optimize.SpellCleanRefLists,
         pyffi.spells.nif.optimize.SpellMergeDuplicates,
         pyffi.spells.nif.optimize.SpellOptimizeGeometry,
-        #pyffi.spells.nif.optimize.SpellOptimizeSplit,
+        pyffi.spells.nif.optimize.SpellSplitGeometry,
         pyffi.spells.nif.optimize.SpellOptimize,
         pyffi.spells.nif.optimize.SpellDelUnusedBones,
         pyffi.spells.nif.optimize.SpellDelZeroScale,
@@ -62,6 +62,7 @@ multiple of 2048. Files of a different size are padded with zeros.
 
 import os
 import os.path
+import time
 from optparse import OptionParser
 
 from pyffi.formats.rockstar.dir_ import DirFormat
@@ -73,6 +74,9 @@ parser = OptionParser(
     "Usage: %prog source_folder destination_folder\n\n"
     + __doc__
     )
+parser.add_option(
+    "-q", "--quiet", dest="verbose", action="store_false", default=True,
+    help="do not show progress of every file")
 (options, args) = parser.parse_args()
 if len(args) != 2:
     parser.print_help()
@@ -85,11 +89,22 @@ def pack(arcroot):
     folder = os.path.join(unpack_folder, arcroot)
     print("packing from %s" % folder)
     dirdata = DirFormat.Data(folder=folder)
+
+    def progress(file_record, num_bytes):
+        if options.verbose:
+            print("  %s (%i bytes)"
+                  % (dirdata.get_filename(file_record), num_bytes))
+
     with open(os.path.join(out_folder, arcroot) + '.dir', 'wb') as dirfile:
         dirdata.write(dirfile)
     with open(os.path.join(out_folder, arcroot) + '.img', 'wb') as imgfile:
-        dirdata.pack(imgfile, folder)
+        return dirdata.pack(imgfile, folder, progress=progress)
 
+start = time.time()
+total = 0
 for arcname in os.listdir(unpack_folder):
     if os.path.isdir(os.path.join(unpack_folder, arcname)):
-        pack(arcname)
+        total += pack(arcname)
+elapsed = time.time() - start
+print("packed %.1f MB in %.1f seconds (%.1f MB/s)"
+      % (total / 1e6, elapsed, total / 1e6 / max(elapsed, 1e-6)))
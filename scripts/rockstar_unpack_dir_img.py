@@ -62,6 +62,7 @@ multiple of 2048. Files of a different size are padded with zeros.
 
 import os
 import os.path
+import time
 from optparse import OptionParser
 
 from pyffi.formats.rockstar.dir_ import DirFormat
@@ -73,6 +74,19 @@ parser = OptionParser(
     "Usage: %prog source_folder destination_folder\n\n"
     + __doc__
     )
+parser.add_option(
+    "-j", "--jobs", dest="jobs", type="int", default=1,
+    metavar="JOBS",
+    help="unpack JOBS files at once [default: %default]")
+parser.add_option(
+    "--only", dest="only", type="string", action="append",
+    metavar="PATTERN",
+    help="only unpack files whose name matches PATTERN"
+    " (wildcards allowed); if specified multiple times,"
+    " the patterns are 'ored'")
+parser.add_option(
+    "-q", "--quiet", dest="verbose", action="store_false", default=True,
+    help="do not show progress of every file")
 (options, args) = parser.parse_args()
 if len(args) != 2:
     parser.print_help()
@@ -83,15 +97,27 @@ in_folder, unpack_folder = args
 
 def unpack(arcroot):
     dirdata = DirFormat.Data()
+
+    def progress(file_record, num_bytes):
+        if options.verbose:
+            print("  %s (%i bytes)"
+                  % (dirdata.get_filename(file_record), num_bytes))
+
     with open(os.path.join(in_folder, arcroot) + '.dir', 'rb') as dirfile:
         dirdata.read(dirfile)
     folder = os.path.join(unpack_folder, arcroot)
     print("unpacking to %s" % folder)
     os.mkdir(folder)
     with open(os.path.join(in_folder, arcroot) + '.img', 'rb') as imgfile:
-        dirdata.unpack(imgfile, folder)
+        return dirdata.unpack(imgfile, folder, names=options.only,
+                              jobs=options.jobs, progress=progress)
 
+start = time.time()
+total = 0
 for arcname in os.listdir(in_folder):
     if (arcname.endswith('.dir')
         and os.path.isfile(os.path.join(in_folder, arcname))):
-        unpack(arcname[:-4])
+        total += unpack(arcname[:-4])
+elapsed = time.time() - start
+print("unpacked %.1f MB in %.1f seconds (%.1f MB/s)"
+      % (total / 1e6, elapsed, total / 1e6 / max(elapsed, 1e-6)))